@@ -4,6 +4,8 @@ import cv2
 import numpy as np
 import base64
 import os
+import sys
+import threading
 from PIL import Image
 import io
 import random
@@ -11,6 +13,11 @@ import logging
 from datetime import datetime
 from scipy.spatial import distance as dist
 
+# Shared EAR/MAR geometry kernel lives with the backend
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend', 'src'))
+from classifier_pool import ClassifierPool
+from geometry import eye_aspect_ratio
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -18,9 +25,8 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)
 
-# Load face and eye cascade classifiers
-face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
+# Pre-loaded, pre-warmed face and eye cascade pairs, checked out per request
+classifiers = ClassifierPool(int(os.getenv('CLASSIFIER_POOL_SIZE', 0)) or None)
 
 # Drowsiness detection parameters
 EAR_THRESHOLD = 0.20  # Eye Aspect Ratio threshold
@@ -33,35 +39,35 @@ drowsiness_history = []
 blink_counter = 0
 last_blink_time = datetime.now()
 blink_rate = 0
+# Guards the session statistics above across request threads
+stats_lock = threading.Lock()
 
 def calculate_ear(eye_landmarks):
+    global blink_counter, blink_rate, last_blink_time
     try:
-        # Calculate the eye aspect ratio (EAR)
-        # Vertical eye landmarks
-        v1 = np.linalg.norm(eye_landmarks[1] - eye_landmarks[5])
-        v2 = np.linalg.norm(eye_landmarks[2] - eye_landmarks[4])
-        # Horizontal eye landmarks
-        h = np.linalg.norm(eye_landmarks[0] - eye_landmarks[3])
-        # Calculate EAR
-        ear = (v1 + v2) / (2.0 * h)
+        # Calculate the eye aspect ratio (EAR) with the shared vectorized kernel
+        ear = float(eye_aspect_ratio(eye_landmarks))
+        if np.isnan(ear):
+            return None, blink_rate
         
         # Calculate blink rate
-        current_time = datetime.now()
-        time_diff = (current_time - last_blink_time).total_seconds()
-        
-        if ear < EAR_THRESHOLD:
-            blink_counter += 1
-            if time_diff >= 1:  # Update blink rate every second
-                blink_rate = blink_counter / time_diff
-                blink_counter = 0
-                last_blink_time = current_time
-        
-        return ear, blink_rate
+        with stats_lock:
+            current_time = datetime.now()
+            time_diff = (current_time - last_blink_time).total_seconds()
+            
+            if ear < EAR_THRESHOLD:
+                blink_counter += 1
+                if time_diff >= 1:  # Update blink rate every second
+                    blink_rate = blink_counter / time_diff
+                    blink_counter = 0
+                    last_blink_time = current_time
+            
+            return ear, blink_rate
     except Exception as e:
         logger.error(f"Error calculating EAR: {str(e)}")
         return None, 0
 
-def get_eye_landmarks(eye_region):
+def get_eye_landmarks(eye_region, eye_cascade):
     try:
         # Convert to grayscale
         gray = cv2.cvtColor(eye_region, cv2.COLOR_BGR2GRAY)
@@ -104,28 +110,29 @@ def get_eye_landmarks(eye_region):
         return None, None
 
 def update_stats(is_drowsy):
-    current_time = datetime.now()
-    session_duration = (current_time - session_start_time).total_seconds()
-    
-    if is_drowsy:
-        drowsiness_history.append({
-            'timestamp': current_time,
-            'duration': 1  # Assuming 1 second per detection
-        })
-    
-    # Calculate drowsiness percentage
-    drowsiness_percentage = 0
-    if session_duration > 0:
-        drowsiness_time = sum(event['duration'] for event in drowsiness_history)
-        drowsiness_percentage = (drowsiness_time / session_duration) * 100
-    
-    return {
-        'total_drowsiness_events': len(drowsiness_history),
-        'total_blinks': blink_counter,
-        'average_blink_rate': blink_rate,
-        'session_duration': session_duration,
-        'drowsiness_percentage': drowsiness_percentage
-    }
+    with stats_lock:
+        current_time = datetime.now()
+        session_duration = (current_time - session_start_time).total_seconds()
+        
+        if is_drowsy:
+            drowsiness_history.append({
+                'timestamp': current_time,
+                'duration': 1  # Assuming 1 second per detection
+            })
+        
+        # Calculate drowsiness percentage
+        drowsiness_percentage = 0
+        if session_duration > 0:
+            drowsiness_time = sum(event['duration'] for event in drowsiness_history)
+            drowsiness_percentage = (drowsiness_time / session_duration) * 100
+        
+        return {
+            'total_drowsiness_events': len(drowsiness_history),
+            'total_blinks': blink_counter,
+            'average_blink_rate': blink_rate,
+            'session_duration': session_duration,
+            'drowsiness_percentage': drowsiness_percentage
+        }
 
 @app.route('/api/detect', methods=['POST'])
 def detect_drowsiness():
@@ -142,35 +149,36 @@ def detect_drowsiness():
         img_np = np.array(image)
         gray = cv2.cvtColor(img_np, cv2.COLOR_BGR2GRAY)
         
-        # Detect faces
-        faces = face_cascade.detectMultiScale(gray, 1.1, 4, minSize=(30, 30))
-        
         is_drowsy = False
         ear_value = None
         stats = update_stats(False)
         
-        if len(faces) > 0:
-            # Get the first face detected
-            x, y, w, h = faces[0]
-            face_roi = img_np[y:y+h, x:x+w]
-            
-            # Get eye landmarks
-            eye1_landmarks, eye2_landmarks = get_eye_landmarks(face_roi)
+        with classifiers.checkout() as (face_cascade, eye_cascade):
+            # Detect faces
+            faces = face_cascade.detectMultiScale(gray, 1.1, 4, minSize=(30, 30))
+            eye1_landmarks = eye2_landmarks = None
+            if len(faces) > 0:
+                # Get the first face detected
+                x, y, w, h = faces[0]
+                face_roi = img_np[y:y+h, x:x+w]
+                
+                # Get eye landmarks
+                eye1_landmarks, eye2_landmarks = get_eye_landmarks(face_roi, eye_cascade)
+        
+        if eye1_landmarks is not None and eye2_landmarks is not None:
+            # Calculate EAR for both eyes
+            ear1, _ = calculate_ear(eye1_landmarks)
+            ear2, _ = calculate_ear(eye2_landmarks)
             
-            if eye1_landmarks is not None and eye2_landmarks is not None:
-                # Calculate EAR for both eyes
-                ear1, _ = calculate_ear(eye1_landmarks)
-                ear2, _ = calculate_ear(eye2_landmarks)
+            if ear1 is not None and ear2 is not None:
+                # Use the average EAR of both eyes
+                ear_value = (ear1 + ear2) / 2
+                
+                # Check for drowsiness
+                is_drowsy = ear_value < EAR_THRESHOLD
                 
-                if ear1 is not None and ear2 is not None:
-                    # Use the average EAR of both eyes
-                    ear_value = (ear1 + ear2) / 2
-                    
-                    # Check for drowsiness
-                    is_drowsy = ear_value < EAR_THRESHOLD
-                    
-                    if is_drowsy:
-                        stats = update_stats(True)
+                if is_drowsy:
+                    stats = update_stats(True)
         
         # Get random motivational message
         message = random.choice(MOTIVATIONAL_MESSAGES) if is_drowsy else "You're doing great! Stay focused! 💪"
@@ -215,7 +223,7 @@ def get_zen_mode():
 def health_check():
     return jsonify({
         'status': 'healthy',
-        'model_loaded': face_cascade is not None,
+        'model_loaded': classifiers.size > 0,
         'model_path': 'Haar Cascade'
     })
 
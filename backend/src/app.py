@@ -1,16 +1,24 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
-import cv2
-import numpy as np
-from PIL import Image
-import io
-import base64
+from flask_sock import Sock
+import argparse
+import atexit
+import json
 import logging
-from datetime import datetime
+import math
+import threading
+import time
 import os
-from typing import Dict, Any
-import json
-from drowsiness_detector import DrowsinessDetector
+from typing import Any, Callable, Dict, List, Optional, Union
+from batch_processor import CascadeWorkerPool
+from detection_service import DetectionService, EncodedImage
+from frame_decoder import RAW_CONTENT_TYPES, FrameDecodeError, parse_reduce
+from frame_stream import LatestFrameSlot, read_socket
+import metrics
+import response_codec
+from session_registry import SessionRegistry
+from session_store import SessionStore
+from worker_engine import WorkerCrashedError, WorkerEngine
 
 # Configure logging
 logging.basicConfig(
@@ -21,141 +29,315 @@ logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 CORS(app)
+sock = Sock(app)
 
-# Initialize drowsiness detector
-detector = DrowsinessDetector(
-    ear_threshold=0.20,
-    mar_threshold=0.30,
-    consecutive_frames=3,
-    blink_threshold=0.15,
-    yawn_threshold=0.35
-)
+REGISTRY_SETTINGS = {
+    'max_sessions': int(os.getenv('MAX_SESSIONS', 500)),
+    'idle_ttl': float(os.getenv('SESSION_IDLE_TTL', 15 * 60))
+}
+BATCH_MAX_FRAMES = int(os.getenv('BATCH_MAX_FRAMES', 64))
+# SQLite file for sessions, settings and alert history (empty to keep them in memory only)
+SESSION_DB = os.getenv('SESSION_DB', os.path.join('data', 'sessions.db'))
+HISTORY_MAX_LIMIT = 500
+ANALYTICS_MAX_POINTS = 2000
+SERVICE_SETTINGS = {
+    # Seconds between stats updates in compact responses
+    'stats_interval': float(os.getenv('COMPACT_STATS_INTERVAL', 1.0))
+}
+# Shared-memory frame slots per detector worker (0 sends encoded frames through the worker queues)
+FRAME_SLOTS_PER_WORKER = int(os.getenv('FRAME_SLOTS_PER_WORKER', 4))
+FRAME_SLOT_BYTES = int(os.getenv('FRAME_SLOT_BYTES', 1920 * 1080))
+# Detector worker processes (0 = detect in-process); main() overrides it with --workers
+DETECTOR_WORKERS = int(os.getenv('DETECTOR_WORKERS', 0))
+
+# Built by init_services() on first use (or by main() for the chosen mode), so
+# importing this module - as every spawned detector worker does - builds nothing
+store: Optional[SessionStore] = None
+service: Optional[Union[DetectionService, WorkerEngine]] = None
+_services_lock = threading.Lock()
+
+def init_services(workers: Optional[int] = None) -> Union[DetectionService, WorkerEngine]:
+    """Create the session store and the detection service, once.
+
+    ``workers`` defaults to ``DETECTOR_WORKERS``, so the first request under
+    a WSGI server builds the same service as ``python app.py --workers``.
+    With ``workers`` > 0 detection runs in a ``WorkerEngine`` of that many
+    processes. Otherwise it runs in-process: per-session detector state, a
+    pool of pre-warmed cascade pairs checked out by request threads, and a
+    worker pool for decoding and cascades in batched requests.
+    """
+    global store, service
+    with _services_lock:
+        if service is not None:
+            return service
+        # Durable session store; writes are batched on a background thread
+        store = SessionStore(SESSION_DB) if SESSION_DB else None
+        if store is not None:
+            atexit.register(store.close)
+        if workers is None:
+            workers = DETECTOR_WORKERS
+        if workers > 0:
+            service = WorkerEngine(workers, registry_kwargs=REGISTRY_SETTINGS, store_path=SESSION_DB or None,
+                                   service_kwargs=SERVICE_SETTINGS, frame_slots=FRAME_SLOTS_PER_WORKER * workers,
+                                   frame_slot_bytes=FRAME_SLOT_BYTES)
+            # Registered after store.close, so it runs first and workers stop before the store
+            atexit.register(service.shutdown)
+            logger.info(f"Started {workers} detector workers")
+        else:
+            service = DetectionService(
+                SessionRegistry(store=store, **REGISTRY_SETTINGS),
+                pool=CascadeWorkerPool(max_workers=int(os.getenv('BATCH_WORKERS', 0)) or None),
+                **SERVICE_SETTINGS
+            )
+        return service
+
+def get_service() -> Union[DetectionService, WorkerEngine]:
+    return service if service is not None else init_services()
+
+def get_store() -> Optional[SessionStore]:
+    get_service()
+    return store
+
+def read_image() -> EncodedImage:
+    """Return the encoded frame from the request body.
+
+    Accepts a raw encoded image (``image/jpeg``, ``application/octet-stream``),
+    a multipart upload with an ``image`` file field, or the legacy JSON body
+    with a base64 data URL.
+    """
+    if request.mimetype in RAW_CONTENT_TYPES:
+        return request.get_data(cache=False)
+    if request.mimetype == 'multipart/form-data':
+        upload = request.files.get('image')
+        if upload is None:
+            raise FrameDecodeError('No image data provided')
+        return upload.read()
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or 'image' not in data:
+        raise FrameDecodeError('No image data provided')
+    if not isinstance(data['image'], str):
+        raise FrameDecodeError('Invalid image data')
+    return data['image']
+
+def read_batch() -> List[Dict[str, Any]]:
+    """Collect the frames of a batch request as ``{image, session_id, timestamp}`` items.
 
-# Store session data
-sessions: Dict[str, Dict[str, Any]] = {}
-
-def get_session_id() -> str:
-    """Generate a unique session ID."""
-    return datetime.now().strftime("%Y%m%d_%H%M%S")
-
-def initialize_session(session_id: str):
-    """Initialize a new session."""
-    sessions[session_id] = {
-        'start_time': datetime.now(),
-        'drowsy_count': 0,
-        'blink_count': 0,
-        'last_alert_time': None,
-        'alert_history': [],
-        'settings': {
-            'ear_threshold': 0.20,
-            'mar_threshold': 0.30,
-            'consecutive_frames': 3,
-            'blink_threshold': 0.15,
-            'yawn_threshold': 0.35,
-            'show_face_box': True,
-            'show_eye_markers': True,
-            'auto_zen_mode': False
-        }
-    }
+    Accepts a JSON body ``{"frames": [{"image": <data URL>, "session_id": ...,
+    "timestamp": <epoch seconds>}, ...]}`` or a multipart upload with repeated
+    ``image`` files and optional parallel ``session_id``/``timestamp`` fields.
+    Raises ``BatchItemError`` (with the frame's index) for a malformed frame.
+    """
+    default_session = request.headers.get('X-Session-ID')
+    if request.mimetype == 'multipart/form-data':
+        uploads = request.files.getlist('image')
+        session_ids = request.form.getlist('session_id')
+        timestamps = request.form.getlist('timestamp')
+        items = []
+        for i, upload in enumerate(uploads):
+            timestamp = None
+            if i < len(timestamps) and timestamps[i]:
+                try:
+                    timestamp = float(timestamps[i])
+                except ValueError:
+                    raise BatchItemError(i, 'timestamp must be a number')
+            items.append({
+                'image': upload.read(),
+                'session_id': session_ids[i] if i < len(session_ids) else default_session,
+                'timestamp': check_timestamp(i, timestamp)
+            })
+        return items
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('frames'), list):
+        raise FrameDecodeError('No frames provided')
+    items = []
+    for i, frame in enumerate(data['frames']):
+        if not isinstance(frame, dict):
+            raise BatchItemError(i, 'frame must be an object')
+        image = frame.get('image', '')
+        if not isinstance(image, str):
+            raise BatchItemError(i, 'image must be a data URL string')
+        session_id = frame.get('session_id', default_session)
+        if session_id is not None and not isinstance(session_id, str):
+            raise BatchItemError(i, 'session_id must be a string')
+        items.append({'image': image, 'session_id': session_id,
+                      'timestamp': check_timestamp(i, frame.get('timestamp'))})
+    return items
+
+class BatchItemError(ValueError):
+    """A malformed frame in a batch request."""
+
+    def __init__(self, index: int, message: str):
+        super().__init__(f"frames[{index}]: {message}")
+        self.index = index
+
+def check_timestamp(index: int, timestamp: Any) -> Optional[float]:
+    """A batch frame's capture time as a finite float (or None), else ``BatchItemError``."""
+    if timestamp is None:
+        return None
+    if isinstance(timestamp, bool) or not isinstance(timestamp, (int, float)) or not math.isfinite(timestamp):
+        raise BatchItemError(index, 'timestamp must be a finite number of epoch seconds')
+    return float(timestamp)
+
+def query_arg(name: str, cast: Callable[[str], Any], default: Any = None) -> Any:
+    """Query parameter ``name`` converted with ``cast``; ``default`` when absent. Raises ValueError on bad input."""
+    value = request.args.get(name)
+    if value is None or value == '':
+        return default
+    return cast(value)
+
+def is_compact() -> bool:
+    """Whether the client asked for compact (delta-encoded) responses with ``?compact=1``."""
+    return request.args.get('compact', '').lower() in ('1', 'true', 'yes')
 
 @app.route('/api/detect', methods=['POST'])
 def detect_drowsiness():
-    """Endpoint for drowsiness detection."""
+    """Endpoint for drowsiness detection.
+
+    An optional ``reduce`` query parameter (2, 4 or 8) decodes at reduced
+    resolution. ``?compact=1`` sends settings only when they change and stats
+    only every ``COMPACT_STATS_INTERVAL`` seconds as changed fields; an
+    ``Accept: application/msgpack`` header selects MessagePack.
+    """
     try:
-        # Get session ID from request
-        session_id = request.headers.get('X-Session-ID')
-        if not session_id or session_id not in sessions:
-            session_id = get_session_id()
-            initialize_session(session_id)
-        
-        # Get image data
-        data = request.get_json()
-        if not data or 'image' not in data:
-            return jsonify({'error': 'No image data provided'}), 400
-        
-        # Decode base64 image
         try:
-            image_data = base64.b64decode(data['image'].split(',')[1])
-            image = Image.open(io.BytesIO(image_data))
-            frame = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-        except Exception as e:
+            reduce = parse_reduce(request.args.get('reduce'))
+            image = read_image()
+            compact = is_compact()
+
+            # Decode, detect and update the session's statistics
+            response = get_service().detect(request.headers.get('X-Session-ID'), image, reduce, compact=compact)
+        except FrameDecodeError as e:
             logger.error(f"Error decoding image: {str(e)}")
-            return jsonify({'error': 'Invalid image data'}), 400
-        
-        # Detect drowsiness
-        result = detector.detect_drowsiness(frame)
-        
-        # Update session statistics
-        if result.is_drowsy:
-            sessions[session_id]['drowsy_count'] += 1
-            current_time = datetime.now()
-            
-            # Add to alert history
-            alert = {
-                'timestamp': current_time.isoformat(),
-                'ear': result.ear,
-                'confidence': result.confidence
-            }
-            sessions[session_id]['alert_history'].append(alert)
-            
-            # Keep only last 100 alerts
-            if len(sessions[session_id]['alert_history']) > 100:
-                sessions[session_id]['alert_history'].pop(0)
-            
-            sessions[session_id]['last_alert_time'] = current_time
-        
-        # Get session statistics
-        stats = detector.get_session_stats()
-        
-        # Prepare response
-        response = {
-            'session_id': session_id,
-            'is_drowsy': result.is_drowsy,
-            'ear': result.ear,
-            'mar': result.mar,
-            'blink_rate': result.blink_rate,
-            'confidence': result.confidence,
-            'face_detected': result.face_detected,
-            'stats': stats,
-            'settings': sessions[session_id]['settings']
-        }
-        
-        return jsonify(response)
-        
+            return jsonify({'error': str(e)}), 400
+
+        serialize_start = time.perf_counter()
+        mimetype = response_codec.negotiate(request.accept_mimetypes)
+        if compact or mimetype != response_codec.JSON_MIMETYPE:
+            reply = Response(response_codec.encode(response, mimetype), mimetype=mimetype)
+        else:
+            reply = jsonify(response)
+        metrics.SERIALIZE_STAGE.observe(time.perf_counter() - serialize_start)
+        return reply
+
+    except WorkerCrashedError as e:
+        logger.error(f"Worker unavailable in detect_drowsiness endpoint: {str(e)}")
+        metrics.ERRORS.labels('worker_unavailable').inc()
+        return jsonify({'error': 'Service temporarily unavailable'}), 503
     except Exception as e:
         logger.error(f"Error in detect_drowsiness endpoint: {str(e)}")
+        metrics.ERRORS.labels('internal').inc()
         return jsonify({'error': 'Internal server error'}), 500
 
+@app.route('/api/detect/batch', methods=['POST'])
+def detect_drowsiness_batch():
+    """Endpoint for detecting drowsiness over a burst of frames from one or more sessions.
+
+    Decoding and cascades run in parallel; per-session temporal state is then
+    updated in request order. Results come back in the same order.
+    """
+    try:
+        try:
+            reduce = parse_reduce(request.args.get('reduce'))
+            items = read_batch()
+        except BatchItemError as e:
+            return jsonify({'error': str(e), 'index': e.index}), 400
+        except (FrameDecodeError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
+        if len(items) > BATCH_MAX_FRAMES:
+            return jsonify({'error': f'Batch exceeds {BATCH_MAX_FRAMES} frames'}), 413
+
+        return jsonify({'results': get_service().detect_batch(items, reduce)})
+
+    except WorkerCrashedError as e:
+        logger.error(f"Worker unavailable in detect_drowsiness_batch endpoint: {str(e)}")
+        metrics.ERRORS.labels('worker_unavailable').inc()
+        return jsonify({'error': 'Service temporarily unavailable'}), 503
+    except Exception as e:
+        logger.error(f"Error in detect_drowsiness_batch endpoint: {str(e)}")
+        metrics.ERRORS.labels('internal').inc()
+        return jsonify({'error': 'Internal server error'}), 500
+
+@sock.route('/api/stream')
+def stream_drowsiness(ws):
+    """WebSocket streaming endpoint: one socket is bound to one session.
+
+    Clients send binary JPEG frames (or text data URLs) and receive one JSON
+    result per processed frame. Frames that arrive while the previous one is
+    still being processed replace each other, so only the newest is run.
+    ``?compact=1`` delta-encodes settings and stats as for ``/api/detect``;
+    ``?encoding=msgpack`` sends binary MessagePack messages instead of JSON.
+    """
+    session_id = request.args.get('session_id') or request.headers.get('X-Session-ID')
+    try:
+        reduce = parse_reduce(request.args.get('reduce'))
+    except FrameDecodeError as e:
+        ws.send(json.dumps({'error': str(e)}))
+        return
+    compact = is_compact()
+    msgpack_encoding = request.args.get('encoding') == 'msgpack' and response_codec.msgpack is not None
+    slot = LatestFrameSlot()
+    reader = threading.Thread(target=read_socket, args=(ws, slot), daemon=True)
+    reader.start()
+
+    while True:
+        item = slot.take()
+        if item is None:
+            break
+        frame_id, payload = item
+        try:
+            response = get_service().detect(session_id, payload, reduce, compact=compact)
+            # Stay bound to the session the first frame created or resolved
+            session_id = response['session_id']
+        except FrameDecodeError as e:
+            logger.error(f"Error decoding streamed frame: {str(e)}")
+            response = {'error': str(e)}
+        except Exception as e:
+            logger.error(f"Error in stream_drowsiness: {str(e)}")
+            metrics.ERRORS.labels('internal').inc()
+            response = {'error': 'Internal server error'}
+
+        response['frame_id'] = frame_id
+        response['dropped_frames'] = slot.dropped
+        serialize_start = time.perf_counter()
+        if msgpack_encoding:
+            message = response_codec.encode(response, response_codec.MSGPACK_MIMETYPES[0])
+        elif compact:
+            message = response_codec.encode(response).decode('utf-8')
+        else:
+            message = json.dumps(response)
+        metrics.SERIALIZE_STAGE.observe(time.perf_counter() - serialize_start)
+        try:
+            ws.send(message)
+        except Exception as e:
+            logger.debug(f"Stream closed while sending: {str(e)}")
+            break
+
+    slot.close()
+
 @app.route('/api/settings', methods=['GET', 'POST'])
 def handle_settings():
     """Endpoint for managing session settings."""
     try:
         session_id = request.headers.get('X-Session-ID')
-        if not session_id or session_id not in sessions:
-            return jsonify({'error': 'Invalid session ID'}), 400
-        
+
         if request.method == 'GET':
-            return jsonify(sessions[session_id]['settings'])
-        
+            settings = get_service().get_settings(session_id)
+            if settings is None:
+                return jsonify({'error': 'Invalid session ID'}), 400
+            return jsonify(settings)
+
         # Update settings
         new_settings = request.get_json()
         if not new_settings:
             return jsonify({'error': 'No settings provided'}), 400
-        
-        # Update only provided settings
-        for key, value in new_settings.items():
-            if key in sessions[session_id]['settings']:
-                sessions[session_id]['settings'][key] = value
-        
-        # Update detector parameters
-        detector.EAR_THRESHOLD = sessions[session_id]['settings']['ear_threshold']
-        detector.MAR_THRESHOLD = sessions[session_id]['settings']['mar_threshold']
-        detector.CONSECUTIVE_FRAMES = sessions[session_id]['settings']['consecutive_frames']
-        detector.BLINK_THRESHOLD = sessions[session_id]['settings']['blink_threshold']
-        detector.YAWN_THRESHOLD = sessions[session_id]['settings']['yawn_threshold']
-        
-        return jsonify(sessions[session_id]['settings'])
-        
+
+        # Update only provided settings and this session's detector parameters
+        settings = get_service().update_settings(session_id, new_settings)
+        if settings is None:
+            return jsonify({'error': 'Invalid session ID'}), 400
+        return jsonify(settings)
+
     except Exception as e:
         logger.error(f"Error in settings endpoint: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
@@ -164,25 +346,133 @@ def handle_settings():
 def reset_session():
     """Endpoint for resetting session statistics."""
     try:
-        session_id = request.headers.get('X-Session-ID')
-        if not session_id or session_id not in sessions:
+        # Reset detector and session data
+        if not get_service().reset(request.headers.get('X-Session-ID')):
             return jsonify({'error': 'Invalid session ID'}), 400
-        
-        # Reset detector
-        detector.reset_session()
-        
-        # Reset session data
-        initialize_session(session_id)
-        
+
         return jsonify({'message': 'Session reset successfully'})
-        
+
     except Exception as e:
         logger.error(f"Error in reset endpoint: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
-if __name__ == '__main__':
+@app.route('/api/history', methods=['GET'])
+def get_history():
+    """Endpoint for a session's stored alert history, newest first.
+
+    Query parameters: ``limit`` (default 50), ``before`` (the ``next_cursor``
+    of the previous page) and ``since``/``until`` (epoch seconds). Reads
+    from the session store, so it covers evicted sessions and earlier runs.
+    """
+    try:
+        store = get_store()
+        if store is None:
+            return jsonify({'error': 'Session store is disabled'}), 404
+        session_id = request.headers.get('X-Session-ID') or request.args.get('session_id')
+        try:
+            limit = min(query_arg('limit', int, 50), HISTORY_MAX_LIMIT)
+            before = query_arg('before', int)
+            since = query_arg('since', float)
+            until = query_arg('until', float)
+        except ValueError:
+            return jsonify({'error': 'Invalid query parameter'}), 400
+        if limit < 1:
+            return jsonify({'error': 'limit must be positive'}), 400
+
+        session = store.load_session(session_id) if session_id else None
+        if session is None:
+            return jsonify({'error': 'Invalid session ID'}), 400
+
+        page = store.alert_history(session_id, limit, before, since, until)
+        return jsonify({
+            'session_id': session_id,
+            'session': {key: session[key] for key in ('start_time', 'last_seen', 'frames', 'drowsy_count',
+                                                      'blink_count', 'last_alert_time')},
+            **page
+        })
+
+    except Exception as e:
+        logger.error(f"Error in history endpoint: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/api/analytics', methods=['GET'])
+def get_analytics():
+    """Endpoint for a session's pre-aggregated time series over a time range.
+
+    Query parameters: ``start``/``end`` (epoch seconds, default the whole
+    session up to now) and ``points`` (maximum buckets, default 500). Series
+    come from per-second and per-minute rollups maintained as frames arrive,
+    merged into ``step``-second buckets; empty buckets are omitted.
+    """
+    try:
+        store = get_store()
+        if store is None:
+            return jsonify({'error': 'Session store is disabled'}), 404
+        session_id = request.headers.get('X-Session-ID') or request.args.get('session_id')
+        try:
+            start = query_arg('start', float)
+            end = query_arg('end', float)
+            points = min(query_arg('points', int, 500), ANALYTICS_MAX_POINTS)
+        except ValueError:
+            return jsonify({'error': 'Invalid query parameter'}), 400
+
+        session = store.load_session(session_id) if session_id else None
+        if session is None:
+            return jsonify({'error': 'Invalid session ID'}), 400
+        start = session['start_time'] if start is None else start
+        end = time.time() if end is None else end
+        if points < 1 or end <= start:
+            return jsonify({'error': 'Empty time range or non-positive points'}), 400
+
+        return jsonify({
+            'session_id': session_id,
+            'start': start,
+            'end': end,
+            **store.series(session_id, start, end, points)
+        })
+
+    except Exception as e:
+        logger.error(f"Error in analytics endpoint: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus scrape endpoint: stage latency histograms, frame/error counters,
+    face and eye found ratios, active sessions and resident memory."""
+    try:
+        text = metrics.render_metrics(get_service().metrics_snapshot())
+        return Response(text, content_type='text/plain; version=0.0.4; charset=utf-8')
+
+    except Exception as e:
+        logger.error(f"Error in metrics endpoint: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+def main():
+    global DETECTOR_WORKERS
+    parser = argparse.ArgumentParser(description='Drowsiness detection backend')
+    parser.add_argument('--host', type=str, default='0.0.0.0', help='Interface to bind')
+    parser.add_argument('--port', type=int, default=5001, help='Port to listen on')
+    parser.add_argument('--workers', type=int, default=DETECTOR_WORKERS,
+                        help='Detector worker processes (0 = detect in-process with the debug server)')
+    args = parser.parse_args()
+    DETECTOR_WORKERS = args.workers
+
     # Create necessary directories
     os.makedirs('logs', exist_ok=True)
-    
-    # Start the server
-    app.run(host='0.0.0.0', port=5001, debug=True) 
\ No newline at end of file
+
+    if args.workers <= 0:
+        # Start the development server
+        app.run(host=args.host, port=args.port, debug=True)
+        return
+
+    # Detector worker processes behind Werkzeug's threaded server, without the
+    # reloader (it would start a second set). For production, serve app:app from
+    # a WSGI server with DETECTOR_WORKERS set instead (see README).
+    engine = init_services(args.workers)
+    try:
+        app.run(host=args.host, port=args.port, debug=False, threaded=True)
+    finally:
+        engine.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from classifier_pool import ClassifierPool
+from drowsiness_detector import DrowsinessDetector, FrameMeasurement
+
+class CascadeWorkerPool:
+    """Thread pool for the stateless decode/cascade stages of detection.
+
+    Each item checks a face/eye cascade pair out of a ``ClassifierPool``, so
+    ``detectMultiScale`` (which releases the GIL) never shares classifier
+    state between threads. The classifier pool is shared with single-frame
+    requests when passed in.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, classifiers: Optional[ClassifierPool] = None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.classifiers = classifiers or ClassifierPool(self.max_workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                            thread_name_prefix='cascade-worker')
+
+    def _call(self, fn: Callable[..., Any], item: Any) -> Any:
+        with self.classifiers.checkout() as (face_cascade, eye_cascade):
+            return fn(item, face_cascade, eye_cascade)
+
+    def run(self, fn: Callable[..., Any], items: Iterable[Any]) -> List[Any]:
+        """Map ``fn(item, face_cascade, eye_cascade)`` over items, preserving order."""
+        return list(self._executor.map(lambda item: self._call(fn, item), items))
+
+    def measure(self,
+                detector: DrowsinessDetector,
+                frames: Sequence[np.ndarray],
+                timestamps: Optional[Sequence[Optional[float]]] = None) -> List[Optional[FrameMeasurement]]:
+        """Measure frames (captured at ``timestamps``) for one detector across the pool, preserving order."""
+        if timestamps is None:
+            timestamps = [None] * len(frames)
+        return self.run(lambda item, face, eye: detector.safe_measure(item[0], face, eye, item[1]),
+                        zip(frames, timestamps))
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,70 @@
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from drowsiness_detector import load_cascades
+
+CascadePair = Tuple[cv2.CascadeClassifier, cv2.CascadeClassifier]
+
+class PoolExhaustedError(RuntimeError):
+    """Raised when no classifier pair frees up within the checkout timeout."""
+
+def warm_cascades(face_cascade: cv2.CascadeClassifier, eye_cascade: cv2.CascadeClassifier):
+    """Run each cascade once so its feature evaluator buffers exist before the first request."""
+    blank = np.zeros((240, 320), dtype=np.uint8)
+    face_cascade.detectMultiScale(blank, 1.3, 5)
+    eye_cascade.detectMultiScale(blank[:120, :160])
+
+class ClassifierPool:
+    """Fixed set of pre-loaded, pre-warmed face/eye cascade pairs.
+
+    ``CascadeClassifier`` objects are not safe to share between threads, so
+    each frame checks out a pair for the duration of its cascade stages and
+    returns it afterwards. All XML loading and warm-up happens at
+    construction; requests only ever pay for a queue get/put. The most
+    recently returned pair is handed out first to keep it cache-hot.
+    """
+
+    def __init__(self,
+                 size: Optional[int] = None,
+                 loader: Callable[[], CascadePair] = load_cascades,
+                 timeout: Optional[float] = 30.0):
+        self.size = size or os.cpu_count() or 1
+        self.timeout = timeout
+        self._idle: 'queue.LifoQueue[CascadePair]' = queue.LifoQueue()
+        for _ in range(self.size):
+            pair = loader()
+            warm_cascades(*pair)
+            self._idle.put(pair)
+        self.checkouts = 0
+        self.waits = 0
+        self._stats_lock = threading.Lock()
+
+    @contextmanager
+    def checkout(self) -> Iterator[CascadePair]:
+        """Borrow a cascade pair, blocking until one is free."""
+        try:
+            pair = self._idle.get_nowait()
+            waited = False
+        except queue.Empty:
+            waited = True
+            try:
+                pair = self._idle.get(timeout=self.timeout)
+            except queue.Empty:
+                raise PoolExhaustedError(f'No cascade pair free after {self.timeout}s')
+        with self._stats_lock:
+            self.checkouts += 1
+            self.waits += waited
+        try:
+            yield pair
+        finally:
+            self._idle.put(pair)
+
+    @property
+    def available(self) -> int:
+        return self._idle.qsize()
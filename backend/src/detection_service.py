@@ -0,0 +1,239 @@
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from batch_processor import CascadeWorkerPool
+from classifier_pool import ClassifierPool
+from frame_rate import FrameRateController
+from drowsiness_detector import DetectionResult, FrameMeasurement
+from frame_decoder import FrameDecodeError, decode_data_url, decode_grayscale
+import metrics
+from response_codec import compact_response
+from session_registry import Session, SessionRegistry
+
+logger = logging.getLogger(__name__)
+
+# An encoded frame as received: raw image bytes or a base64 data URL
+EncodedImage = Union[bytes, str]
+
+def decode_image(image: EncodedImage, reduce: int = 1) -> np.ndarray:
+    """Decode raw bytes or a data URL straight to a grayscale frame."""
+    if isinstance(image, str):
+        return decode_data_url(image, reduce)
+    return decode_grayscale(image, reduce)
+
+def decode_timed(image: EncodedImage, reduce: int = 1) -> Tuple[np.ndarray, float]:
+    """``decode_image`` plus its decode-stage metrics; returns the frame and the seconds taken."""
+    decode_start = time.perf_counter()
+    try:
+        frame = decode_image(image, reduce)
+    except FrameDecodeError:
+        metrics.ERRORS.labels('decode').inc()
+        raise
+    decode_seconds = time.perf_counter() - decode_start
+    metrics.DECODE_STAGE.observe(decode_seconds)
+    return frame, decode_seconds
+
+def record_result(session: Session, result: DetectionResult) -> Dict[str, Any]:
+    """Update the session's statistics with a detection result and build the response."""
+    # Update session statistics
+    if result.is_drowsy:
+        session.drowsy_count += 1
+
+        # Add to alert history (the ring keeps only the last 100 alerts)
+        session.alert_history.push((result.timestamp, result.ear, result.confidence))
+        session.last_alert_time = result.timestamp
+
+    # Get session statistics
+    stats = session.detector.get_session_stats()
+
+    # Prepare response
+    return {
+        'session_id': session.session_id,
+        'is_drowsy': result.is_drowsy,
+        'ear': result.ear,
+        'mar': result.mar,
+        'blink_rate': result.blink_rate,
+        'confidence': result.confidence,
+        'face_detected': result.face_detected,
+        'stats': stats,
+        'settings': session.settings
+    }
+
+def decode_and_measure(item: Tuple[Session, EncodedImage, int, Optional[float]],
+                       face_cascade, eye_cascade) -> Tuple[Optional[FrameMeasurement], Optional[str]]:
+    """Pool worker: decode one batch frame and run its cascade stages."""
+    session, image, reduce, timestamp = item
+    decode_start = time.perf_counter()
+    try:
+        frame = decode_image(image, reduce)
+    except FrameDecodeError as e:
+        metrics.ERRORS.labels('decode').inc()
+        return None, str(e)
+    metrics.DECODE_STAGE.observe(time.perf_counter() - decode_start)
+    return session.detector.safe_measure(frame, face_cascade, eye_cascade, timestamp), None
+
+class DetectionService:
+    """Session-aware detection operations behind the HTTP and streaming endpoints.
+
+    Runs in-process over a ``SessionRegistry``; ``WorkerEngine`` exposes the
+    same methods and forwards them to worker processes running this class.
+    Safe to call from many request threads: frames of different sessions run
+    in parallel on pooled classifiers, while each session's frames and
+    settings changes are serialized by its lock.
+    """
+
+    def __init__(self,
+                 registry: SessionRegistry,
+                 pool: Optional[CascadeWorkerPool] = None,
+                 classifiers: Optional[ClassifierPool] = None,
+                 frame_rate: Optional[FrameRateController] = None,
+                 stats_interval: float = 1.0):
+        self.registry = registry
+        self.pool = pool
+        if classifiers is None:
+            classifiers = pool.classifiers if pool is not None else ClassifierPool()
+        self.classifiers = classifiers
+        self.frame_rate = frame_rate or FrameRateController()
+        # Seconds between stats updates in compact responses
+        self.stats_interval = stats_interval
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+
+    def load(self) -> float:
+        """Frames currently in flight per classifier pair (above 1 means frames are queueing)."""
+        return self._in_flight / self.classifiers.size
+
+    def detect(self,
+               session_id: Optional[str],
+               image: EncodedImage,
+               reduce: int = 1,
+               load: Optional[float] = None,
+               compact: bool = False) -> Dict[str, Any]:
+        """Decode one frame, run detection for its session and return the response dict.
+
+        The response carries ``recommended_interval_ms`` for the client's next
+        capture, based on the session's EAR trend and ``load`` (this service's
+        own in-flight load when not given). With ``compact``, settings and
+        stats are delta-encoded against what the session's client was last
+        sent (see ``compact_response``). Raises ``FrameDecodeError`` if the
+        image cannot be decoded.
+        """
+        with self._in_flight_lock:
+            self._in_flight += 1
+        try:
+            # Decode image data straight to grayscale
+            frame, decode_seconds = decode_timed(image, reduce)
+            return self._detect(session_id, frame, decode_seconds, self.load() if load is None else load, compact)
+        finally:
+            with self._in_flight_lock:
+                self._in_flight -= 1
+
+    def detect_frame(self,
+                     session_id: Optional[str],
+                     frame: np.ndarray,
+                     decode_seconds: float = 0.0,
+                     load: Optional[float] = None,
+                     compact: bool = False) -> Dict[str, Any]:
+        """``detect`` for a frame already decoded elsewhere, e.g. by ``WorkerEngine`` into shared memory.
+
+        ``frame`` may be a view into a shared buffer that is reused once this
+        returns, so nothing here keeps a reference to it.
+        """
+        with self._in_flight_lock:
+            self._in_flight += 1
+        try:
+            return self._detect(session_id, frame, decode_seconds, self.load() if load is None else load, compact)
+        finally:
+            with self._in_flight_lock:
+                self._in_flight -= 1
+
+    def _detect(self, session_id: Optional[str], frame: np.ndarray, decode_seconds: float, load: float,
+                compact: bool = False) -> Dict[str, Any]:
+        session = self.registry.get_or_create(session_id)
+
+        # Detect drowsiness and prepare response, one frame per session at a time
+        with session.lock:
+            with self.classifiers.checkout() as (face_cascade, eye_cascade):
+                result = session.detector.detect_drowsiness(frame, None, face_cascade, eye_cascade)
+            response = self._record(session, result)
+            response['recommended_interval_ms'] = self.frame_rate.recommend(session.detector, result, load)
+            response['decode_ms'] = decode_seconds * 1000
+            if compact:
+                response = compact_response(response, session.compact, session.settings_version,
+                                            self.stats_interval)
+        return response
+
+    def detect_batch(self, items: List[Dict[str, Any]], reduce: int = 1) -> List[Dict[str, Any]]:
+        """Detect over ``{image, session_id, timestamp}`` items from one or more sessions.
+
+        Decoding and cascades run across the pool (when configured); per-session
+        temporal state is then updated in item order. Results keep item order.
+        """
+        # Resolve each distinct requested session ID once
+        resolved: Dict[Optional[str], Session] = {}
+        for item in items:
+            requested = item.get('session_id')
+            if requested not in resolved:
+                resolved[requested] = self.registry.get_or_create(requested)
+
+        work = [(resolved[item.get('session_id')], item['image'], reduce, item.get('timestamp')) for item in items]
+        if self.pool is not None:
+            measured = self.pool.run(decode_and_measure, work)
+        else:
+            with self.classifiers.checkout() as (face_cascade, eye_cascade):
+                measured = [decode_and_measure(entry, face_cascade, eye_cascade) for entry in work]
+
+        results = []
+        for item, (session, _, _, _), (measurement, error) in zip(items, work, measured):
+            if error is not None:
+                results.append({'session_id': session.session_id, 'error': error})
+                continue
+            with session.lock:
+                result = session.detector.update_state(measurement, item.get('timestamp'))
+                results.append(self._record(session, result))
+        return results
+
+    def _record(self, session: Session, result: DetectionResult) -> Dict[str, Any]:
+        """``record_result`` plus a (non-blocking) write to the session store. Caller holds the session lock."""
+        response = record_result(session, result)
+        store = self.registry.store
+        if store is not None:
+            blink_count = session.detector.blink_count
+            store.record_frame(session.session_id, result, session.drowsy_count, blink_count,
+                               session.last_alert_time, blink_count - session.blink_count)
+            session.blink_count = blink_count
+        return response
+
+    def get_settings(self, session_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        session = self.registry.find(session_id)
+        return session.settings if session is not None else None
+
+    def update_settings(self, session_id: Optional[str], new_settings: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Update only provided settings and the session's detector parameters."""
+        session = self.registry.find(session_id)
+        if session is None:
+            return None
+        with session.lock:
+            settings = session.apply_settings(new_settings)
+            if self.registry.store is not None:
+                self.registry.store.save_settings(session.session_id, settings)
+            return settings
+
+    def reset(self, session_id: Optional[str]) -> bool:
+        """Reset detector and session data; False if the session is unknown."""
+        return self.registry.reset(session_id) is not None
+
+    def session_count(self) -> int:
+        return len(self.registry)
+
+    def metrics_snapshot(self) -> metrics.Snapshot:
+        """This process's metrics plus its session and memory gauges."""
+        return metrics.METRICS.snapshot(metrics.process_gauges(self.session_count()))
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown()
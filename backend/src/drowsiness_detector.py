@@ -1,22 +1,60 @@
 import cv2
 import numpy as np
-from scipy.spatial import distance
 import time
 import logging
-from typing import Tuple, Dict, List, Optional
+from typing import Tuple, Dict, List, Optional, Sequence
 import threading
-from dataclasses import dataclass
-from datetime import datetime
+from dataclasses import dataclass, replace
+from face_tracker import FaceBox, FaceTracker, SearchWindow
+from geometry import eye_aspect_ratio, extreme_points_to_eye, mouth_aspect_ratio, to_scalar
+import metrics
+from ring_buffer import ColumnarRing, RollingWindow
 
 @dataclass
 class DetectionResult:
+    __slots__ = ('is_drowsy', 'ear', 'mar', 'blink_rate', 'confidence', 'face_detected', 'timestamp')
     is_drowsy: bool
     ear: float
     mar: float
     blink_rate: float
     confidence: float
     face_detected: bool
-    timestamp: datetime
+    timestamp: float  # epoch seconds
+
+# Packed per-frame history row: 17 bytes instead of a DetectionResult plus datetime
+DETECTION_DTYPE = np.dtype([
+    ('timestamp', np.float64),
+    ('ear', np.float32),
+    ('confidence', np.float32),
+    ('drowsy', np.bool_)
+])
+
+@dataclass
+class FrameMeasurement:
+    face_detected: bool
+    eyes_detected: bool
+    ear: float
+    face_box: Optional[FaceBox] = None
+    tracked: bool = False
+
+# Static-frame fingerprint: the eye band of the last face (or the whole frame) shrunk to 16x8
+STATIC_FINGERPRINT_SIZE = (16, 8)
+
+def frame_fingerprint(gray: np.ndarray, face_box: Optional[FaceBox] = None) -> np.ndarray:
+    """Tiny area-averaged thumbnail used to spot frames that barely changed."""
+    region = gray
+    if face_box is not None:
+        x, y, w, h = face_box
+        band = gray[y + h // 5:y + h // 2, x:x + w]
+        if band.size:
+            region = band
+    return cv2.resize(region, STATIC_FINGERPRINT_SIZE, interpolation=cv2.INTER_AREA)
+
+def load_cascades() -> Tuple[cv2.CascadeClassifier, cv2.CascadeClassifier]:
+    """Load the Haar face and eye cascade classifiers."""
+    face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+    eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
+    return face_cascade, eye_cascade
 
 class DrowsinessDetector:
     def __init__(self, 
@@ -24,10 +62,21 @@ class DrowsinessDetector:
                  mar_threshold: float = 0.30,
                  consecutive_frames: int = 3,
                  blink_threshold: float = 0.15,
-                 yawn_threshold: float = 0.35):
-        # Initialize face and eye cascade classifiers
-        self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-        self.eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
+                 yawn_threshold: float = 0.35,
+                 face_cascade: Optional[cv2.CascadeClassifier] = None,
+                 eye_cascade: Optional[cv2.CascadeClassifier] = None,
+                 face_tracking: bool = True,
+                 redetect_interval: int = 10,
+                 ear_window: int = 30,
+                 history_size: int = 100,
+                 static_threshold: float = 2.0,
+                 max_static_frames: int = 15,
+                 max_static_age: float = 0.5):
+        # Initialize face and eye cascade classifiers (shared when provided)
+        if face_cascade is None or eye_cascade is None:
+            face_cascade, eye_cascade = load_cascades()
+        self.face_cascade = face_cascade
+        self.eye_cascade = eye_cascade
         
         # Detection parameters
         self.EAR_THRESHOLD = ear_threshold
@@ -35,15 +84,31 @@ class DrowsinessDetector:
         self.CONSECUTIVE_FRAMES = consecutive_frames
         self.BLINK_THRESHOLD = blink_threshold
         self.YAWN_THRESHOLD = yawn_threshold
+        # Mean absolute fingerprint change (gray levels) below which a frame is static; 0 disables
+        self.STATIC_THRESHOLD = static_threshold
+        self.MAX_STATIC_FRAMES = max_static_frames
+        # Seconds a measurement may be reused for, so a slow change such as an eye closure is re-measured quickly
+        self.MAX_STATIC_AGE = max_static_age
         
         # State variables
         self.consecutive_frames_count = 0
         self.last_blink_time = time.time()
         self.blink_count = 0
         self.session_start_time = time.time()
-        self.ear_history: List[float] = []
-        self.mar_history: List[float] = []
-        self.detection_history: List[DetectionResult] = []
+        # Fixed-capacity windows with running statistics (O(1) per frame)
+        self.ear_history = RollingWindow(ear_window)
+        self.mar_history = RollingWindow(ear_window)
+        self.detection_history = ColumnarRing(history_size, DETECTION_DTYPE,
+                                              summed=('ear', 'confidence', 'drowsy'))
+        
+        # Static-frame short-circuit: last fully measured fingerprint, measurement and its time
+        self._static_reference: Optional[Tuple[np.ndarray, FrameMeasurement, float]] = None
+        self._static_run = 0
+        self.static_hits = 0
+        self.static_checks = 0
+        
+        # Face ROI tracking between periodic full-frame detections
+        self.tracker = FaceTracker(redetect_interval=redetect_interval) if face_tracking else None
         
         # Thread safety
         self._lock = threading.Lock()
@@ -53,36 +118,20 @@ class DrowsinessDetector:
         self.logger = logging.getLogger(__name__)
 
     def calculate_ear(self, eye_points: np.ndarray) -> float:
-        """Calculate Eye Aspect Ratio (EAR) from eye landmarks."""
+        """Calculate Eye Aspect Ratio (EAR) from 6-point or [left, top, right, bottom] eye landmarks."""
         try:
-            # Calculate vertical distances
-            v1 = distance.euclidean(eye_points[1], eye_points[5])
-            v2 = distance.euclidean(eye_points[2], eye_points[4])
-            
-            # Calculate horizontal distance
-            h = distance.euclidean(eye_points[0], eye_points[3])
-            
-            # Calculate EAR
-            ear = (v1 + v2) / (2.0 * h)
-            return ear
+            eye_points = np.asarray(eye_points)
+            if eye_points.shape[-2] == 4:
+                eye_points = extreme_points_to_eye(eye_points)
+            return to_scalar(eye_aspect_ratio(eye_points))
         except Exception as e:
             self.logger.error(f"Error calculating EAR: {str(e)}")
             return 0.0
 
     def calculate_mar(self, mouth_points: np.ndarray) -> float:
-        """Calculate Mouth Aspect Ratio (MAR) from mouth landmarks."""
+        """Calculate Mouth Aspect Ratio (MAR) from 8-point mouth landmarks."""
         try:
-            # Calculate vertical distances
-            v1 = distance.euclidean(mouth_points[1], mouth_points[7])
-            v2 = distance.euclidean(mouth_points[2], mouth_points[6])
-            v3 = distance.euclidean(mouth_points[3], mouth_points[5])
-            
-            # Calculate horizontal distance
-            h = distance.euclidean(mouth_points[0], mouth_points[4])
-            
-            # Calculate MAR
-            mar = (v1 + v2 + v3) / (2.0 * h)
-            return mar
+            return to_scalar(mouth_aspect_ratio(mouth_points))
         except Exception as e:
             self.logger.error(f"Error calculating MAR: {str(e)}")
             return 0.0
@@ -90,8 +139,8 @@ class DrowsinessDetector:
     def get_eye_landmarks(self, eye_region: np.ndarray) -> Optional[np.ndarray]:
         """Extract eye landmarks using contour detection."""
         try:
-            # Convert to grayscale
-            gray_eye = cv2.cvtColor(eye_region, cv2.COLOR_BGR2GRAY)
+            # Convert to grayscale (callers usually pass a grayscale ROI already)
+            gray_eye = eye_region if eye_region.ndim == 2 else cv2.cvtColor(eye_region, cv2.COLOR_BGR2GRAY)
             
             # Apply threshold
             _, thresh = cv2.threshold(gray_eye, 30, 255, cv2.THRESH_BINARY_INV)
@@ -120,61 +169,171 @@ class DrowsinessDetector:
             self.logger.error(f"Error getting eye landmarks: {str(e)}")
             return None
 
-    def detect_drowsiness(self, frame: np.ndarray) -> DetectionResult:
-        """Detect drowsiness in the given frame."""
-        try:
-            # Convert to grayscale
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            
-            # Detect faces
-            faces = self.face_cascade.detectMultiScale(gray, 1.3, 5)
-            
-            if len(faces) == 0:
-                return DetectionResult(
-                    is_drowsy=False,
-                    ear=0.0,
-                    mar=0.0,
-                    blink_rate=0.0,
-                    confidence=0.0,
-                    face_detected=False,
-                    timestamp=datetime.now()
-                )
-            
-            # Process the largest face
-            face = max(faces, key=lambda x: x[2] * x[3])
-            x, y, w, h = face
-            
-            # Extract face region
-            face_roi = gray[y:y+h, x:x+w]
-            
-            # Detect eyes
-            eyes = self.eye_cascade.detectMultiScale(face_roi)
-            
-            if len(eyes) < 2:
-                return DetectionResult(
-                    is_drowsy=False,
-                    ear=0.0,
-                    mar=0.0,
-                    blink_rate=0.0,
-                    confidence=0.0,
-                    face_detected=True,
-                    timestamp=datetime.now()
-                )
-            
-            # Process each eye
-            ear_values = []
-            for (ex, ey, ew, eh) in eyes:
-                eye_roi = face_roi[ey:ey+eh, ex:ex+ew]
-                landmarks = self.get_eye_landmarks(eye_roi)
-                if landmarks is not None:
-                    ear = self.calculate_ear(landmarks)
-                    ear_values.append(ear)
-            
-            # Calculate average EAR
-            avg_ear = np.mean(ear_values) if ear_values else 0.0
-            
+    def _empty_result(self, face_detected: bool, timestamp: Optional[float] = None) -> DetectionResult:
+        return DetectionResult(
+            is_drowsy=False,
+            ear=0.0,
+            mar=0.0,
+            blink_rate=0.0,
+            confidence=0.0,
+            face_detected=face_detected,
+            timestamp=timestamp if timestamp is not None else time.time()
+        )
+
+    def measure_frame(self,
+                      frame: np.ndarray,
+                      face_cascade: Optional[cv2.CascadeClassifier] = None,
+                      eye_cascade: Optional[cv2.CascadeClassifier] = None,
+                      timestamp: Optional[float] = None) -> FrameMeasurement:
+        """Run the stateless stages (face/eye cascades, landmarks, EAR) on one frame.
+
+        Only reads session state (the face tracker's last box and the
+        static-frame reference, under the lock), so it may run on any worker
+        thread; workers pass their own cascade classifiers. A frame whose
+        fingerprint differs from the last fully measured one by less than
+        ``STATIC_THRESHOLD`` reuses that measurement, at most
+        ``MAX_STATIC_FRAMES`` times in a row and never once it is more than
+        ``MAX_STATIC_AGE`` seconds older than ``timestamp`` (capture time,
+        defaulting to now).
+        """
+        if face_cascade is None:
+            face_cascade = self.face_cascade
+        if eye_cascade is None:
+            eye_cascade = self.eye_cascade
+
+        # Convert to grayscale unless the frame was decoded straight to gray
+        gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        
+        # Reuse the last measurement when the frame barely changed
+        now = timestamp if timestamp is not None else time.time()
+        if self.STATIC_THRESHOLD > 0:
+            reused = self._reuse_static(gray, now)
+            if reused is not None:
+                return reused
+        measurement = self._measure_gray(gray, face_cascade, eye_cascade)
+        if self.STATIC_THRESHOLD > 0:
+            fingerprint = frame_fingerprint(gray, measurement.face_box)
+            with self._lock:
+                self._static_reference = (fingerprint, measurement, now)
+                self._static_run = 0
+        return measurement
+
+    def _reuse_static(self, gray: np.ndarray, now: float) -> Optional[FrameMeasurement]:
+        """The last measurement if ``gray`` matches its fingerprint and it is recent enough, else None."""
+        with self._lock:
+            reference = self._static_reference
+            if reference is None or self._static_run >= self.MAX_STATIC_FRAMES:
+                return None
+            if not 0 <= now - reference[2] <= self.MAX_STATIC_AGE:
+                return None
+            self.static_checks += 1
+        fingerprint, measurement, _ = reference
+        current = frame_fingerprint(gray, measurement.face_box)
+        if current.shape != fingerprint.shape:
+            return None
+        change = float(np.abs(current.astype(np.int16) - fingerprint).mean())
+        if change >= self.STATIC_THRESHOLD:
+            return None
+        with self._lock:
+            self._static_run += 1
+            self.static_hits += 1
+        metrics.STATIC_HIT_COUNT.inc()
+        # The face has not moved, so the tracker keeps its window
+        return replace(measurement, tracked=True) if measurement.face_box is not None else measurement
+
+    def _measure_gray(self,
+                      gray: np.ndarray,
+                      face_cascade: cv2.CascadeClassifier,
+                      eye_cascade: cv2.CascadeClassifier) -> FrameMeasurement:
+        # Detect faces, near the last face when tracking, else over the whole frame
+        metrics.FRAME_COUNT.inc()
+        stage_start = time.perf_counter()
+        window = None
+        if self.tracker is not None:
+            with self._lock:
+                window = self.tracker.window(gray.shape)
+        faces = self._detect_faces(gray, face_cascade, window) if window is not None else []
+        tracked = len(faces) > 0
+        if not tracked:
+            faces = face_cascade.detectMultiScale(gray, 1.3, 5)
+        now = time.perf_counter()
+        metrics.FACE_STAGE.observe(now - stage_start)
+        stage_start = now
+        
+        if len(faces) == 0:
+            return FrameMeasurement(face_detected=False, eyes_detected=False, ear=0.0)
+        
+        # Process the largest face
+        face = max(faces, key=lambda x: x[2] * x[3])
+        x, y, w, h = (int(v) for v in face)
+        face_box = (x, y, w, h)
+        
+        # Extract face region
+        face_roi = gray[y:y+h, x:x+w]
+        
+        # Detect eyes
+        eyes = eye_cascade.detectMultiScale(face_roi)
+        metrics.FACE_COUNT.inc()
+        now = time.perf_counter()
+        metrics.EYE_STAGE.observe(now - stage_start)
+        stage_start = now
+        
+        if len(eyes) < 2:
+            return FrameMeasurement(face_detected=True, eyes_detected=False, ear=0.0,
+                                    face_box=face_box, tracked=tracked)
+        
+        # Collect landmarks for each eye
+        eye_landmarks = []
+        for (ex, ey, ew, eh) in eyes:
+            eye_roi = face_roi[ey:ey+eh, ex:ex+ew]
+            landmarks = self.get_eye_landmarks(eye_roi)
+            if landmarks is not None:
+                eye_landmarks.append(landmarks)
+        metrics.EYE_COUNT.inc()
+        
+        # Calculate EAR for all eyes at once and average the valid ones
+        avg_ear = 0.0
+        if eye_landmarks:
+            ear_values = eye_aspect_ratio(extreme_points_to_eye(np.stack(eye_landmarks)))
+            if not np.all(np.isnan(ear_values)):
+                avg_ear = float(np.nanmean(ear_values))
+        metrics.LANDMARK_STAGE.observe(time.perf_counter() - stage_start)
+        return FrameMeasurement(face_detected=True, eyes_detected=True, ear=avg_ear,
+                                face_box=face_box, tracked=tracked)
+
+    def _detect_faces(self,
+                      gray: np.ndarray,
+                      face_cascade: cv2.CascadeClassifier,
+                      window: SearchWindow) -> List[FaceBox]:
+        """Run the face cascade inside a tracking window; boxes are in frame coordinates."""
+        roi = gray[window.y:window.y + window.height, window.x:window.x + window.width]
+        faces = face_cascade.detectMultiScale(
+            roi, 1.3, 5,
+            minSize=(window.min_size, window.min_size),
+            maxSize=(window.max_size, window.max_size)
+        )
+        return [(fx + window.x, fy + window.y, fw, fh) for (fx, fy, fw, fh) in faces]
+
+    def update_state(self, measurement: Optional[FrameMeasurement], timestamp: Optional[float] = None) -> DetectionResult:
+        """Apply one frame's measurement to the temporal session state.
+
+        Measurements must be applied in capture order. ``timestamp`` is the
+        capture time in epoch seconds and defaults to now; a ``None``
+        measurement (failed frame) leaves the state untouched.
+        """
+        if measurement is not None and self.tracker is not None:
+            with self._lock:
+                self.tracker.update(measurement.face_box, measurement.tracked)
+        if measurement is None or not measurement.face_detected:
+            return self._empty_result(False, timestamp)
+        if not measurement.eyes_detected:
+            return self._empty_result(True, timestamp)
+
+        avg_ear = measurement.ear
+        current_time = timestamp if timestamp is not None else time.time()
+
+        with self._lock:
             # Update blink detection
-            current_time = time.time()
             if avg_ear < self.BLINK_THRESHOLD:
                 if current_time - self.last_blink_time > 0.3:  # Minimum time between blinks
                     self.blink_count += 1
@@ -185,19 +344,16 @@ class DrowsinessDetector:
             blink_rate = self.blink_count / session_duration if session_duration > 0 else 0
             
             # Update consecutive frames count
-            with self._lock:
-                if avg_ear < self.EAR_THRESHOLD:
-                    self.consecutive_frames_count += 1
-                else:
-                    self.consecutive_frames_count = 0
-                
-                # Update history
-                self.ear_history.append(avg_ear)
-                if len(self.ear_history) > 30:  # Keep last 30 frames
-                    self.ear_history.pop(0)
+            if avg_ear < self.EAR_THRESHOLD:
+                self.consecutive_frames_count += 1
+            else:
+                self.consecutive_frames_count = 0
+            
+            # Update history (keeps the last ear_window frames)
+            self.ear_history.push(avg_ear)
             
             # Calculate confidence based on history
-            confidence = 1.0 - (np.std(self.ear_history) if self.ear_history else 0.0)
+            confidence = 1.0 - self.ear_history.std
             
             # Create detection result
             result = DetectionResult(
@@ -207,27 +363,62 @@ class DrowsinessDetector:
                 blink_rate=blink_rate,
                 confidence=confidence,
                 face_detected=True,
-                timestamp=datetime.now()
+                timestamp=current_time
             )
             
-            # Update detection history
-            self.detection_history.append(result)
-            if len(self.detection_history) > 100:  # Keep last 100 detections
-                self.detection_history.pop(0)
-            
-            return result
-            
+            # Update detection history (keeps the last history_size detections)
+            self.detection_history.push((current_time, avg_ear, confidence, result.is_drowsy))
+        
+        return result
+
+    def detect_drowsiness(self,
+                          frame: np.ndarray,
+                          timestamp: Optional[float] = None,
+                          face_cascade: Optional[cv2.CascadeClassifier] = None,
+                          eye_cascade: Optional[cv2.CascadeClassifier] = None) -> DetectionResult:
+        """Detect drowsiness in the given BGR or already-grayscale frame.
+
+        ``timestamp`` is the capture time in seconds (e.g. video time for
+        recorded footage) and defaults to now. Concurrent callers pass
+        cascades checked out of a ``ClassifierPool``.
+        """
+        try:
+            return self.update_state(self.measure_frame(frame, face_cascade, eye_cascade, timestamp), timestamp)
         except Exception as e:
             self.logger.error(f"Error in detect_drowsiness: {str(e)}")
-            return DetectionResult(
-                is_drowsy=False,
-                ear=0.0,
-                mar=0.0,
-                blink_rate=0.0,
-                confidence=0.0,
-                face_detected=False,
-                timestamp=datetime.now()
-            )
+            metrics.ERRORS.labels('detection').inc()
+            return self._empty_result(False, timestamp)
+
+    def safe_measure(self,
+                     frame: np.ndarray,
+                     face_cascade: Optional[cv2.CascadeClassifier] = None,
+                     eye_cascade: Optional[cv2.CascadeClassifier] = None,
+                     timestamp: Optional[float] = None) -> Optional[FrameMeasurement]:
+        """``measure_frame`` that logs and returns None instead of raising."""
+        try:
+            return self.measure_frame(frame, face_cascade, eye_cascade, timestamp)
+        except Exception as e:
+            self.logger.error(f"Error measuring frame: {str(e)}")
+            metrics.ERRORS.labels('detection').inc()
+            return None
+
+    def detect_batch(self,
+                     frames: Sequence[np.ndarray],
+                     timestamps: Optional[Sequence[Optional[float]]] = None,
+                     pool=None) -> List[DetectionResult]:
+        """Detect drowsiness over a burst of frames from this session.
+
+        The cascade stages run across ``pool`` (a ``CascadeWorkerPool``) when
+        given; the temporal state is then updated in frame order so
+        consecutive-frame and blink counters match sequential processing.
+        """
+        if timestamps is None:
+            timestamps = [None] * len(frames)
+        if pool is None:
+            measurements = [self.safe_measure(frame, timestamp=ts) for frame, ts in zip(frames, timestamps)]
+        else:
+            measurements = pool.measure(self, frames, timestamps)
+        return [self.update_state(m, ts) for m, ts in zip(measurements, timestamps)]
 
     def get_session_stats(self) -> Dict:
         """Get current session statistics."""
@@ -236,11 +427,30 @@ class DrowsinessDetector:
                 'duration': time.time() - self.session_start_time,
                 'blink_count': self.blink_count,
                 'blink_rate': self.blink_count / ((time.time() - self.session_start_time) / 60.0),
-                'drowsy_count': sum(1 for d in self.detection_history if d.is_drowsy),
-                'avg_confidence': np.mean([d.confidence for d in self.detection_history]) if self.detection_history else 0.0,
-                'avg_ear': np.mean([d.ear for d in self.detection_history]) if self.detection_history else 0.0
+                'drowsy_count': int(round(self.detection_history.sum('drowsy'))),
+                'avg_confidence': self.detection_history.mean('confidence'),
+                'avg_ear': self.detection_history.mean('ear')
             }
 
+    def get_history_summary(self, since: Optional[float] = None) -> Dict:
+        """Vectorized reductions over the detection history, optionally from ``since`` (epoch seconds)."""
+        with self._lock:
+            records = self.detection_history.records()
+        if since is not None:
+            records = records[records['timestamp'] >= since]
+        if len(records) == 0:
+            return {'frames': 0, 'drowsy_count': 0, 'avg_ear': 0.0, 'min_ear': 0.0,
+                    'max_ear': 0.0, 'avg_confidence': 0.0}
+        ear = records['ear']
+        return {
+            'frames': int(len(records)),
+            'drowsy_count': int(np.count_nonzero(records['drowsy'])),
+            'avg_ear': float(ear.mean()),
+            'min_ear': float(ear.min()),
+            'max_ear': float(ear.max()),
+            'avg_confidence': float(records['confidence'].mean())
+        }
+
     def reset_session(self):
         """Reset session statistics."""
         with self._lock:
@@ -249,4 +459,8 @@ class DrowsinessDetector:
             self.consecutive_frames_count = 0
             self.ear_history.clear()
             self.mar_history.clear()
-            self.detection_history.clear() 
\ No newline at end of file
+            self.detection_history.clear()
+            if self.tracker is not None:
+                self.tracker.reset()
+            self._static_reference = None
+            self._static_run = 0 
\ No newline at end of file
@@ -0,0 +1,72 @@
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+FaceBox = Tuple[int, int, int, int]
+
+@dataclass
+class SearchWindow:
+    x: int
+    y: int
+    width: int
+    height: int
+    min_size: int
+    max_size: int
+
+class FaceTracker:
+    """Restricts face detection to a window around the previous face.
+
+    Between full-frame detections the cascade only scans the last face box
+    expanded by ``search_margin`` (a fraction of the face size), limited to
+    face sizes within ``size_tolerance`` of the last one. A full-frame
+    re-detect runs every ``redetect_interval`` frames or after the face is lost.
+    """
+
+    def __init__(self,
+                 redetect_interval: int = 10,
+                 search_margin: float = 0.5,
+                 size_tolerance: float = 0.3):
+        self.redetect_interval = redetect_interval
+        self.search_margin = search_margin
+        self.size_tolerance = size_tolerance
+        self.last_face: Optional[FaceBox] = None
+        self.frames_since_detect = 0
+        self.tracked_frames = 0
+        self.full_frames = 0
+
+    def window(self, frame_shape: Tuple[int, ...]) -> Optional[SearchWindow]:
+        """Return the region to search in, or None when a full-frame detect is due."""
+        if self.last_face is None or self.frames_since_detect >= self.redetect_interval:
+            return None
+
+        x, y, w, h = self.last_face
+        frame_h, frame_w = frame_shape[:2]
+        margin_x = int(w * self.search_margin)
+        margin_y = int(h * self.search_margin)
+        x0 = max(0, x - margin_x)
+        y0 = max(0, y - margin_y)
+        x1 = min(frame_w, x + w + margin_x)
+        y1 = min(frame_h, y + h + margin_y)
+
+        size = max(w, h)
+        return SearchWindow(
+            x=x0,
+            y=y0,
+            width=x1 - x0,
+            height=y1 - y0,
+            min_size=max(1, int(size * (1.0 - self.size_tolerance))),
+            max_size=int(size * (1.0 + self.size_tolerance)) + 1
+        )
+
+    def update(self, face: Optional[FaceBox], tracked: bool):
+        """Record the face found this frame (None if lost) and how it was found."""
+        if tracked:
+            self.tracked_frames += 1
+            self.frames_since_detect += 1
+        else:
+            self.full_frames += 1
+            self.frames_since_detect = 0
+        self.last_face = face
+
+    def reset(self):
+        self.last_face = None
+        self.frames_since_detect = 0
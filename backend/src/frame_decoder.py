@@ -0,0 +1,93 @@
+import base64
+import io
+import sys
+import time
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# Content types accepted as a raw encoded frame body
+RAW_CONTENT_TYPES = ('image/jpeg', 'image/png', 'image/webp', 'application/octet-stream')
+
+# Decode flags for a direct-to-grayscale decode, keyed by downscale factor
+GRAYSCALE_DECODE_FLAGS = {
+    1: cv2.IMREAD_GRAYSCALE,
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8
+}
+
+class FrameDecodeError(ValueError):
+    """Raised when a request body cannot be decoded into a frame."""
+
+def decode_grayscale(data: bytes, reduce: int = 1) -> np.ndarray:
+    """Decode encoded image bytes straight into a grayscale buffer.
+
+    ``reduce`` of 2, 4 or 8 lets libjpeg decode at reduced resolution, which is
+    considerably cheaper than decoding full size and resizing afterwards.
+    """
+    if reduce not in GRAYSCALE_DECODE_FLAGS:
+        raise FrameDecodeError(f"Unsupported reduce factor: {reduce}")
+    if not data:
+        raise FrameDecodeError("Empty image data")
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    gray = cv2.imdecode(buffer, GRAYSCALE_DECODE_FLAGS[reduce])
+    if gray is None:
+        raise FrameDecodeError("Could not decode image data")
+    return gray
+
+def decode_data_url(data_url: str, reduce: int = 1) -> np.ndarray:
+    """Decode a base64 data URL (the legacy JSON payload) into a grayscale buffer."""
+    try:
+        encoded = data_url.split(',', 1)[1] if ',' in data_url else data_url
+        data = base64.b64decode(encoded)
+    except (TypeError, ValueError) as e:
+        raise FrameDecodeError(f"Invalid base64 image data: {str(e)}")
+    return decode_grayscale(data, reduce)
+
+def decode_legacy(data_url: str) -> np.ndarray:
+    """Original decode path: base64 -> PIL -> NumPy -> BGR -> grayscale."""
+    image_data = base64.b64decode(data_url.split(',')[1])
+    image = Image.open(io.BytesIO(image_data))
+    frame = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+def compare_decode(data: bytes, repeats: int = 50, reduce: int = 1) -> Tuple[float, float]:
+    """Return mean (legacy_ms, direct_ms) per frame for the given JPEG bytes."""
+    data_url = 'data:image/jpeg;base64,' + base64.b64encode(data).decode('ascii')
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        decode_legacy(data_url)
+    legacy_ms = (time.perf_counter() - start) * 1000 / repeats
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        decode_grayscale(data, reduce)
+    direct_ms = (time.perf_counter() - start) * 1000 / repeats
+
+    return legacy_ms, direct_ms
+
+def parse_reduce(value: Optional[str]) -> int:
+    """Parse a ``reduce`` query/header value, defaulting to full resolution."""
+    if not value:
+        return 1
+    try:
+        reduce = int(value)
+    except ValueError:
+        raise FrameDecodeError(f"Invalid reduce factor: {value}")
+    if reduce not in GRAYSCALE_DECODE_FLAGS:
+        raise FrameDecodeError(f"Unsupported reduce factor: {reduce}")
+    return reduce
+
+if __name__ == '__main__':
+    # Usage: python frame_decoder.py frame.jpg [reduce]
+    with open(sys.argv[1], 'rb') as f:
+        jpeg = f.read()
+    factor = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    legacy, direct = compare_decode(jpeg, reduce=factor)
+    print(f"legacy decode: {legacy:.2f} ms/frame")
+    print(f"direct decode (reduce={factor}): {direct:.2f} ms/frame")
+    print(f"saved: {legacy - direct:.2f} ms/frame ({(1 - direct / legacy) * 100:.0f}%)")
@@ -0,0 +1,54 @@
+from drowsiness_detector import DetectionResult, DrowsinessDetector
+
+class FrameRateController:
+    """Recommends when a client should capture its next frame.
+
+    Sessions whose EAR sits well above the threshold and is steady are
+    sampled slowly; as the recent EAR (projected along its trend and less
+    its jitter) approaches the threshold, or during a below-threshold streak,
+    the interval shrinks to the full rate. When the server is backed up
+    (``load`` above 1, i.e. more frames in flight than detection slots),
+    stable sessions are slowed further while urgent ones keep full rate.
+    """
+
+    def __init__(self,
+                 min_interval_ms: int = 100,
+                 max_interval_ms: int = 1000,
+                 no_face_interval_ms: int = 250,
+                 stable_margin: float = 0.5,
+                 max_load_factor: float = 4.0):
+        self.min_interval_ms = min_interval_ms
+        self.max_interval_ms = max_interval_ms
+        self.no_face_interval_ms = no_face_interval_ms
+        # Relative EAR margin above the threshold at which a session counts as stable
+        self.stable_margin = stable_margin
+        self.max_load_factor = max_load_factor
+
+    def urgency(self, detector: DrowsinessDetector, result: DetectionResult) -> float:
+        """0 for a steady, wide-awake session up to 1 at or near drowsiness."""
+        if result.is_drowsy or detector.consecutive_frames_count > 0:
+            return 1.0
+        if result.ear <= 0.0:
+            # Face but no eyes measured: closed eyes often defeat the eye cascade
+            return 1.0
+        history = detector.ear_history
+        last = history.last()
+        if last is None:
+            return 1.0
+        # Project a falling EAR forward by its drop from the window mean, minus its jitter
+        projected = last + min(0.0, last - history.mean) - history.std
+        threshold = detector.EAR_THRESHOLD
+        margin = (projected - threshold) / threshold if threshold > 0 else 1.0
+        return min(1.0, max(0.0, 1.0 - margin / self.stable_margin))
+
+    def recommend(self, detector: DrowsinessDetector, result: DetectionResult, load: float = 0.0) -> int:
+        """Next capture interval in milliseconds."""
+        if not result.face_detected:
+            interval = float(self.no_face_interval_ms)
+            urgency = 0.5
+        else:
+            urgency = self.urgency(detector, result)
+            interval = self.max_interval_ms - urgency * (self.max_interval_ms - self.min_interval_ms)
+        if load > 1.0:
+            interval *= 1.0 + (min(load, self.max_load_factor) - 1.0) * (1.0 - urgency)
+        return int(round(max(interval, self.min_interval_ms)))
@@ -0,0 +1,66 @@
+import logging
+import threading
+from typing import Optional, Tuple, Union
+
+Payload = Union[bytes, str]
+
+logger = logging.getLogger(__name__)
+
+class LatestFrameSlot:
+    """Single-slot mailbox between a socket reader and the detection loop.
+
+    The reader thread ``put``s every frame it receives; the detection loop
+    ``take``s whatever is newest. A frame that is overwritten before it was
+    taken is counted as dropped rather than queued, so a slow detector never
+    builds up a backlog of stale frames.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._payload: Optional[Payload] = None
+        self._frame_id = 0
+        self._closed = False
+        self.received = 0
+        self.dropped = 0
+
+    def put(self, payload: Payload):
+        with self._cond:
+            if self._payload is not None:
+                self.dropped += 1
+            self._payload = payload
+            self._frame_id += 1
+            self.received += 1
+            self._cond.notify()
+
+    def take(self, timeout: Optional[float] = None) -> Optional[Tuple[int, Payload]]:
+        """Wait for and return ``(frame_id, payload)``, or None once closed/timed out."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._payload is not None or self._closed, timeout):
+                return None
+            if self._payload is None:
+                return None
+            payload, self._payload = self._payload, None
+            return self._frame_id, payload
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+def read_socket(ws, slot: LatestFrameSlot):
+    """Reader thread body: push every received message into the slot until the socket closes."""
+    try:
+        while True:
+            message = ws.receive()
+            if message is None:
+                break
+            slot.put(message)
+    except Exception as e:
+        # flask-sock raises ConnectionClosed when the client goes away
+        logger.debug(f"Stream reader stopped: {str(e)}")
+    finally:
+        slot.close()
@@ -0,0 +1,100 @@
+import threading
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+import numpy as np
+
+# Default slot size: one full-HD grayscale frame
+DEFAULT_SLOT_BYTES = 1920 * 1080
+
+@dataclass(frozen=True)
+class FrameRef:
+    """Picklable handle to a frame held in a ``SharedFrameRing`` slot."""
+    slot: int
+    shape: Tuple[int, ...]
+    dtype: str = 'uint8'
+
+class SharedFrameRing:
+    """Fixed-size frame slots in one ``multiprocessing.shared_memory`` block.
+
+    The creating process owns the slots. ``acquire`` hands out a free slot,
+    ``write`` copies a decoded frame into it and returns a ``FrameRef`` to
+    send to a worker, which attaches the same block by name and reads the
+    frame through ``view`` without copying. The owner ``release``s the slot
+    only once the worker is done with it (its reply arrived or it died), so a
+    slot is never rewritten while a worker may still read it. When every slot
+    is in use ``acquire`` returns None and the caller sends the frame some
+    other way.
+    """
+
+    def __init__(self, num_slots: int, slot_bytes: int = DEFAULT_SLOT_BYTES, name: Optional[str] = None):
+        self.num_slots = num_slots
+        self.slot_bytes = slot_bytes
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=num_slots * slot_bytes)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self._slots = np.ndarray((num_slots, slot_bytes), dtype=np.uint8, buffer=self.shm.buf)
+        self._free = list(range(num_slots - 1, -1, -1))
+        self._available = threading.Condition()
+
+    @classmethod
+    def attach(cls, spec: Tuple[str, int, int]) -> 'SharedFrameRing':
+        """Open the ring described by another process's ``spec`` (read side)."""
+        name, num_slots, slot_bytes = spec
+        return cls(num_slots, slot_bytes, name=name)
+
+    @property
+    def spec(self) -> Tuple[str, int, int]:
+        """``(name, num_slots, slot_bytes)``: what a worker needs to ``attach``."""
+        return self.shm.name, self.num_slots, self.slot_bytes
+
+    # ─── Owner side ─────────────────────────────────────────────────
+
+    def acquire(self, timeout: float = 0.0) -> Optional[int]:
+        """Take a free slot, waiting up to ``timeout`` seconds; None when all stay in use."""
+        with self._available:
+            if not self._free and timeout > 0:
+                self._available.wait_for(lambda: self._free, timeout)
+            return self._free.pop() if self._free else None
+
+    def release(self, slot: int):
+        """Return a slot once no worker will read it any more."""
+        with self._available:
+            self._free.append(slot)
+            self._available.notify()
+
+    def fits(self, frame: np.ndarray) -> bool:
+        return frame.nbytes <= self.slot_bytes
+
+    def write(self, slot: int, frame: np.ndarray) -> FrameRef:
+        """Copy ``frame`` into an acquired slot. Raises ValueError if it does not fit."""
+        if not self.fits(frame):
+            raise ValueError(f"Frame of {frame.nbytes} bytes exceeds the {self.slot_bytes}-byte slot")
+        np.copyto(self._slots[slot, :frame.nbytes].view(frame.dtype).reshape(frame.shape), frame)
+        return FrameRef(slot, frame.shape, frame.dtype.str)
+
+    def in_use(self) -> int:
+        with self._available:
+            return self.num_slots - len(self._free)
+
+    # ─── Reader side ────────────────────────────────────────────────
+
+    def view(self, ref: FrameRef) -> np.ndarray:
+        """Zero-copy array over the frame in ``ref``'s slot; valid until the slot is released."""
+        dtype = np.dtype(ref.dtype)
+        size = int(np.prod(ref.shape)) * dtype.itemsize
+        return self._slots[ref.slot, :size].view(dtype).reshape(ref.shape)
+
+    def close(self):
+        """Detach; the owner also frees the shared block."""
+        self._slots = None
+        try:
+            self.shm.close()
+        except BufferError:
+            # A view is still alive somewhere; the mapping goes away with the process
+            pass
+        if self.owner:
+            self.shm.unlink()
@@ -0,0 +1,226 @@
+import abc
+import os
+import resource
+import sys
+import threading
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from 100us to 1s
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+Labels = Tuple[str, ...]
+Snapshot = Dict[str, Dict[str, Any]]
+
+class HistogramChild:
+    """One labelled histogram series; ``observe`` costs a bisect and a short lock."""
+    __slots__ = ('_bounds', '_counts', '_sum', '_lock')
+
+    def __init__(self, bounds: Sequence[float]):
+        self._bounds = bounds
+        self._counts = [0] * (len(bounds) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        index = bisect_left(self._bounds, seconds)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += seconds
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        with self._lock:
+            return list(self._counts), self._sum
+
+class CounterChild:
+    __slots__ = ('_value', '_lock')
+
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self._value += amount
+
+    def snapshot(self) -> float:
+        return self._value
+
+class _Metric(abc.ABC):
+    kind = ''
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Labels, Any] = {}
+        self._lock = threading.Lock()
+
+    @abc.abstractmethod
+    def _new_child(self):
+        """Create the child series for a new set of label values."""
+
+    def labels(self, *values: str):
+        """Return the child series for these label values (resolve once, then reuse)."""
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def snapshot(self) -> Dict[Labels, Any]:
+        return {key: child.snapshot() for key, child in list(self._children.items())}
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def _new_child(self):
+        return HistogramChild(self.buckets)
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return CounterChild()
+
+class MetricsRegistry:
+    """Process-local metrics with mergeable snapshots and Prometheus text output.
+
+    Snapshots are plain picklable dicts, so worker processes can ship theirs to
+    the HTTP process, which merges them before rendering.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._metrics.setdefault(name, Histogram(name, help_text, labelnames, buckets))
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._metrics.setdefault(name, Counter(name, help_text, labelnames))
+
+    def snapshot(self, gauges: Optional[Dict[str, float]] = None) -> Snapshot:
+        """Capture all series; ``gauges`` are point-in-time values summed on merge."""
+        return {
+            'metrics': {name: metric.snapshot() for name, metric in self._metrics.items()},
+            'gauges': dict(gauges or {})
+        }
+
+    def render(self, snapshot: Snapshot, gauge_help: Optional[Dict[str, str]] = None) -> str:
+        """Render a (possibly merged) snapshot in the Prometheus text exposition format."""
+        lines: List[str] = []
+        for name, metric in self._metrics.items():
+            series = snapshot['metrics'].get(name, {})
+            lines.append(f'# HELP {name} {metric.help}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            for key, value in sorted(series.items()):
+                labels = list(zip(metric.labelnames, key))
+                if metric.kind == 'histogram':
+                    counts, total = value
+                    cumulative = 0
+                    for bound, count in zip(metric.buckets + (float('inf'),), counts):
+                        cumulative += count
+                        le = '+Inf' if bound == float('inf') else repr(bound)
+                        lines.append(f'{name}_bucket{_format_labels(labels + [("le", le)])} {cumulative}')
+                    lines.append(f'{name}_sum{_format_labels(labels)} {total}')
+                    lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+                else:
+                    lines.append(f'{name}{_format_labels(labels)} {value}')
+        for name, value in sorted(snapshot.get('gauges', {}).items()):
+            if gauge_help and name in gauge_help:
+                lines.append(f'# HELP {name} {gauge_help[name]}')
+            lines.append(f'# TYPE {name} gauge')
+            lines.append(f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    labels = list(labels)
+    if not labels:
+        return ''
+    body = ','.join(f'{k}="{v}"' for k, v in labels)
+    return '{' + body + '}'
+
+def merge_snapshots(snapshots: Iterable[Snapshot]) -> Snapshot:
+    """Sum counters, histogram buckets and gauges across process snapshots."""
+    merged: Snapshot = {'metrics': {}, 'gauges': {}}
+    for snap in snapshots:
+        for name, series in snap['metrics'].items():
+            target = merged['metrics'].setdefault(name, {})
+            for key, value in series.items():
+                if key not in target:
+                    target[key] = (list(value[0]), value[1]) if isinstance(value, tuple) else value
+                elif isinstance(value, tuple):
+                    counts, total = target[key]
+                    target[key] = ([a + b for a, b in zip(counts, value[0])], total + value[1])
+                else:
+                    target[key] += value
+        for name, value in snap.get('gauges', {}).items():
+            merged['gauges'][name] = merged['gauges'].get(name, 0) + value
+    return merged
+
+def resident_memory_bytes() -> int:
+    """Current resident set size of this process (peak RSS where /proc is unavailable)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+METRICS = MetricsRegistry()
+
+STAGE_SECONDS = METRICS.histogram(
+    'drowsiness_stage_seconds', 'Latency of each detection pipeline stage', ['stage'])
+FRAMES = METRICS.counter('drowsiness_frames_total', 'Frames run through the detector')
+FACES_FOUND = METRICS.counter('drowsiness_faces_found_total', 'Frames in which a face was found')
+EYES_FOUND = METRICS.counter('drowsiness_eyes_found_total', 'Frames in which both eyes were found')
+STATIC_HITS = METRICS.counter('drowsiness_static_hits_total',
+                              'Frames that reused the previous measurement because they barely changed')
+ERRORS = METRICS.counter('drowsiness_errors_total', 'Detection errors by kind', ['kind'])
+TRANSPORT_FALLBACKS = METRICS.counter('drowsiness_frame_transport_fallbacks_total',
+                                      'Frames sent to a worker without a shared-memory slot, by reason',
+                                      ['reason'])
+
+# Pre-resolved children so the hot path skips the label lookup
+DECODE_STAGE = STAGE_SECONDS.labels('decode')
+FACE_STAGE = STAGE_SECONDS.labels('face_detection')
+EYE_STAGE = STAGE_SECONDS.labels('eye_detection')
+LANDMARK_STAGE = STAGE_SECONDS.labels('landmarks')
+SERIALIZE_STAGE = STAGE_SECONDS.labels('serialization')
+FRAME_COUNT = FRAMES.labels()
+FACE_COUNT = FACES_FOUND.labels()
+EYE_COUNT = EYES_FOUND.labels()
+STATIC_HIT_COUNT = STATIC_HITS.labels()
+
+GAUGE_HELP = {
+    'drowsiness_active_sessions': 'Sessions resident in memory',
+    'drowsiness_resident_memory_bytes': 'Resident memory of the serving processes',
+    'drowsiness_faces_found_ratio': 'Fraction of frames with a face found',
+    'drowsiness_eyes_found_ratio': 'Fraction of frames with both eyes found',
+    'drowsiness_static_hit_ratio': 'Fraction of frames short-circuited as static'
+}
+
+def process_gauges(active_sessions: int) -> Dict[str, float]:
+    return {
+        'drowsiness_active_sessions': active_sessions,
+        'drowsiness_resident_memory_bytes': resident_memory_bytes()
+    }
+
+def render_metrics(snapshot: Snapshot) -> str:
+    """Add derived found and static-hit ratios to a merged snapshot and render it."""
+    frames = sum(snapshot['metrics'].get(FRAMES.name, {}).values())
+    static_hits = sum(snapshot['metrics'].get(STATIC_HITS.name, {}).values())
+    faces = sum(snapshot['metrics'].get(FACES_FOUND.name, {}).values())
+    eyes = sum(snapshot['metrics'].get(EYES_FOUND.name, {}).values())
+    snapshot['gauges']['drowsiness_faces_found_ratio'] = faces / frames if frames else 0.0
+    snapshot['gauges']['drowsiness_eyes_found_ratio'] = eyes / frames if frames else 0.0
+    total = frames + static_hits
+    snapshot['gauges']['drowsiness_static_hit_ratio'] = static_hits / total if total else 0.0
+    return METRICS.render(snapshot, GAUGE_HELP)
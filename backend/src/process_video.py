@@ -0,0 +1,172 @@
+import argparse
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional
+
+import cv2
+import numpy as np
+
+from drowsiness_detector import DrowsinessDetector, load_cascades
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# One row per frame in the output file
+VIDEO_RESULT_DTYPE = np.dtype([
+    ('frame', np.int32),
+    ('timestamp', np.float64),
+    ('ear', np.float32),
+    ('confidence', np.float32),
+    ('drowsy', np.bool_),
+    ('face_detected', np.bool_)
+])
+
+@dataclass
+class Chunk:
+    path: str
+    start: int  # first frame whose result is kept
+    stop: Optional[int]  # one past the last frame; None reads to the end of the stream
+    warmup: int  # frames before ``start`` replayed to approximate temporal state
+    fps: float
+
+# Cascades loaded once per worker process and shared by every chunk it runs
+_cascades = None
+
+def _init_worker():
+    global _cascades
+    _cascades = load_cascades()
+
+def plan_chunks(path: str, chunk_frames: int, warmup: int) -> List[Chunk]:
+    """Split a video into chunks, each preceded by ``warmup`` overlap frames.
+
+    The warm-up only approximates sequential processing: it holds fewer than
+    ``warmup`` EAR samples when the eyes were not found in some of its frames,
+    and a below-threshold streak longer than the warm-up restarts its count at
+    the chunk boundary. When the container does not report a frame count the
+    whole video is one chunk, processed sequentially to the end of the stream.
+    """
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise RuntimeError(f'Cannot open video: {path}')
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    cap.release()
+
+    if total <= 0:
+        logger.warning(f"{path}: frame count unknown; processing sequentially")
+        return [Chunk(path=path, start=0, stop=None, warmup=0, fps=fps)]
+
+    chunks = []
+    for start in range(0, total, chunk_frames):
+        chunks.append(Chunk(
+            path=path,
+            start=start,
+            stop=min(start + chunk_frames, total),
+            warmup=min(warmup, start),
+            fps=fps
+        ))
+    return chunks
+
+def process_chunk(chunk: Chunk, detector_kwargs: dict) -> np.ndarray:
+    """Stream one chunk's frames through a fresh detector and return its result rows."""
+    face_cascade, eye_cascade = _cascades or load_cascades()
+    detector = DrowsinessDetector(face_cascade=face_cascade, eye_cascade=eye_cascade, **detector_kwargs)
+
+    first = chunk.start - chunk.warmup
+    detector.session_start_time = first / chunk.fps
+    detector.last_blink_time = float('-inf')
+
+    rows = []
+    cap = cv2.VideoCapture(chunk.path)
+    if first > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+    index = first
+    try:
+        while chunk.stop is None or index < chunk.stop:
+            ret, frame = cap.read()
+            if not ret:
+                if chunk.stop is not None:
+                    logger.warning(f"{chunk.path}: stream ended at frame {index}")
+                break
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            timestamp = index / chunk.fps
+            result = detector.detect_drowsiness(gray, timestamp)
+            if index >= chunk.start:  # warm-up frames only build state
+                rows.append((index, timestamp, result.ear, result.confidence,
+                             result.is_drowsy, result.face_detected))
+            index += 1
+    finally:
+        cap.release()
+    return np.array(rows, dtype=VIDEO_RESULT_DTYPE)
+
+def process_video(path: str,
+                  executor: ProcessPoolExecutor,
+                  chunk_frames: int,
+                  warmup: int,
+                  detector_kwargs: dict) -> np.ndarray:
+    """Score a video in parallel chunks and return its rows in frame order.
+
+    Results near chunk boundaries can differ slightly from a sequential run;
+    see ``plan_chunks``.
+    """
+    chunks = plan_chunks(path, chunk_frames, warmup)
+    futures = [executor.submit(process_chunk, chunk, detector_kwargs) for chunk in chunks]
+    parts = [future.result() for future in futures]
+    return np.concatenate(parts) if parts else np.zeros(0, dtype=VIDEO_RESULT_DTYPE)
+
+def save_results(rows: np.ndarray, output_path: str, source: str):
+    """Write results as a compressed column-per-array .npz file."""
+    columns = {name: rows[name] for name in rows.dtype.names}
+    np.savez_compressed(output_path, source=np.array(source), **columns)
+
+def load_results(path: str) -> np.ndarray:
+    """Read a results file back into a structured array."""
+    with np.load(path) as data:
+        rows = np.zeros(len(data['frame']), dtype=VIDEO_RESULT_DTYPE)
+        for name in VIDEO_RESULT_DTYPE.names:
+            rows[name] = data[name]
+    return rows
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Score recorded videos for drowsiness')
+    parser.add_argument('videos', nargs='+', help='Video files to process')
+    parser.add_argument('--output-dir', type=str, default='results', help='Directory for .npz result files')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes')
+    parser.add_argument('--chunk-frames', type=int, default=3000, help='Frames per parallel chunk')
+    parser.add_argument('--warmup', type=int, default=30,
+                        help='Overlap frames replayed before each chunk to approximate temporal state')
+    parser.add_argument('--ear-threshold', type=float, default=0.20, help='EAR drowsiness threshold')
+    parser.add_argument('--consecutive-frames', type=int, default=3, help='Frames below threshold before drowsy')
+    parser.add_argument('--static-threshold', type=float, default=0.0,
+                        help='Reuse the previous measurement for frames that barely changed (0 measures every frame)')
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    detector_kwargs = {
+        'ear_threshold': args.ear_threshold,
+        'consecutive_frames': args.consecutive_frames,
+        'static_threshold': args.static_threshold
+    }
+
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker) as executor:
+        for path in args.videos:
+            start = time.perf_counter()
+            try:
+                rows = process_video(path, executor, args.chunk_frames, args.warmup, detector_kwargs)
+            except Exception as e:
+                logger.error(f"Failed to process {path}: {str(e)}")
+                continue
+            elapsed = time.perf_counter() - start
+
+            name = os.path.splitext(os.path.basename(path))[0]
+            output_path = os.path.join(args.output_dir, f'{name}.npz')
+            save_results(rows, output_path, path)
+            fps = len(rows) / elapsed if elapsed > 0 else 0.0
+            logger.info(f"{path}: {len(rows)} frames in {elapsed:.1f}s ({fps:.0f} fps), "
+                        f"{int(rows['drowsy'].sum())} drowsy -> {output_path}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+import json
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+try:
+    import msgpack
+except ImportError:  # optional: responses fall back to JSON
+    msgpack = None
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack')
+# Decimal places kept for floats in compact responses
+COMPACT_PRECISION = 4
+
+@dataclass
+class CompactState:
+    """What the client of a session was last sent, for delta-encoded compact responses."""
+    settings_version: int = -1
+    stats: Optional[Dict[str, Any]] = None
+    stats_sent_at: float = 0.0
+
+def _round(value: Any) -> Any:
+    return round(value, COMPACT_PRECISION) if isinstance(value, float) else value
+
+def compact_response(response: Dict[str, Any],
+                     state: CompactState,
+                     settings_version: int,
+                     stats_interval: float,
+                     now: Optional[float] = None) -> Dict[str, Any]:
+    """Strip a full detection response down to what the client does not already have.
+
+    ``settings`` (with ``settings_version``) is included only when it changed
+    since the last compact response of the session. ``stats`` is included at
+    most every ``stats_interval`` seconds and then only with the fields whose
+    (rounded) value changed. Floats are rounded to ``COMPACT_PRECISION``
+    places. Updates ``state`` to what was sent.
+    """
+    now = time.monotonic() if now is None else now
+    compact = {key: _round(value) for key, value in response.items() if key not in ('settings', 'stats')}
+
+    if state.settings_version != settings_version:
+        compact['settings'] = response['settings']
+        compact['settings_version'] = settings_version
+        state.settings_version = settings_version
+
+    if state.stats is None or now - state.stats_sent_at >= stats_interval:
+        stats = {key: _round(value) for key, value in response['stats'].items()}
+        previous = state.stats or {}
+        delta = {key: value for key, value in stats.items() if previous.get(key) != value}
+        if delta:
+            compact['stats'] = delta
+        state.stats = stats
+        state.stats_sent_at = now
+    return compact
+
+def negotiate(accept_mimetypes) -> str:
+    """Response mimetype for a werkzeug ``Accept`` header: MessagePack when preferred and available."""
+    if msgpack is None:
+        return JSON_MIMETYPE
+    return accept_mimetypes.best_match((JSON_MIMETYPE,) + MSGPACK_MIMETYPES, default=JSON_MIMETYPE)
+
+def encode(payload: Any, mimetype: str = JSON_MIMETYPE) -> bytes:
+    """Serialize as MessagePack or as compact (whitespace-free) JSON."""
+    if mimetype in MSGPACK_MIMETYPES and msgpack is not None:
+        return msgpack.packb(payload, use_bin_type=True)
+    return json.dumps(payload, separators=(',', ':')).encode('utf-8')
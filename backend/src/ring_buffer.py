@@ -0,0 +1,177 @@
+import math
+from typing import Optional, Sequence
+
+import numpy as np
+
+class RollingWindow:
+    """Fixed-capacity ring buffer of floats with O(1) running statistics.
+
+    Pushing a value overwrites the oldest one once the window is full. The
+    mean and variance over the window are maintained incrementally with
+    Welford's update (and its inverse for the evicted value), so reading them
+    costs the same regardless of capacity.
+    """
+
+    def __init__(self, capacity: int, dtype=np.float64):
+        if capacity <= 0:
+            raise ValueError('capacity must be positive')
+        self.capacity = capacity
+        self._data = np.zeros(capacity, dtype=dtype)
+        self._start = 0
+        self._count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._sum = 0.0
+
+    def push(self, value: float) -> Optional[float]:
+        """Append a value; returns the evicted value when the window was full."""
+        value = float(value)
+        evicted = None
+        if self._count == self.capacity:
+            evicted = float(self._data[self._start])
+            self._data[self._start] = value
+            self._start = (self._start + 1) % self.capacity
+            if self._start == 0:
+                # Once per lap, recompute exactly to cancel floating-point drift
+                # (amortized O(1) per push)
+                self._resync()
+                return evicted
+            self._remove_stat(evicted)
+        else:
+            self._data[(self._start + self._count) % self.capacity] = value
+            self._count += 1
+        self._add_stat(value)
+        return evicted
+
+    def _resync(self):
+        window = self._data[:self._count]
+        self._sum = float(window.sum())
+        self._mean = self._sum / self._count
+        self._m2 = float(np.square(window - self._mean).sum())
+
+    def _add_stat(self, value: float):
+        n = self._count
+        delta = value - self._mean
+        self._mean += delta / n
+        self._m2 += delta * (value - self._mean)
+        self._sum += value
+
+    def _remove_stat(self, value: float):
+        # Called with _count unchanged (the new value is added right after)
+        n = self._count - 1
+        self._sum -= value
+        if n == 0:
+            self._mean = 0.0
+            self._m2 = 0.0
+            return
+        delta = value - self._mean
+        self._mean -= delta / n
+        self._m2 -= delta * (value - self._mean)
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def sum(self) -> float:
+        return self._sum
+
+    @property
+    def mean(self) -> float:
+        return self._mean if self._count else 0.0
+
+    @property
+    def variance(self) -> float:
+        """Population variance (matches ``np.var``)."""
+        if self._count == 0:
+            return 0.0
+        return max(self._m2, 0.0) / self._count
+
+    @property
+    def std(self) -> float:
+        """Population standard deviation (matches ``np.std``)."""
+        return math.sqrt(self.variance)
+
+    def values(self) -> np.ndarray:
+        """Window contents, oldest first (a copy)."""
+        return np.roll(self._data, -self._start)[:self._count]
+
+    def last(self) -> Optional[float]:
+        if self._count == 0:
+            return None
+        return float(self._data[(self._start + self._count - 1) % self.capacity])
+
+    def clear(self):
+        self._start = 0
+        self._count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._sum = 0.0
+
+class ColumnarRing:
+    """Fixed-capacity ring buffer of rows stored as one NumPy structured array.
+
+    Rows cost only their packed field widths (no per-row Python objects), and
+    reductions run directly over the columns. Fields named in ``summed`` also
+    keep running sums, so their means are O(1) like ``RollingWindow``.
+    """
+
+    def __init__(self, capacity: int, dtype, summed: Sequence[str] = ()):
+        if capacity <= 0:
+            raise ValueError('capacity must be positive')
+        self.capacity = capacity
+        self._data = np.zeros(capacity, dtype=dtype)
+        self._start = 0
+        self._count = 0
+        self._summed = tuple(summed)
+        self._sums = dict.fromkeys(self._summed, 0.0)
+
+    def push(self, row: tuple):
+        """Append a row (a tuple in field order), overwriting the oldest when full."""
+        if self._count == self.capacity:
+            index = self._start
+            for name in self._summed:
+                self._sums[name] -= float(self._data[name][index])
+            self._start = (self._start + 1) % self.capacity
+        else:
+            index = (self._start + self._count) % self.capacity
+            self._count += 1
+        self._data[index] = row
+        for name in self._summed:
+            self._sums[name] += float(self._data[name][index])
+        if self._start == 0 and self._count == self.capacity and index == self.capacity - 1:
+            # Once per lap, recompute exactly to cancel floating-point drift
+            for name in self._summed:
+                self._sums[name] = float(self._data[name].sum(dtype=np.float64))
+
+    def __len__(self) -> int:
+        return self._count
+
+    def sum(self, name: str) -> float:
+        return self._sums[name]
+
+    def mean(self, name: str) -> float:
+        return self._sums[name] / self._count if self._count else 0.0
+
+    def records(self) -> np.ndarray:
+        """All rows, oldest first (a copy)."""
+        if self._count < self.capacity:
+            return self._data[:self._count].copy()
+        return np.concatenate((self._data[self._start:], self._data[:self._start]))
+
+    def column(self, name: str) -> np.ndarray:
+        """One field, oldest first (a copy)."""
+        return self.records()[name]
+
+    def last(self) -> Optional[np.void]:
+        if self._count == 0:
+            return None
+        return self._data[(self._start + self._count - 1) % self.capacity]
+
+    @property
+    def nbytes(self) -> int:
+        return self._data.nbytes
+
+    def clear(self):
+        self._start = 0
+        self._count = 0
+        self._sums = dict.fromkeys(self._summed, 0.0)
@@ -0,0 +1,141 @@
+import math
+import sqlite3
+from typing import Any, Dict, List, Optional, Tuple
+
+# Bucket widths in seconds maintained for every session
+ROLLUP_RESOLUTIONS = (1, 60)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollups (
+    session_id TEXT NOT NULL,
+    resolution INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    frames INTEGER NOT NULL,
+    ear_frames INTEGER NOT NULL,
+    ear_sum REAL NOT NULL,
+    ear_min REAL,
+    ear_max REAL,
+    drowsy_frames INTEGER NOT NULL,
+    blinks INTEGER NOT NULL,
+    no_face_frames INTEGER NOT NULL,
+    PRIMARY KEY (session_id, resolution, bucket)
+) WITHOUT ROWID;
+"""
+
+UPSERT = """
+INSERT INTO rollups (session_id, resolution, bucket, frames, ear_frames, ear_sum, ear_min, ear_max,
+                     drowsy_frames, blinks, no_face_frames)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(session_id, resolution, bucket) DO UPDATE SET
+    frames = frames + excluded.frames,
+    ear_frames = ear_frames + excluded.ear_frames,
+    ear_sum = ear_sum + excluded.ear_sum,
+    ear_min = CASE WHEN ear_min IS NULL THEN excluded.ear_min
+                   WHEN excluded.ear_min IS NULL THEN ear_min
+                   ELSE MIN(ear_min, excluded.ear_min) END,
+    ear_max = CASE WHEN ear_max IS NULL THEN excluded.ear_max
+                   WHEN excluded.ear_max IS NULL THEN ear_max
+                   ELSE MAX(ear_max, excluded.ear_max) END,
+    drowsy_frames = drowsy_frames + excluded.drowsy_frames,
+    blinks = blinks + excluded.blinks,
+    no_face_frames = no_face_frames + excluded.no_face_frames
+"""
+
+SERIES_COLUMNS = ('t', 'frames', 'ear_min', 'ear_mean', 'ear_max', 'drowsy_frames', 'blinks', 'no_face_frames')
+
+class RollupAccumulator:
+    """Partial per-second and per-minute buckets for one batch of frames.
+
+    The session store folds a flush's frames in here and upserts the result,
+    so each bucket costs one row write per flush however many frames it got.
+    """
+
+    def __init__(self, resolutions: Tuple[int, ...] = ROLLUP_RESOLUTIONS):
+        self.resolutions = resolutions
+        self._buckets: Dict[Tuple[str, int, int], List] = {}
+
+    def add(self,
+            session_id: str,
+            timestamp: float,
+            ear: Optional[float],
+            face_detected: bool,
+            drowsy: bool,
+            blinks: int = 0):
+        """Count one frame; ``ear`` is None when no eye measurement was made."""
+        for resolution in self.resolutions:
+            key = (session_id, resolution, int(timestamp // resolution) * resolution)
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                # frames, ear_frames, ear_sum, ear_min, ear_max, drowsy, blinks, no_face
+                bucket = self._buckets[key] = [0, 0, 0.0, None, None, 0, 0, 0]
+            bucket[0] += 1
+            if ear is not None:
+                bucket[1] += 1
+                bucket[2] += ear
+                bucket[3] = ear if bucket[3] is None else min(bucket[3], ear)
+                bucket[4] = ear if bucket[4] is None else max(bucket[4], ear)
+            bucket[5] += drowsy
+            bucket[6] += blinks
+            bucket[7] += not face_detected
+
+    def discard(self, session_id: str):
+        """Drop the session's partial buckets (it was reset)."""
+        self._buckets = {key: bucket for key, bucket in self._buckets.items() if key[0] != session_id}
+
+    def rows(self) -> List[Tuple]:
+        return [key + tuple(bucket) for key, bucket in self._buckets.items()]
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+def choose_step(start: float, end: float, max_points: int, fine_since: Optional[float] = None) -> Tuple[int, int]:
+    """``(resolution, step)`` for a range: the finest stored resolution and a bucket
+    width (a multiple of it) that yields at most ``max_points`` points.
+
+    Finer resolutions are only chosen when the whole range starts at or after
+    ``fine_since``, the oldest time they are still kept for.
+    """
+    span = max(end - start, 1.0)
+    if fine_since is None or start >= fine_since:
+        for resolution in ROLLUP_RESOLUTIONS:
+            if span / resolution <= max_points:
+                return resolution, resolution
+    coarsest = ROLLUP_RESOLUTIONS[-1]
+    return coarsest, coarsest * math.ceil(span / coarsest / max_points)
+
+def query_series(conn: sqlite3.Connection,
+                 session_id: str,
+                 start: float,
+                 end: float,
+                 max_points: int = 500,
+                 fine_since: Optional[float] = None) -> Dict[str, Any]:
+    """Downsampled series for ``[start, end)`` as parallel lists, one entry per non-empty bucket.
+
+    Reads per-second buckets for short ranges and per-minute buckets (merged
+    further as needed) for long ones. Ranges reaching back before
+    ``fine_since`` (where per-second buckets may have been pruned) are read
+    from per-minute buckets, so they are never partially empty.
+    """
+    resolution, step = choose_step(start, end, max_points, fine_since)
+    rows = _select(conn, session_id, resolution, step, start, end)
+    series: Dict[str, List] = {column: [] for column in SERIES_COLUMNS}
+    for t, frames, ear_frames, ear_sum, ear_min, ear_max, drowsy, blinks, no_face in rows:
+        series['t'].append(t)
+        series['frames'].append(frames)
+        series['ear_min'].append(ear_min)
+        series['ear_mean'].append(ear_sum / ear_frames if ear_frames else None)
+        series['ear_max'].append(ear_max)
+        series['drowsy_frames'].append(drowsy)
+        series['blinks'].append(blinks)
+        series['no_face_frames'].append(no_face)
+    return {'resolution': resolution, 'step': step, 'series': series}
+
+def _select(conn: sqlite3.Connection, session_id: str, resolution: int, step: int,
+            start: float, end: float) -> List[Tuple]:
+    first = int(start // resolution) * resolution
+    return conn.execute(
+        'SELECT (bucket / ?) * ? AS t, SUM(frames), SUM(ear_frames), SUM(ear_sum), MIN(ear_min), '
+        'MAX(ear_max), SUM(drowsy_frames), SUM(blinks), SUM(no_face_frames) FROM rollups '
+        'WHERE session_id = ? AND resolution = ? AND bucket >= ? AND bucket < ? '
+        'GROUP BY t ORDER BY t',
+        (step, step, session_id, resolution, first, end)).fetchall()
@@ -0,0 +1,243 @@
+import time
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, Optional
+
+import numpy as np
+
+from drowsiness_detector import DrowsinessDetector, load_cascades
+from response_codec import CompactState
+from ring_buffer import ColumnarRing
+from session_store import SessionStore
+
+DEFAULT_SETTINGS: Dict[str, Any] = {
+    'ear_threshold': 0.20,
+    'mar_threshold': 0.30,
+    'consecutive_frames': 3,
+    'blink_threshold': 0.15,
+    'yawn_threshold': 0.35,
+    'static_threshold': 2.0,
+    'show_face_box': True,
+    'show_eye_markers': True,
+    'auto_zen_mode': False
+}
+
+# Packed alert history row; the last ALERT_HISTORY_SIZE alerts are kept per session
+ALERT_DTYPE = np.dtype([
+    ('timestamp', np.float64),
+    ('ear', np.float32),
+    ('confidence', np.float32)
+])
+ALERT_HISTORY_SIZE = 100
+
+# Settings keys that map onto DrowsinessDetector attributes
+DETECTOR_SETTINGS = {
+    'ear_threshold': 'EAR_THRESHOLD',
+    'mar_threshold': 'MAR_THRESHOLD',
+    'consecutive_frames': 'CONSECUTIVE_FRAMES',
+    'blink_threshold': 'BLINK_THRESHOLD',
+    'yawn_threshold': 'YAWN_THRESHOLD',
+    'static_threshold': 'STATIC_THRESHOLD'
+}
+
+@dataclass
+class Session:
+    session_id: str
+    detector: DrowsinessDetector
+    settings: Dict[str, Any]
+    start_time: float = field(default_factory=time.time)
+    drowsy_count: int = 0
+    blink_count: int = 0
+    last_alert_time: Optional[float] = None  # epoch seconds
+    alert_history: ColumnarRing = field(default_factory=lambda: ColumnarRing(ALERT_HISTORY_SIZE, ALERT_DTYPE))
+    last_seen: float = field(default_factory=time.monotonic)
+    # Bumped on every settings change; compact responses resend settings when it moves
+    settings_version: int = 0
+    compact: CompactState = field(default_factory=CompactState, repr=False, compare=False)
+    # Serializes frames and settings changes of this session across request threads
+    lock: threading.RLock = field(default_factory=threading.RLock, repr=False, compare=False)
+
+    def apply_settings(self, new_settings: Dict[str, Any]) -> Dict[str, Any]:
+        """Merge known settings and push thresholds into this session's detector."""
+        for key, value in new_settings.items():
+            if key in self.settings:
+                self.settings[key] = value
+        self.settings_version += 1
+        for key, attr in DETECTOR_SETTINGS.items():
+            setattr(self.detector, attr, self.settings[key])
+        return self.settings
+
+class SessionRegistry:
+    """Bounded, thread-safe map of session ID to per-session detector state.
+
+    All detectors share one pair of loaded cascade classifiers as their
+    default; concurrent callers pass pooled pairs instead. Sessions idle
+    for longer than ``idle_ttl`` seconds are evicted, and once ``max_sessions``
+    are resident the least recently used session is dropped to make room.
+
+    With a ``store``, new sessions are recorded durably and an unknown
+    session ID that the store knows (evicted, or from before a restart) is
+    restored with its settings and counters instead of starting over.
+    """
+
+    def __init__(self,
+                 max_sessions: int = 500,
+                 idle_ttl: float = 15 * 60,
+                 default_settings: Optional[Dict[str, Any]] = None,
+                 id_factory: Optional[Callable[[], str]] = None,
+                 store: Optional[SessionStore] = None):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.default_settings = dict(default_settings or DEFAULT_SETTINGS)
+        self.face_cascade, self.eye_cascade = load_cascades()
+        self.id_factory = id_factory or self.new_session_id
+        self.store = store
+        self.evicted_count = 0
+        self.restored_count = 0
+
+        self._sessions: 'OrderedDict[str, Session]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def new_session_id() -> str:
+        """Generate a unique session ID."""
+        return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+    def _new_detector(self, settings: Dict[str, Any]) -> DrowsinessDetector:
+        return DrowsinessDetector(
+            ear_threshold=settings['ear_threshold'],
+            mar_threshold=settings['mar_threshold'],
+            consecutive_frames=settings['consecutive_frames'],
+            blink_threshold=settings['blink_threshold'],
+            yawn_threshold=settings['yawn_threshold'],
+            static_threshold=settings['static_threshold'],
+            face_cascade=self.face_cascade,
+            eye_cascade=self.eye_cascade
+        )
+
+    def _evict_idle(self, now: float):
+        """Drop sessions idle past the TTL. Caller holds the lock."""
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if now - oldest.last_seen <= self.idle_ttl:
+                break
+            self._sessions.popitem(last=False)
+            self.evicted_count += 1
+
+    def _evict(self, now: float):
+        """Drop idle sessions, then LRU sessions until under the cap. Caller holds the lock."""
+        self._evict_idle(now)
+        while len(self._sessions) >= self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.evicted_count += 1
+
+    def create(self, session_id: Optional[str] = None) -> Session:
+        """Create (or replace) a session with default settings."""
+        session_id = session_id or self.id_factory()
+        settings = dict(self.default_settings)
+        session = Session(
+            session_id=session_id,
+            detector=self._new_detector(settings),
+            settings=settings
+        )
+        self._insert(session)
+        if self.store is not None:
+            self.store.save_session(session_id, session.start_time, settings)
+        return session
+
+    def _insert(self, session: Session, replace: bool = True) -> Session:
+        """Add a session (keeping a resident one with the same ID unless ``replace``) and return the resident one."""
+        with self._lock:
+            existing = self._sessions.pop(session.session_id, None)
+            if existing is not None and not replace:
+                self._sessions[session.session_id] = existing
+                return existing
+            self._evict(session.last_seen)
+            self._sessions[session.session_id] = session
+            return session
+
+    def restore(self, session_id: str) -> Optional[Session]:
+        """Rebuild a session from the store; None without a store or for unknown IDs."""
+        if self.store is None:
+            return None
+        stored = self.store.load_session(session_id)
+        if stored is None:
+            return None
+        settings = dict(self.default_settings)
+        settings.update((k, v) for k, v in stored['settings'].items() if k in settings)
+        session = Session(
+            session_id=session_id,
+            detector=self._new_detector(settings),
+            settings=settings,
+            start_time=stored['start_time'],
+            drowsy_count=stored['drowsy_count'],
+            blink_count=stored['blink_count'],
+            last_alert_time=stored['last_alert_time']
+        )
+        session.detector.session_start_time = stored['start_time']
+        session.detector.blink_count = stored['blink_count']
+        resident = self._insert(session, replace=False)
+        if resident is session:
+            self.restored_count += 1
+        return resident
+
+    def find(self, session_id: Optional[str]) -> Optional[Session]:
+        """A resident session, or one restored from the store."""
+        session = self.get(session_id)
+        if session is None and session_id:
+            session = self.restore(session_id)
+        return session
+
+    def get(self, session_id: Optional[str]) -> Optional[Session]:
+        """Return a live session and mark it as recently used."""
+        if not session_id:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            if now - session.last_seen > self.idle_ttl:
+                del self._sessions[session_id]
+                self.evicted_count += 1
+                return None
+            session.last_seen = now
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def get_or_create(self, session_id: Optional[str]) -> Session:
+        """Return the session for ``session_id``, restoring it from the store or creating a new one if unknown."""
+        session = self.find(session_id)
+        if session is None:
+            session = self.create()
+        return session
+
+    def reset(self, session_id: str) -> Optional[Session]:
+        """Reset a session's statistics and settings, keeping its ID."""
+        if self.find(session_id) is None:
+            return None
+        return self.create(session_id)
+
+    def remove(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def evict_expired(self) -> int:
+        """Evict idle sessions now and return how many were dropped."""
+        with self._lock:
+            before = self.evicted_count
+            self._evict_idle(time.monotonic())
+            return self.evicted_count - before
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def __iter__(self) -> Iterator[Session]:
+        with self._lock:
+            return iter(list(self._sessions.values()))
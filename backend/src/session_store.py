@@ -0,0 +1,276 @@
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from drowsiness_detector import DetectionResult
+import metrics
+import rollups
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    start_time REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    frames INTEGER NOT NULL DEFAULT 0,
+    drowsy_count INTEGER NOT NULL DEFAULT 0,
+    blink_count INTEGER NOT NULL DEFAULT 0,
+    last_alert_time REAL,
+    settings TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS alerts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    ear REAL NOT NULL,
+    confidence REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS alerts_by_session ON alerts (session_id, id);
+CREATE INDEX IF NOT EXISTS alerts_by_time ON alerts (timestamp);
+"""
+
+class SessionStore:
+    """Durable SQLite (WAL) record of sessions, their settings and alert events.
+
+    Request threads only enqueue; a background writer drains the queue and
+    commits everything gathered over ``flush_interval`` seconds (or
+    ``batch_size`` operations) in one transaction. Per-frame counter updates
+    of a session are coalesced into a single row update per flush, and
+    frames are folded into per-second and per-minute rollup buckets the same
+    way. Recreating a session (``save_session``, also used on reset) deletes
+    its earlier alerts and rollups. Per-second buckets older than
+    ``fine_retention`` seconds are pruned; alerts and per-minute buckets
+    older than ``retention`` seconds are pruned too. Reads use per-thread connections and see data up to the last flush.
+    Several processes may share one database file.
+    """
+
+    def __init__(self,
+                 path: str,
+                 flush_interval: float = 1.0,
+                 batch_size: int = 2000,
+                 max_pending: int = 100000,
+                 fine_retention: float = 2 * 24 * 3600,
+                 retention: float = 90 * 24 * 3600):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.fine_retention = fine_retention
+        self.retention = retention
+        self.dropped = 0
+        self.flushes = 0
+        self._next_prune = 0.0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript(SCHEMA)
+        conn.executescript(rollups.SCHEMA)
+        conn.close()
+
+        self._queue: 'queue.Queue[Tuple]' = queue.Queue(maxsize=max_pending)
+        self._local = threading.local()
+        self._writer = threading.Thread(target=self._run, name='session-store-writer', daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10.0)
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def _put(self, op: Tuple):
+        try:
+            self._queue.put_nowait(op)
+        except queue.Full:
+            self.dropped += 1
+            metrics.ERRORS.labels('store_dropped').inc()
+
+    # ─── Writes (non-blocking) ──────────────────────────────────────
+
+    def save_session(self, session_id: str, start_time: float, settings: Dict[str, Any]):
+        """Record a new (or reset) session with zeroed counters and no alerts or rollups."""
+        self._put(('session', session_id, start_time, json.dumps(settings)))
+
+    def save_settings(self, session_id: str, settings: Dict[str, Any]):
+        self._put(('settings', session_id, json.dumps(settings)))
+
+    def record_frame(self,
+                     session_id: str,
+                     result: DetectionResult,
+                     drowsy_count: int,
+                     blink_count: int,
+                     last_alert_time: Optional[float],
+                     blinks: int = 0):
+        """Record one processed frame: session counters, an alert if drowsy, and its rollup buckets.
+
+        ``blinks`` is the number of blinks this frame added.
+        """
+        self._put(('frame', session_id, result, drowsy_count, blink_count, last_alert_time, blinks))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until everything enqueued so far is committed."""
+        done = threading.Event()
+        self._queue.put(('flush', done))
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 10.0):
+        """Commit pending writes and stop the writer."""
+        if self._writer.is_alive():
+            self._queue.put(('stop',))
+            self._writer.join(timeout)
+
+    # ─── Background writer ──────────────────────────────────────────
+
+    def _run(self):
+        conn = self._connect()
+        stopping = False
+        while not stopping:
+            ops = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(ops) < self.batch_size and ops[-1][0] not in ('flush', 'stop'):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    ops.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._write(conn, ops)
+            except sqlite3.Error as e:
+                logger.error(f"Failed to write {len(ops)} session store operations: {str(e)}")
+                metrics.ERRORS.labels('store').inc()
+            for op in ops:
+                if op[0] == 'flush':
+                    op[1].set()
+                stopping = stopping or op[0] == 'stop'
+        conn.close()
+
+    def _write(self, conn: sqlite3.Connection, ops: List[Tuple]):
+        """Coalesce a batch of operations and commit it in one transaction."""
+        sessions: Dict[str, Tuple] = {}
+        settings: Dict[str, str] = {}
+        frames: Dict[str, List] = {}
+        alerts: List[Tuple] = []
+        buckets = rollups.RollupAccumulator()
+        for op in ops:
+            kind, args = op[0], op[1:]
+            if kind == 'session':
+                session_id, start_time, settings_json = args
+                # A (re)created session supersedes anything earlier in this batch
+                frames.pop(session_id, None)
+                settings.pop(session_id, None)
+                alerts = [alert for alert in alerts if alert[0] != session_id]
+                buckets.discard(session_id)
+                sessions[session_id] = (session_id, start_time, start_time, settings_json)
+            elif kind == 'settings':
+                settings[args[0]] = args[1]
+            elif kind == 'frame':
+                session_id, result, drowsy_count, blink_count, last_alert_time, blinks = args
+                timestamp = result.timestamp
+                entry = frames.get(session_id)
+                if entry is None:
+                    frames[session_id] = [1, timestamp, drowsy_count, blink_count, last_alert_time]
+                else:
+                    entry[0] += 1
+                    entry[1:] = [timestamp, drowsy_count, blink_count, last_alert_time]
+                if result.is_drowsy:
+                    alerts.append((session_id, timestamp, result.ear, result.confidence))
+                # EAR is 0 when no eye measurement was made
+                buckets.add(session_id, timestamp, result.ear if result.ear > 0 else None,
+                            result.face_detected, result.is_drowsy, blinks)
+        if not (sessions or settings or frames or alerts):
+            return
+        with conn:
+            # ...and everything stored for it before this batch
+            conn.executemany('DELETE FROM alerts WHERE session_id = ?', [(key,) for key in sessions])
+            conn.executemany('DELETE FROM rollups WHERE session_id = ?', [(key,) for key in sessions])
+            conn.executemany(
+                'INSERT INTO sessions (session_id, start_time, last_seen, settings) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT(session_id) DO UPDATE SET start_time = excluded.start_time, '
+                'last_seen = excluded.last_seen, settings = excluded.settings, frames = 0, '
+                'drowsy_count = 0, blink_count = 0, last_alert_time = NULL',
+                sessions.values())
+            conn.executemany('UPDATE sessions SET settings = ? WHERE session_id = ?',
+                             [(value, key) for key, value in settings.items()])
+            conn.executemany(
+                'UPDATE sessions SET frames = frames + ?, last_seen = ?, drowsy_count = ?, '
+                'blink_count = ?, last_alert_time = COALESCE(?, last_alert_time) WHERE session_id = ?',
+                [tuple(entry) + (key,) for key, entry in frames.items()])
+            conn.executemany('INSERT INTO alerts (session_id, timestamp, ear, confidence) VALUES (?, ?, ?, ?)',
+                             alerts)
+            conn.executemany(rollups.UPSERT, buckets.rows())
+            now = time.time()
+            if now >= self._next_prune:
+                conn.execute('DELETE FROM rollups WHERE resolution = ? AND bucket < ?',
+                             (rollups.ROLLUP_RESOLUTIONS[0], now - self.fine_retention))
+                conn.execute('DELETE FROM rollups WHERE bucket < ?', (now - self.retention,))
+                conn.execute('DELETE FROM alerts WHERE timestamp < ?', (now - self.retention,))
+                self._next_prune = now + 600
+        self.flushes += 1
+
+    # ─── Reads ──────────────────────────────────────────────────────
+
+    def load_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """The stored session row (settings decoded), or None if unknown."""
+        row = self._reader().execute('SELECT * FROM sessions WHERE session_id = ?', (session_id,)).fetchone()
+        if row is None:
+            return None
+        session = dict(row)
+        session['settings'] = json.loads(session['settings'])
+        return session
+
+    def alert_history(self,
+                      session_id: str,
+                      limit: int = 50,
+                      before: Optional[int] = None,
+                      since: Optional[float] = None,
+                      until: Optional[float] = None) -> Dict[str, Any]:
+        """One page of a session's alerts, newest first.
+
+        Pass the returned ``next_cursor`` as ``before`` to get the next page;
+        it is None on the last page. ``since``/``until`` bound the alert
+        timestamps (epoch seconds).
+        """
+        query = 'SELECT id, timestamp, ear, confidence FROM alerts WHERE session_id = ?'
+        params: List[Any] = [session_id]
+        if before is not None:
+            query += ' AND id < ?'
+            params.append(before)
+        if since is not None:
+            query += ' AND timestamp >= ?'
+            params.append(since)
+        if until is not None:
+            query += ' AND timestamp < ?'
+            params.append(until)
+        query += ' ORDER BY id DESC LIMIT ?'
+        params.append(limit + 1)
+        rows = self._reader().execute(query, params).fetchall()
+        page = rows[:limit]
+        return {
+            'alerts': [{'timestamp': r['timestamp'], 'ear': r['ear'], 'confidence': r['confidence']}
+                       for r in page],
+            'next_cursor': page[-1]['id'] if len(rows) > limit else None
+        }
+
+    def series(self,
+               session_id: str,
+               start: float,
+               end: float,
+               max_points: int = 500) -> Dict[str, Any]:
+        """Pre-aggregated EAR/drowsiness/blink/face-missing series for ``[start, end)``, at most ``max_points`` long."""
+        return rollups.query_series(self._reader(), session_id, start, end, max_points,
+                                    fine_since=time.time() - self.fine_retention)
@@ -0,0 +1,291 @@
+import itertools
+import logging
+import multiprocessing as mp
+import queue
+import signal
+import threading
+import zlib
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+from classifier_pool import ClassifierPool
+from detection_service import DetectionService, decode_timed
+from frame_transport import DEFAULT_SLOT_BYTES, FrameRef, SharedFrameRing
+import metrics
+from session_registry import SessionRegistry
+from session_store import SessionStore
+
+logger = logging.getLogger(__name__)
+
+class WorkerCrashedError(RuntimeError):
+    """Raised for requests in flight on a worker process that died."""
+
+def route_session(session_id: str, num_workers: int) -> int:
+    """Stable session -> worker index mapping (identical in every process)."""
+    return zlib.crc32(session_id.encode('utf-8')) % num_workers
+
+def affine_session_id(index: int, num_workers: int) -> str:
+    """Generate a new session ID that routes to worker ``index``."""
+    while True:
+        session_id = SessionRegistry.new_session_id()
+        if route_session(session_id, num_workers) == index:
+            return session_id
+
+def _worker_main(index: int, num_workers: int, requests, responses, registry_kwargs: Dict[str, Any],
+                 store_path: Optional[str] = None, service_kwargs: Optional[Dict[str, Any]] = None,
+                 frames_spec: Optional[Tuple[str, int, int]] = None):
+    """Worker process: owns its cascades and the detectors of the sessions routed to it."""
+    # Shutdown is driven by the parent, not by Ctrl+C in the shared process group
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Each worker writes its own sessions to the shared database file
+    store = SessionStore(store_path) if store_path else None
+    registry = SessionRegistry(id_factory=lambda: affine_session_id(index, num_workers),
+                               store=store, **registry_kwargs)
+    # Requests are handled one at a time here, so a single warmed pair suffices
+    service = DetectionService(registry, classifiers=ClassifierPool(1), **(service_kwargs or {}))
+    # Frames decoded by the front end arrive as references into this shared ring
+    frames = SharedFrameRing.attach(frames_spec) if frames_spec else None
+
+    while True:
+        message = requests.get()
+        if message is None:
+            break
+        request_id, method, args = message
+        if frames is not None:
+            args = tuple(frames.view(arg) if isinstance(arg, FrameRef) else arg for arg in args)
+        try:
+            responses.put((request_id, True, getattr(service, method)(*args)))
+        except Exception as e:
+            try:
+                responses.put((request_id, False, e))
+            except Exception:
+                # Exception not picklable; send its message instead
+                responses.put((request_id, False, RuntimeError(str(e))))
+        # Drop the slot views before the reply lets the front end reuse them
+        del args
+    if frames is not None:
+        frames.close()
+    if store is not None:
+        store.close()
+
+class _WorkerHandle:
+    """One worker process, its queues and the futures waiting on it."""
+
+    def __init__(self, ctx, index: int, num_workers: int, registry_kwargs: Dict[str, Any],
+                 store_path: Optional[str] = None, service_kwargs: Optional[Dict[str, Any]] = None,
+                 frames_spec: Optional[Tuple[str, int, int]] = None):
+        self.index = index
+        self.requests = ctx.Queue()
+        self.responses = ctx.Queue()
+        self.pending: Dict[int, Future] = {}
+        self.lock = threading.Lock()
+        self.closed = False
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(index, num_workers, self.requests, self.responses, registry_kwargs, store_path, service_kwargs,
+                  frames_spec),
+            name=f'detector-worker-{index}',
+            daemon=True
+        )
+        self.process.start()
+        self.collector = threading.Thread(target=self._collect, name=f'collector-{index}', daemon=True)
+        self.collector.start()
+
+    def _collect(self):
+        """Resolve pending futures from this worker's response queue."""
+        while not self.closed:
+            try:
+                request_id, ok, value = self.responses.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+            with self.lock:
+                future = self.pending.pop(request_id, None)
+            if future is None:
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    def submit(self, request_id: int, method: str, args: tuple) -> Future:
+        future: Future = Future()
+        with self.lock:
+            if self.closed:
+                raise WorkerCrashedError(f'Worker {self.index} is not running')
+            self.pending[request_id] = future
+        self.requests.put((request_id, method, args))
+        return future
+
+    def fail_pending(self, error: Exception):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        for future in pending.values():
+            future.set_exception(error)
+
+    def close(self, timeout: float = 5.0):
+        if self.process.is_alive():
+            self.requests.put(None)
+            self.process.join(timeout)
+            if self.process.is_alive():
+                self.process.terminate()
+        self.closed = True
+        self.fail_pending(WorkerCrashedError(f'Worker {self.index} shut down'))
+
+class WorkerEngine:
+    """Pool of detector worker processes with session-affine routing.
+
+    Exposes the ``DetectionService`` interface. Each session is pinned to one
+    worker by a stable hash of its ID, so its detector state lives in exactly
+    one process. A worker that dies is respawned in place; the sessions routed
+    to it start fresh on the new process (or are restored from the session
+    store at ``store_path``) while the others are unaffected.
+
+    With ``frame_slots`` > 0, ``detect`` decodes frames in the calling thread
+    into a ``SharedFrameRing`` of that many ``frame_slot_bytes`` slots and
+    sends workers only a slot reference. A slot is released when its request
+    completes or its worker dies, never on a caller timeout. When no slot is
+    free the encoded frame is sent as before; a frame larger than a slot is
+    sent decoded, by value.
+    """
+
+    def __init__(self,
+                 num_workers: int,
+                 registry_kwargs: Optional[Dict[str, Any]] = None,
+                 request_timeout: float = 10.0,
+                 monitor_interval: float = 1.0,
+                 store_path: Optional[str] = None,
+                 service_kwargs: Optional[Dict[str, Any]] = None,
+                 frame_slots: int = 0,
+                 frame_slot_bytes: int = DEFAULT_SLOT_BYTES):
+        self.num_workers = num_workers
+        self.registry_kwargs = registry_kwargs or {}
+        self.store_path = store_path
+        self.service_kwargs = service_kwargs or {}
+        self.request_timeout = request_timeout
+        self.monitor_interval = monitor_interval
+        self.respawn_count = 0
+        self.frames = SharedFrameRing(frame_slots, frame_slot_bytes) if frame_slots > 0 else None
+
+        self._ctx = mp.get_context('spawn')
+        self._ids = itertools.count()
+        self._unrouted = itertools.count()
+        self._stopping = threading.Event()
+        self._workers: List[_WorkerHandle] = [self._spawn(i) for i in range(num_workers)]
+        self._monitor = threading.Thread(target=self._watch, name='worker-monitor', daemon=True)
+        self._monitor.start()
+
+    def _spawn(self, index: int) -> _WorkerHandle:
+        return _WorkerHandle(self._ctx, index, self.num_workers, self.registry_kwargs, self.store_path,
+                             self.service_kwargs, self.frames.spec if self.frames is not None else None)
+
+    def _watch(self):
+        """Respawn dead workers and fail the requests they were holding."""
+        while not self._stopping.wait(self.monitor_interval):
+            for index, handle in enumerate(self._workers):
+                if handle.process.is_alive() or self._stopping.is_set():
+                    continue
+                logger.error(f"Detector worker {index} died (exit code {handle.process.exitcode}); respawning")
+                handle.closed = True
+                handle.fail_pending(WorkerCrashedError(f'Worker {index} died'))
+                self._workers[index] = self._spawn(index)
+                self.respawn_count += 1
+
+    def route(self, session_id: Optional[str]) -> int:
+        """Worker index for a session; new sessions are spread round-robin."""
+        if session_id:
+            return route_session(session_id, self.num_workers)
+        return next(self._unrouted) % self.num_workers
+
+    def _submit(self, index: int, method: str, *args) -> Future:
+        return self._workers[index].submit(next(self._ids), method, args)
+
+    def _call(self, session_id: Optional[str], method: str, *args) -> Any:
+        return self._submit(self.route(session_id), method, session_id, *args).result(self.request_timeout)
+
+    def detect(self, session_id: Optional[str], image, reduce: int = 1, compact: bool = False) -> Dict[str, Any]:
+        index = self.route(session_id)
+        # The worker runs one frame at a time, so its queue depth is its load
+        load = float(len(self._workers[index].pending))
+        slot = self.frames.acquire() if self.frames is not None else None
+        if slot is None:
+            if self.frames is not None:
+                metrics.TRANSPORT_FALLBACKS.labels('no_free_slot').inc()
+            return self._submit(index, 'detect', session_id, image, reduce, load, compact).result(self.request_timeout)
+
+        try:
+            frame, decode_seconds = decode_timed(image, reduce)
+        except BaseException:
+            self.frames.release(slot)
+            raise
+        if not self.frames.fits(frame):
+            self.frames.release(slot)
+            metrics.TRANSPORT_FALLBACKS.labels('frame_too_large').inc()
+            return self._submit(index, 'detect_frame', session_id, frame, decode_seconds, load,
+                                compact).result(self.request_timeout)
+
+        ref = self.frames.write(slot, frame)
+        try:
+            future = self._submit(index, 'detect_frame', session_id, ref, decode_seconds, load, compact)
+        except BaseException:
+            self.frames.release(slot)
+            raise
+        # The worker may read the slot until it replies (or dies)
+        future.add_done_callback(lambda _: self.frames.release(slot))
+        return future.result(self.request_timeout)
+
+    def detect_batch(self, items: List[Dict[str, Any]], reduce: int = 1) -> List[Dict[str, Any]]:
+        """Split a batch by worker, run the parts concurrently and merge in order."""
+        # Frames without a session ID share one new session, so they go to one worker
+        unrouted_index = self.route(None)
+        groups: Dict[int, List[int]] = {}
+        for position, item in enumerate(items):
+            session_id = item.get('session_id')
+            index = self.route(session_id) if session_id else unrouted_index
+            groups.setdefault(index, []).append(position)
+
+        futures = {
+            index: self._submit(index, 'detect_batch', [items[p] for p in positions], reduce)
+            for index, positions in groups.items()
+        }
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        for index, positions in groups.items():
+            for position, result in zip(positions, futures[index].result(self.request_timeout)):
+                results[position] = result
+        return results
+
+    def get_settings(self, session_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        if not session_id:
+            return None
+        return self._call(session_id, 'get_settings')
+
+    def update_settings(self, session_id: Optional[str], new_settings: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if not session_id:
+            return None
+        return self._call(session_id, 'update_settings', new_settings)
+
+    def reset(self, session_id: Optional[str]) -> bool:
+        if not session_id:
+            return False
+        return self._call(session_id, 'reset')
+
+    def session_count(self) -> int:
+        futures = [self._submit(i, 'session_count') for i in range(self.num_workers)]
+        return sum(f.result(self.request_timeout) for f in futures)
+
+    def metrics_snapshot(self) -> metrics.Snapshot:
+        """Worker metrics merged with this process's own (serialization, memory)."""
+        futures = [self._submit(i, 'metrics_snapshot') for i in range(self.num_workers)]
+        local = metrics.METRICS.snapshot({'drowsiness_resident_memory_bytes': metrics.resident_memory_bytes()})
+        return metrics.merge_snapshots([f.result(self.request_timeout) for f in futures] + [local])
+
+    def shutdown(self):
+        # Idempotent: main() and the atexit hook registered by init_services both call it
+        if self._stopping.is_set():
+            return
+        self._stopping.set()
+        for handle in self._workers:
+            handle.close()
+        if self.frames is not None:
+            self.frames.close()
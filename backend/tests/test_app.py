@@ -0,0 +1,102 @@
+import base64
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+import app as backend_app
+from drowsiness_detector import DetectionResult
+
+def data_url() -> str:
+    frame = np.full((120, 160, 3), 128, dtype=np.uint8)
+    return 'data:image/jpeg;base64,' + base64.b64encode(cv2.imencode('.jpg', frame)[1].tobytes()).decode('ascii')
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(backend_app, 'SESSION_DB', str(tmp_path / 'sessions.db'))
+    monkeypatch.setattr(backend_app, 'service', None)
+    monkeypatch.setattr(backend_app, 'store', None)
+    yield backend_app.app.test_client()
+    if backend_app.service is not None:
+        backend_app.service.shutdown()
+    if backend_app.store is not None:
+        backend_app.store.close()
+
+@pytest.mark.parametrize('frames, index', [
+    (['not-an-object'], 0),
+    ([{'image': ''}, {'image': '', 'timestamp': 'yesterday'}], 1),
+    ([{'image': 5}], 0),
+    ([{'image': '', 'session_id': 7}], 0),
+    ([{'image': '', 'timestamp': True}], 0),
+])
+def test_batch_rejects_malformed_frames_with_their_index(client, frames, index):
+    response = client.post('/api/detect/batch', json={'frames': frames})
+    assert response.status_code == 400
+    assert response.get_json()['index'] == index
+
+def test_batch_accepts_well_formed_frames(client):
+    frames = [{'image': data_url(), 'timestamp': 1700000000.0}, {'image': data_url(), 'timestamp': 1700000000}]
+    response = client.post('/api/detect/batch', json={'frames': frames})
+    assert response.status_code == 200
+    assert len(response.get_json()['results']) == 2
+
+@pytest.mark.parametrize('body', [{'image': 5}, {'image': None}, ['image'], 'image', {'frame': data_url()}])
+def test_detect_rejects_malformed_json_body(client, body):
+    response = client.post('/api/detect', json=body)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+def test_detect_accepts_data_url(client):
+    response = client.post('/api/detect', json={'image': data_url()})
+    assert response.status_code == 200
+
+def new_session(client) -> str:
+    response = client.post('/api/detect/batch', json={'frames': [{'image': data_url()}]})
+    session_id = response.get_json()['results'][0]['session_id']
+    backend_app.store.flush()
+    return session_id
+
+@pytest.mark.parametrize('query', ['before=abc', 'since=yesterday', 'until=1e', 'limit=ten'])
+def test_history_rejects_malformed_query(client, query):
+    session_id = new_session(client)
+    response = client.get(f'/api/history?{query}', headers={'X-Session-ID': session_id})
+    assert response.status_code == 400
+
+def test_history_accepts_well_formed_query(client):
+    session_id = new_session(client)
+    response = client.get('/api/history?limit=10&before=100&since=0&until=2e9', headers={'X-Session-ID': session_id})
+    assert response.status_code == 200
+    assert response.get_json()['alerts'] == []
+
+def test_reset_clears_stored_alerts(client):
+    session_id = new_session(client)
+    for _ in range(3):
+        backend_app.store.record_frame(session_id, DetectionResult(True, 0.1, 0.0, 0.0, 0.9, True, time.time()),
+                                       1, 0, time.time())
+    backend_app.store.flush()
+    assert len(client.get('/api/history', headers={'X-Session-ID': session_id}).get_json()['alerts']) == 3
+
+    assert client.post('/api/reset', headers={'X-Session-ID': session_id}).status_code == 200
+    backend_app.store.flush()
+    history = client.get('/api/history', headers={'X-Session-ID': session_id}).get_json()
+    assert history['alerts'] == []
+    assert history['session']['drowsy_count'] == 0
+
+def test_lazy_service_uses_detector_workers(tmp_path, monkeypatch):
+    started = []
+
+    class FakeEngine:
+        def __init__(self, workers, **kwargs):
+            started.append(workers)
+
+        def shutdown(self):
+            pass
+
+    monkeypatch.setattr(backend_app, 'WorkerEngine', FakeEngine)
+    monkeypatch.setattr(backend_app, 'DETECTOR_WORKERS', 3)
+    monkeypatch.setattr(backend_app, 'SESSION_DB', '')
+    monkeypatch.setattr(backend_app, 'service', None)
+    monkeypatch.setattr(backend_app, 'store', None)
+    assert isinstance(backend_app.get_service(), FakeEngine)
+    assert started == [3]
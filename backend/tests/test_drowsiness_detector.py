@@ -0,0 +1,67 @@
+import numpy as np
+
+from drowsiness_detector import DrowsinessDetector, FrameMeasurement
+
+OPEN_EAR = 0.30
+CLOSED_EAR = 0.10
+
+def low_contrast_frame(closed: bool) -> np.ndarray:
+    """Dim frame whose 'closed' variant differs by far less than the default static threshold."""
+    frame = np.full((120, 160), 40, dtype=np.uint8)
+    if closed:
+        frame[:4, :8] = 60
+    return frame
+
+def stub_measurement(detector: DrowsinessDetector):
+    """Replace the cascades with a measurement read off the frame's marker pixels; count full measurements."""
+    calls = []
+
+    def measure(gray, face_cascade, eye_cascade):
+        calls.append(gray)
+        ear = CLOSED_EAR if gray[0, 0] > 40 else OPEN_EAR
+        return FrameMeasurement(face_detected=True, eyes_detected=True, ear=ear)
+
+    detector._measure_gray = measure
+    return calls
+
+def test_closure_is_not_hidden_by_static_reuse_past_max_age():
+    detector = DrowsinessDetector(face_tracking=False, static_threshold=2.0)
+    stub_measurement(detector)
+    open_frame, closed_frame = low_contrast_frame(False), low_contrast_frame(True)
+    change = np.abs(closed_frame.astype(np.int16) - open_frame).mean()
+    assert change < detector.STATIC_THRESHOLD
+
+    fps = 10.0
+    detector.detect_drowsiness(open_frame, 0.0)
+    drowsy_at = None
+    for index in range(1, 50):
+        timestamp = index / fps
+        result = detector.detect_drowsiness(closed_frame, timestamp)
+        if timestamp > detector.MAX_STATIC_AGE:
+            assert result.ear == CLOSED_EAR
+        if result.is_drowsy and drowsy_at is None:
+            drowsy_at = timestamp
+    assert drowsy_at is not None
+    assert drowsy_at <= detector.MAX_STATIC_AGE + detector.CONSECUTIVE_FRAMES / fps
+
+def test_static_reuse_is_bounded_by_age_even_at_low_frame_rates():
+    detector = DrowsinessDetector(face_tracking=False, static_threshold=2.0)
+    calls = stub_measurement(detector)
+    frame = low_contrast_frame(False)
+
+    # One frame per second (a stable session's slowest capture rate)
+    for index in range(5):
+        detector.detect_drowsiness(frame, float(index))
+    assert len(calls) == 5
+    assert detector.static_hits == 0
+
+def test_static_reuse_within_max_age():
+    detector = DrowsinessDetector(face_tracking=False, static_threshold=2.0)
+    calls = stub_measurement(detector)
+    frame = low_contrast_frame(False)
+
+    for index in range(5):
+        detector.detect_drowsiness(frame, index * 0.1)
+    # Reused until the measurement is older than MAX_STATIC_AGE
+    assert len(calls) == 1
+    assert detector.static_hits == 4
@@ -0,0 +1,36 @@
+import numpy as np
+
+import process_video
+
+class FakeCapture:
+    """Stands in for ``cv2.VideoCapture`` on a stream that does not report its length."""
+
+    def __init__(self, path, frames=5):
+        self.remaining = frames
+
+    def isOpened(self):
+        return True
+
+    def get(self, prop):
+        return 0.0
+
+    def set(self, prop, value):
+        return True
+
+    def read(self):
+        if self.remaining == 0:
+            return False, None
+        self.remaining -= 1
+        return True, np.zeros((120, 160, 3), dtype=np.uint8)
+
+    def release(self):
+        pass
+
+def test_unknown_frame_count_falls_back_to_sequential(monkeypatch):
+    monkeypatch.setattr(process_video.cv2, 'VideoCapture', FakeCapture)
+    chunks = process_video.plan_chunks('stream.mp4', chunk_frames=2, warmup=1)
+    assert len(chunks) == 1
+    assert (chunks[0].start, chunks[0].stop, chunks[0].warmup) == (0, None, 0)
+
+    rows = process_video.process_chunk(chunks[0], {})
+    assert rows['frame'].tolist() == [0, 1, 2, 3, 4]
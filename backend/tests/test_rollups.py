@@ -0,0 +1,48 @@
+import time
+
+from drowsiness_detector import DetectionResult
+from session_store import SessionStore
+
+def record(store: SessionStore, session_id: str, timestamps):
+    for timestamp in timestamps:
+        result = DetectionResult(is_drowsy=False, ear=0.3, mar=0.0, blink_rate=0.0, confidence=1.0,
+                                 face_detected=True, timestamp=timestamp)
+        store.record_frame(session_id, result, 0, 0, None)
+
+def test_series_straddling_fine_retention_is_not_truncated(tmp_path):
+    store = SessionStore(str(tmp_path / 'sessions.db'), fine_retention=120)
+    try:
+        now = int(time.time())
+        store.save_session('s', now - 600, {})
+        # One frame per second for the last five minutes; the flush prunes per-second buckets older than 2 min
+        record(store, 's', range(now - 300, now))
+        store.flush()
+
+        # Short enough for per-second buckets, but it starts before the retention window
+        series = store.series('s', now - 300, now, max_points=500)
+        assert series['resolution'] == 60
+        assert sum(series['series']['frames']) == 300
+
+        recent = store.series('s', now - 60, now, max_points=500)
+        assert recent['resolution'] == 1
+        assert sum(recent['series']['frames']) == 60
+    finally:
+        store.close()
+
+def test_alerts_and_minute_rollups_older_than_retention_are_pruned(tmp_path):
+    store = SessionStore(str(tmp_path / 'sessions.db'), fine_retention=120, retention=3600)
+    try:
+        now = int(time.time())
+        store.save_session('s', now - 7200, {})
+        for timestamp in (now - 7000, now - 60):
+            result = DetectionResult(is_drowsy=True, ear=0.1, mar=0.0, blink_rate=0.0, confidence=0.9,
+                                     face_detected=True, timestamp=timestamp)
+            store.record_frame('s', result, 1, 0, timestamp)
+        store.flush()
+
+        alerts = store.alert_history('s')['alerts']
+        assert [alert['timestamp'] for alert in alerts] == [now - 60]
+        series = store.series('s', now - 7200, now, max_points=500)
+        assert sum(series['series']['frames']) == 1
+    finally:
+        store.close()
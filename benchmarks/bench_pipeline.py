@@ -0,0 +1,259 @@
+"""Per-stage micro-benchmarks for the drowsiness detection pipelines.
+
+Times each stage of the backend ``DrowsinessDetector`` (decode, grayscale,
+face cascade, eye cascade, eye landmarks, EAR, stats), the root ``app.py``
+request pipeline and the MediaPipe path in ``drowsiness_detection.py`` on
+deterministic synthetic frames (and optional recorded fixtures) at several
+resolutions. Results are written as JSON so runs can be compared across
+commits:
+
+    python benchmarks/bench_pipeline.py --output bench.json
+    python benchmarks/bench_pipeline.py --output new.json --compare bench.json
+"""
+import argparse
+import base64
+import glob
+import importlib.util
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'backend', 'src'))
+sys.path.insert(0, ROOT)
+
+from drowsiness_detector import DrowsinessDetector, FrameMeasurement  # noqa: E402
+from frame_decoder import decode_grayscale, decode_legacy  # noqa: E402
+
+RESOLUTIONS = {
+    '320x240': (320, 240),
+    '640x480': (640, 480),
+    '1280x720': (1280, 720),
+    '1920x1080': (1920, 1080)
+}
+
+def synthetic_frame(width: int, height: int, seed: int = 0) -> np.ndarray:
+    """Deterministic BGR frame with a face-like ellipse, eyes and mouth on a noisy background."""
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:height, 0:width]
+    background = (60 + 80 * xx / width + 40 * yy / height).astype(np.float32)
+    frame = np.dstack([background * 0.9, background, background * 1.1])
+    frame += rng.normal(0, 6, size=frame.shape)
+    frame = np.clip(frame, 0, 255).astype(np.uint8)
+
+    cx, cy = width // 2, height // 2
+    fw, fh = width // 6, int(height // 3.2)
+    cv2.ellipse(frame, (cx, cy), (fw, fh), 0, 0, 360, (150, 180, 220), -1)
+    for side in (-1, 1):
+        ex = cx + side * fw // 2
+        ey = cy - fh // 4
+        cv2.ellipse(frame, (ex, ey), (fw // 5, fh // 10), 0, 0, 360, (245, 245, 245), -1)
+        cv2.circle(frame, (ex, ey), max(2, fh // 14), (20, 20, 20), -1)
+        cv2.line(frame, (ex - fw // 4, ey - fh // 6), (ex + fw // 4, ey - fh // 6), (40, 50, 60), max(1, fh // 40))
+    cv2.ellipse(frame, (cx, cy + fh // 2), (fw // 3, fh // 12), 0, 0, 360, (60, 60, 150), -1)
+    return frame
+
+def load_fixtures(directory: Optional[str]) -> Dict[str, np.ndarray]:
+    """Recorded fixture frames (any .jpg/.png in ``directory``), keyed by file name."""
+    frames = {}
+    if not directory:
+        return frames
+    for path in sorted(glob.glob(os.path.join(directory, '*.jpg')) + glob.glob(os.path.join(directory, '*.png'))):
+        frame = cv2.imread(path)
+        if frame is not None:
+            frames[os.path.basename(path)] = frame
+    return frames
+
+def time_stage(fn: Callable[[], object], iterations: int, warmup: int = 3) -> Dict[str, float]:
+    """Run ``fn`` repeatedly and return latency percentiles in milliseconds."""
+    for _ in range(warmup):
+        fn()
+    samples = np.empty(iterations)
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples[i] = time.perf_counter() - start
+    samples *= 1000
+    return {
+        'iterations': iterations,
+        'mean_ms': float(samples.mean()),
+        'p50_ms': float(np.percentile(samples, 50)),
+        'p95_ms': float(np.percentile(samples, 95)),
+        'min_ms': float(samples.min())
+    }
+
+def regions(detector: DrowsinessDetector, gray: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Face and eye ROIs for the later stages; falls back to fixed boxes when nothing is detected,
+    so every stage is timed on comparable input regardless of detection."""
+    h, w = gray.shape
+    faces = detector.face_cascade.detectMultiScale(gray, 1.3, 5)
+    if len(faces):
+        x, y, fw, fh = max(faces, key=lambda f: f[2] * f[3])
+    else:
+        x, y, fw, fh = w // 3, h // 5, w // 3, int(h / 1.6)
+    face_roi = gray[y:y + fh, x:x + fw]
+    eyes = detector.eye_cascade.detectMultiScale(face_roi)
+    if len(eyes):
+        ex, ey, ew, eh = eyes[0]
+    else:
+        ex, ey, ew, eh = fw // 5, fh // 5, fw // 4, fh // 6
+    return face_roi, face_roi[ey:ey + eh, ex:ex + ew]
+
+def bench_backend(frame: np.ndarray, iterations: int) -> Dict[str, Dict[str, float]]:
+    """Time each stage of the backend ``DrowsinessDetector`` pipeline."""
+    detector = DrowsinessDetector(face_tracking=False, static_threshold=0)
+    jpeg = cv2.imencode('.jpg', frame)[1].tobytes()
+    data_url = 'data:image/jpeg;base64,' + base64.b64encode(jpeg).decode('ascii')
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    face_roi, eye_roi = regions(detector, gray)
+    landmarks = detector.get_eye_landmarks(eye_roi)
+    if landmarks is None:
+        landmarks = np.array([[0, 5], [5, 0], [10, 5], [5, 8]])
+    measurement = FrameMeasurement(face_detected=True, eyes_detected=True, ear=0.25)
+
+    def stats():
+        detector.update_state(measurement)
+        detector.get_session_stats()
+
+    tracked = DrowsinessDetector(face_tracking=True, static_threshold=0)
+    static = DrowsinessDetector(face_tracking=True)
+    return {
+        'decode_legacy': time_stage(lambda: decode_legacy(data_url), iterations),
+        'decode_direct': time_stage(lambda: decode_grayscale(jpeg), iterations),
+        'grayscale': time_stage(lambda: cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), iterations),
+        'face_cascade': time_stage(lambda: detector.face_cascade.detectMultiScale(gray, 1.3, 5), iterations),
+        'eye_cascade': time_stage(lambda: detector.eye_cascade.detectMultiScale(face_roi), iterations),
+        'eye_landmarks': time_stage(lambda: detector.get_eye_landmarks(eye_roi), iterations),
+        'ear': time_stage(lambda: detector.calculate_ear(landmarks), iterations),
+        'stats': time_stage(stats, iterations),
+        'detect_total': time_stage(lambda: detector.detect_drowsiness(gray), iterations),
+        'detect_total_tracked': time_stage(lambda: tracked.detect_drowsiness(gray), iterations),
+        'detect_total_static': time_stage(lambda: static.detect_drowsiness(gray), iterations)
+    }
+
+def load_module(name: str, path: str):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def bench_root_app(frame: np.ndarray, iterations: int) -> Optional[Dict[str, Dict[str, float]]]:
+    """Time the root ``app.py`` ``/api/detect`` pipeline end to end (JSON data URL in, JSON out)."""
+    try:
+        root_app = load_module('root_app', os.path.join(ROOT, 'app.py'))
+    except Exception as e:
+        print(f"skipping root app.py: {e}", file=sys.stderr)
+        return None
+    client = root_app.app.test_client()
+    jpeg = cv2.imencode('.jpg', frame)[1].tobytes()
+    payload = {'image': 'data:image/jpeg;base64,' + base64.b64encode(jpeg).decode('ascii')}
+    return {'request_total': time_stage(lambda: client.post('/api/detect', json=payload), iterations)}
+
+def bench_mediapipe(frame: np.ndarray, iterations: int) -> Optional[Dict[str, Dict[str, float]]]:
+    """Time the FaceMesh path of ``drowsiness_detection.py``."""
+    try:
+        module = load_module('drowsiness_detection', os.path.join(ROOT, 'drowsiness_detection.py'))
+        detector = module.DrowsinessDetector(model_path=None)
+    except Exception as e:
+        print(f"skipping MediaPipe path: {e}", file=sys.stderr)
+        return None
+    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    stages = {
+        'face_mesh': time_stage(lambda: detector.face_mesh.process(rgb), iterations),
+        'detect_total': time_stage(lambda: detector.detect_drowsiness(frame), iterations)
+    }
+    faces = detector.face_mesh.process(rgb).multi_face_landmarks
+    if faces:
+        # Full-mesh list comprehension (previous path) vs. the indexed eye/mouth gather
+        landmarks = faces[0].landmark
+        h, w = frame.shape[:2]
+        stages['landmarks_all'] = time_stage(
+            lambda: np.array([[lm.x * w, lm.y * h] for lm in landmarks]), iterations)
+        stages['landmarks_features'] = time_stage(
+            lambda: module.gather_feature_points(landmarks, w, h, detector.feature_points), iterations)
+    return stages
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT, text=True).strip()
+    except Exception:
+        return None
+
+def run(iterations: int, resolutions: List[str], fixtures: Dict[str, np.ndarray],
+        pipelines: List[str]) -> Dict:
+    frames = {name: synthetic_frame(*RESOLUTIONS[name]) for name in resolutions}
+    frames.update({f'fixture:{name}': frame for name, frame in fixtures.items()})
+
+    results: Dict[str, Dict] = {}
+    for name, frame in frames.items():
+        entry = {'shape': list(frame.shape)}
+        if 'backend' in pipelines:
+            entry['backend'] = bench_backend(frame, iterations)
+        if 'root_app' in pipelines:
+            entry['root_app'] = bench_root_app(frame, iterations)
+        if 'mediapipe' in pipelines:
+            entry['mediapipe'] = bench_mediapipe(frame, iterations)
+        results[name] = entry
+        print(f"{name}: done", file=sys.stderr)
+
+    return {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': time.time(),
+            'python': platform.python_version(),
+            'opencv': cv2.__version__,
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'iterations': iterations
+        },
+        'results': results
+    }
+
+def compare(current: Dict, baseline: Dict):
+    """Print mean latency ratios (current / baseline) for every stage present in both runs."""
+    print(f"{'frame':<22} {'pipeline':<10} {'stage':<22} {'base ms':>9} {'new ms':>9} {'ratio':>7}")
+    for frame, entry in current['results'].items():
+        base_entry = baseline['results'].get(frame, {})
+        for pipeline, stages in entry.items():
+            if not isinstance(stages, dict) or not isinstance(base_entry.get(pipeline), dict):
+                continue
+            for stage, stats in stages.items():
+                base = base_entry[pipeline].get(stage)
+                if not base:
+                    continue
+                ratio = stats['mean_ms'] / base['mean_ms'] if base['mean_ms'] else float('nan')
+                print(f"{frame:<22} {pipeline:<10} {stage:<22} {base['mean_ms']:>9.3f} "
+                      f"{stats['mean_ms']:>9.3f} {ratio:>7.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-stage detection pipeline benchmarks')
+    parser.add_argument('--iterations', type=int, default=30, help='Timed runs per stage')
+    parser.add_argument('--resolutions', nargs='+', default=list(RESOLUTIONS), choices=list(RESOLUTIONS))
+    parser.add_argument('--fixtures', type=str, default=None, help='Directory of recorded .jpg/.png frames')
+    parser.add_argument('--pipelines', nargs='+', default=['backend', 'root_app', 'mediapipe'],
+                        choices=['backend', 'root_app', 'mediapipe'])
+    parser.add_argument('--output', type=str, default=None, help='Write JSON results here (default: stdout)')
+    parser.add_argument('--compare', type=str, default=None, help='Baseline JSON to compare against')
+    args = parser.parse_args()
+
+    report = run(args.iterations, args.resolutions, load_fixtures(args.fixtures), args.pipelines)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+if __name__ == '__main__':
+    main()
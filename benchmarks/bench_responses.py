@@ -0,0 +1,127 @@
+"""Bytes and serialization CPU of ``/api/detect`` responses, legacy vs compact.
+
+Runs a stream of frames through a ``DetectionService`` session to get
+realistic full responses, then replays them (at ``--fps``, simulated clock)
+through each encoding:
+
+- ``legacy_pretty``: ``jsonify`` with the debug server's pretty printing
+- ``legacy``: ``jsonify`` as served by the production server
+- ``compact_json`` / ``compact_msgpack``: ``compact_response`` + ``response_codec.encode``
+
+    python benchmarks/bench_responses.py --frames 600 --output responses.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from typing import Callable, Dict, List
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_pipeline import git_commit, load_fixtures, synthetic_frame  # noqa: E402
+
+from flask import Flask, jsonify  # noqa: E402
+
+from detection_service import DetectionService  # noqa: E402
+import response_codec  # noqa: E402
+from session_registry import SessionRegistry  # noqa: E402
+
+def collect_responses(frames: List[np.ndarray], count: int) -> List[Dict]:
+    """Full responses of one session over ``count`` frames (cycling through ``frames``)."""
+    service = DetectionService(SessionRegistry())
+    jpegs = [cv2.imencode('.jpg', frame)[1].tobytes() for frame in frames]
+    session_id = 'bench'
+    return [service.detect(session_id, jpegs[i % len(jpegs)]) for i in range(count)]
+
+def measure(responses: List[Dict], encode: Callable[[Dict, float], bytes], fps: float) -> Dict[str, float]:
+    """Mean bytes and per-response serialization time, including any compaction."""
+    sizes = np.empty(len(responses))
+    samples = np.empty(len(responses))
+    for i, response in enumerate(responses):
+        now = i / fps
+        start = time.perf_counter()
+        body = encode(response, now)
+        samples[i] = time.perf_counter() - start
+        sizes[i] = len(body)
+    samples *= 1e6
+    return {
+        'mean_bytes': float(sizes.mean()),
+        'bytes_per_second': float(sizes.mean() * fps),
+        'mean_us': float(samples.mean()),
+        'p50_us': float(np.percentile(samples, 50)),
+        'p95_us': float(np.percentile(samples, 95))
+    }
+
+def run(args) -> Dict:
+    frames = list(load_fixtures(args.fixtures).values()) or [synthetic_frame(640, 480, seed) for seed in range(8)]
+    responses = collect_responses(frames, args.frames)
+
+    app = Flask(__name__)
+    pretty = Flask(__name__)
+    pretty.debug = True
+
+    def jsonify_with(flask_app):
+        def encode(response, now):
+            with flask_app.app_context():
+                return jsonify(response).get_data()
+        return encode
+
+    def compact_with(mimetype):
+        state = response_codec.CompactState()
+
+        def encode(response, now):
+            compact = response_codec.compact_response(response, state, 0, args.stats_interval, now)
+            return response_codec.encode(compact, mimetype)
+        return encode
+
+    encodings = {
+        'legacy_pretty': jsonify_with(pretty),
+        'legacy': jsonify_with(app),
+        'compact_json': compact_with(response_codec.JSON_MIMETYPE)
+    }
+    if response_codec.msgpack is not None:
+        encodings['compact_msgpack'] = compact_with(response_codec.MSGPACK_MIMETYPES[0])
+    else:
+        print('msgpack not installed: skipping compact_msgpack', file=sys.stderr)
+
+    return {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': time.time(),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'frames': args.frames,
+            'fps': args.fps,
+            'stats_interval': args.stats_interval
+        },
+        'results': {name: measure(responses, encode, args.fps) for name, encode in encodings.items()}
+    }
+
+def print_table(report: Dict):
+    base = report['results']['legacy_pretty']
+    print(f"{'encoding':<16} {'bytes':>8} {'B/s':>8} {'mean us':>8} {'p95 us':>8} {'bytes vs pretty':>16}")
+    for name, r in report['results'].items():
+        print(f"{name:<16} {r['mean_bytes']:>8.1f} {r['bytes_per_second']:>8.0f} {r['mean_us']:>8.1f} "
+              f"{r['p95_us']:>8.1f} {r['mean_bytes'] / base['mean_bytes']:>15.1%}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare legacy and compact /api/detect response encodings')
+    parser.add_argument('--fixtures', type=str, default=None, help='Directory of .jpg/.png frames (synthetic if omitted)')
+    parser.add_argument('--frames', type=int, default=600, help='Responses to generate and encode')
+    parser.add_argument('--fps', type=float, default=10.0, help='Simulated client frame rate')
+    parser.add_argument('--stats-interval', type=float, default=1.0, help='Seconds between stats in compact responses')
+    parser.add_argument('--output', type=str, default=None, help='Write JSON results here')
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    print_table(report)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+"""Latency and accuracy of the exported CPU runtimes against the torch model.
+
+Runs every fixture frame through each runtime of ``drowsiness_detection``
+(torch, onnx, onnx-int8, opencv) and reports per-frame latency plus
+agreement with the torch detections: matched boxes (same class, IoU above
+``--iou``), drowsy/alert state and confidence drift. Fixtures with a YOLO
+label file next to them (``frame.jpg`` + ``frame.txt``, normalized
+``cls cx cy w h`` rows) are also scored against ground truth:
+
+    python benchmarks/bench_runtimes.py --fixtures fixtures/ --output runtimes.json
+    python benchmarks/bench_runtimes.py --fixtures fixtures/ --runtimes torch onnx-int8 \\
+        --calibration-dir calibration/
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_pipeline import ROOT, git_commit, load_fixtures, load_module, time_stage  # noqa: E402
+
+RUNTIMES = ['torch', 'onnx', 'onnx-int8', 'opencv']
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of ``(n, 4)`` and ``(m, 4)`` xyxy boxes."""
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(rb - lt, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+def match(pred: np.ndarray, target: np.ndarray, iou_thres: float) -> List[tuple]:
+    """Greedy same-class matches ``(pred_row, target_row)`` in descending confidence."""
+    if not len(pred) or not len(target):
+        return []
+    iou = box_iou(pred[:, :4], target[:, :4])
+    iou[pred[:, 5][:, None] != target[:, 5][None, :]] = 0
+    matches, used = [], set()
+    for i in np.argsort(-pred[:, 4]):
+        candidates = [j for j in np.argsort(-iou[i]) if iou[i, j] >= iou_thres and j not in used]
+        if candidates:
+            used.add(candidates[0])
+            matches.append((i, candidates[0]))
+    return matches
+
+def load_labels(fixtures: Optional[str], name: str, shape) -> Optional[np.ndarray]:
+    """Ground-truth boxes for a fixture as ``(n, 6)`` xyxy rows (conf 1), or None without a label file."""
+    path = os.path.join(fixtures, os.path.splitext(name)[0] + '.txt') if fixtures else None
+    if not path or not os.path.isfile(path):
+        return None
+    rows = np.loadtxt(path, ndmin=2).reshape(-1, 5)
+    h, w = shape[:2]
+    cx, cy, bw, bh = rows[:, 1] * w, rows[:, 2] * h, rows[:, 3] * w, rows[:, 4] * h
+    return np.stack([cx - bw / 2, cy - bh / 2, cx + bw / 2, cy + bh / 2, np.ones(len(rows)), rows[:, 0]], axis=1)
+
+def scores(pred: np.ndarray, target: np.ndarray, iou_thres: float) -> Dict[str, float]:
+    matches = match(pred, target, iou_thres)
+    return {
+        'matched': len(matches),
+        'predicted': len(pred),
+        'target': len(target),
+        'conf_abs_diff': float(np.mean([abs(pred[i, 4] - target[j, 4]) for i, j in matches])) if matches else 0.0
+    }
+
+def summarize(per_frame: List[Dict[str, float]], states_agree: List[bool]) -> Dict[str, float]:
+    matched = sum(s['matched'] for s in per_frame)
+    predicted = sum(s['predicted'] for s in per_frame)
+    target = sum(s['target'] for s in per_frame)
+    diffs = [s['conf_abs_diff'] for s in per_frame if s['matched']]
+    return {
+        'precision': matched / predicted if predicted else 1.0,
+        'recall': matched / target if target else 1.0,
+        'state_agreement': float(np.mean(states_agree)) if states_agree else 1.0,
+        'mean_conf_abs_diff': float(np.mean(diffs)) if diffs else 0.0
+    }
+
+def has_drowsy(pred: np.ndarray, names) -> bool:
+    return any(names[int(cls)] == 'drowsy' for cls in pred[:, 5])
+
+def run(args) -> Dict:
+    module = load_module('drowsiness_detection', os.path.join(ROOT, 'drowsiness_detection.py'))
+    frames = load_fixtures(args.fixtures)
+    if not frames:
+        raise SystemExit(f"No .jpg/.png fixtures in {args.fixtures}")
+
+    latency: Dict[str, Dict] = {}
+    preds: Dict[str, Dict[str, np.ndarray]] = {}
+    names = None
+    for runtime in args.runtimes:
+        start = time.perf_counter()
+        model = module.load_model(args.weights, args.yolov5_dir, runtime=runtime,
+                                  calibration_dir=args.calibration_dir)
+        load_s = time.perf_counter() - start
+        names = names or model.names
+        preds[runtime] = {name: np.asarray(model(frame).pred[0].tolist()).reshape(-1, 6)
+                          for name, frame in frames.items()}
+        per_frame = {name: time_stage(lambda: model(frame), args.iterations) for name, frame in frames.items()}
+        latency[runtime] = {
+            'load_s': load_s,
+            'mean_ms': float(np.mean([s['mean_ms'] for s in per_frame.values()])),
+            'p50_ms': float(np.median([s['p50_ms'] for s in per_frame.values()])),
+            'p95_ms': float(np.max([s['p95_ms'] for s in per_frame.values()])),
+            'frames': per_frame
+        }
+        print(f"{runtime}: done", file=sys.stderr)
+
+    accuracy: Dict[str, Dict] = {}
+    for runtime in args.runtimes:
+        entry = {}
+        if 'torch' in preds and runtime != 'torch':
+            per_frame = [scores(preds[runtime][n], preds['torch'][n], args.iou) for n in frames]
+            states = [has_drowsy(preds[runtime][n], names) == has_drowsy(preds['torch'][n], names)
+                      for n in frames]
+            entry['vs_torch'] = summarize(per_frame, states)
+        labelled = {n: load_labels(args.fixtures, n, f.shape) for n, f in frames.items()}
+        labelled = {n: t for n, t in labelled.items() if t is not None}
+        if labelled:
+            per_frame = [scores(preds[runtime][n], t, args.iou) for n, t in labelled.items()]
+            states = [has_drowsy(preds[runtime][n], names) == has_drowsy(t, names) for n, t in labelled.items()]
+            entry['vs_labels'] = summarize(per_frame, states)
+        accuracy[runtime] = entry
+
+    return {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': time.time(),
+            'python': platform.python_version(),
+            'opencv': cv2.__version__,
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'fixtures': len(frames),
+            'iterations': args.iterations
+        },
+        'latency': latency,
+        'accuracy': accuracy
+    }
+
+def print_table(report: Dict):
+    base = report['latency'].get('torch', {}).get('mean_ms')
+    print(f"{'runtime':<10} {'mean ms':>8} {'p95 ms':>8} {'speedup':>8} {'P/torch':>8} {'R/torch':>8} "
+          f"{'state':>6} {'P/label':>8} {'R/label':>8}")
+    for runtime, lat in report['latency'].items():
+        acc = report['accuracy'].get(runtime, {})
+        vs_torch, vs_labels = acc.get('vs_torch', {}), acc.get('vs_labels', {})
+        fmt = lambda d, k: f"{d[k]:.3f}" if k in d else '-'
+        speedup = f"{base / lat['mean_ms']:.2f}x" if base else '-'
+        print(f"{runtime:<10} {lat['mean_ms']:>8.2f} {lat['p95_ms']:>8.2f} {speedup:>8} "
+              f"{fmt(vs_torch, 'precision'):>8} {fmt(vs_torch, 'recall'):>8} {fmt(vs_torch, 'state_agreement'):>6} "
+              f"{fmt(vs_labels, 'precision'):>8} {fmt(vs_labels, 'recall'):>8}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare exported CPU runtimes with the torch model')
+    parser.add_argument('--fixtures', type=str, required=True, help='Directory of .jpg/.png frames (+ optional YOLO .txt labels)')
+    parser.add_argument('--weights', type=str, default=os.getenv('WEIGHTS', 'yolov5/runs/train/exp/weights/last.pt'))
+    parser.add_argument('--yolov5-dir', type=str, default=os.getenv('YOLOV5_DIR', 'yolov5'))
+    parser.add_argument('--runtimes', nargs='+', default=RUNTIMES, choices=RUNTIMES)
+    parser.add_argument('--calibration-dir', type=str, default=None, help='Frames to calibrate onnx-int8 on')
+    parser.add_argument('--iterations', type=int, default=20, help='Timed runs per frame and runtime')
+    parser.add_argument('--iou', type=float, default=0.5, help='IoU for a box to count as matched')
+    parser.add_argument('--output', type=str, default=None, help='Write JSON results here')
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    print_table(report)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+"""Frame transport to detector worker processes: shared-memory slots vs pickling through a queue.
+
+Round trips one frame at a time to a spawned echo worker, per resolution:
+
+- ``pickle_frame``: the decoded grayscale frame pickled through a ``multiprocessing`` queue
+- ``shared_memory``: the decoded frame copied into a ``SharedFrameRing`` slot, only its ``FrameRef`` queued
+- ``encoded_queue``: the JPEG bytes queued and decoded in the worker (the transport without slots)
+
+The first two start from an already decoded frame, so they time transport
+alone; ``encoded_queue`` includes the worker's decode. ``--engine`` also
+times ``WorkerEngine.detect`` end to end with and without frame slots,
+one request at a time and as throughput with ``--clients`` concurrent
+sessions:
+
+    python benchmarks/bench_transport.py --output transport.json
+    python benchmarks/bench_transport.py --engine --workers 2
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import platform
+import sys
+import threading
+import time
+from typing import Dict
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_pipeline import RESOLUTIONS, git_commit, synthetic_frame, time_stage  # noqa: E402
+
+from frame_decoder import decode_grayscale  # noqa: E402
+from frame_transport import SharedFrameRing  # noqa: E402
+
+def echo_worker(requests, responses, frames_spec):
+    """Read each frame (a pixel of it, so the transport is what gets timed) and reply."""
+    frames = SharedFrameRing.attach(frames_spec)
+    while True:
+        message = requests.get()
+        if message is None:
+            break
+        kind, payload = message
+        if kind == 'ref':
+            frame = frames.view(payload)
+        elif kind == 'encoded':
+            frame = decode_grayscale(payload)
+        else:
+            frame = payload
+        responses.put(int(frame[-1, -1]))
+        del frame
+    frames.close()
+
+def bench_queue(frames: Dict[str, np.ndarray], iterations: int) -> Dict[str, Dict[str, Dict[str, float]]]:
+    ctx = mp.get_context('spawn')
+    ring = SharedFrameRing(2, max(f.nbytes for f in frames.values()))
+    requests, responses = ctx.Queue(), ctx.Queue()
+    worker = ctx.Process(target=echo_worker, args=(requests, responses, ring.spec), daemon=True)
+    worker.start()
+
+    def round_trip(kind, payload):
+        requests.put((kind, payload))
+        return responses.get()
+
+    def via_ring(gray):
+        slot = ring.acquire()
+        try:
+            return round_trip('ref', ring.write(slot, gray))
+        finally:
+            ring.release(slot)
+
+    results = {}
+    try:
+        for name, gray in frames.items():
+            jpeg = cv2.imencode('.jpg', gray)[1].tobytes()
+            results[name] = {
+                'frame_bytes': gray.nbytes,
+                'jpeg_bytes': len(jpeg),
+                'pickle_frame': time_stage(lambda: round_trip('frame', gray), iterations),
+                'shared_memory': time_stage(lambda: via_ring(gray), iterations),
+                'encoded_queue': time_stage(lambda: round_trip('encoded', jpeg), iterations),
+                'decode_only': time_stage(lambda: decode_grayscale(jpeg), iterations)
+            }
+            print(f"{name}: done", file=sys.stderr)
+    finally:
+        requests.put(None)
+        worker.join(5)
+        ring.close()
+    return results
+
+def throughput(engine, jpeg: bytes, clients: int, iterations: int) -> float:
+    """Frames per second with ``clients`` threads, each sending its own session's frames back to back."""
+    sessions = [engine.detect(None, jpeg)['session_id'] for _ in range(clients)]
+
+    def client(session_id):
+        for _ in range(iterations):
+            engine.detect(session_id, jpeg)
+
+    threads = [threading.Thread(target=client, args=(session_id,)) for session_id in sessions]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return clients * iterations / (time.perf_counter() - start)
+
+def bench_engine(frames: Dict[str, np.ndarray], iterations: int, workers: int, clients: int) -> Dict[str, Dict]:
+    """``WorkerEngine.detect`` latency and concurrent throughput per resolution, without and with
+    shared-memory frame slots."""
+    from worker_engine import WorkerEngine
+
+    results: Dict[str, Dict] = {}
+    for label, slots in (('encoded_queue', 0), ('shared_memory', 4 * workers)):
+        engine = WorkerEngine(workers, frame_slots=slots,
+                              frame_slot_bytes=max(f.nbytes for f in frames.values()))
+        try:
+            for name, gray in frames.items():
+                jpeg = cv2.imencode('.jpg', gray)[1].tobytes()
+                session_id = engine.detect(None, jpeg)['session_id']
+                entry = results.setdefault(name, {})
+                entry[label] = time_stage(lambda: engine.detect(session_id, jpeg), iterations)
+                entry[label]['frames_per_second'] = throughput(engine, jpeg, clients, iterations)
+        finally:
+            engine.shutdown()
+    return results
+
+def run(args) -> Dict:
+    frames = {name: cv2.cvtColor(synthetic_frame(*RESOLUTIONS[name]), cv2.COLOR_BGR2GRAY)
+              for name in args.resolutions}
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': time.time(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'iterations': args.iterations
+        },
+        'transport': bench_queue(frames, args.iterations)
+    }
+    if args.engine:
+        report['engine'] = bench_engine(frames, args.iterations, args.workers, args.clients)
+    return report
+
+def print_table(report: Dict):
+    print(f"{'resolution':<10} {'frame KB':>8} {'pickle ms':>9} {'shm ms':>8} {'encoded ms':>10} {'decode ms':>9}")
+    for name, r in report['transport'].items():
+        print(f"{name:<10} {r['frame_bytes'] / 1024:>8.0f} {r['pickle_frame']['mean_ms']:>9.3f} "
+              f"{r['shared_memory']['mean_ms']:>8.3f} {r['encoded_queue']['mean_ms']:>10.3f} "
+              f"{r['decode_only']['mean_ms']:>9.3f}")
+    if 'engine' in report:
+        print(f"\n{'engine':<10} {'encoded ms':>10} {'shm ms':>8} {'encoded fps':>11} {'shm fps':>8}")
+    for name, r in report.get('engine', {}).items():
+        encoded, shared = r['encoded_queue'], r['shared_memory']
+        print(f"{name:<10} {encoded['mean_ms']:>10.3f} {shared['mean_ms']:>8.3f} "
+              f"{encoded['frames_per_second']:>11.0f} {shared['frames_per_second']:>8.0f}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare shared-memory and queue frame transports')
+    parser.add_argument('--resolutions', nargs='+', default=list(RESOLUTIONS), choices=list(RESOLUTIONS))
+    parser.add_argument('--iterations', type=int, default=200, help='Timed round trips per transport and resolution')
+    parser.add_argument('--engine', action='store_true', help='Also time WorkerEngine.detect end to end')
+    parser.add_argument('--workers', type=int, default=2, help='Worker processes for --engine')
+    parser.add_argument('--clients', type=int, default=8, help='Concurrent client threads for the --engine throughput run')
+    parser.add_argument('--output', type=str, default=None, help='Write JSON results here')
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    print_table(report)
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,32 @@
+import time
+_MODULE_START = time.perf_counter()
+
 import os
+import sys
 import cv2
-import torch
 import numpy as np
-import pygame
-import requests
 import argparse
+import glob
+import json
 import logging
-from PIL import Image
-from io import BytesIO
+import operator
+import queue
+import threading
+from contextlib import contextmanager
 from dotenv import load_dotenv
-from ultralytics import YOLO
 from datetime import datetime
-import mediapipe as mp
-from scipy.spatial import distance as dist
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+# Shared EAR/MAR geometry kernel lives with the backend
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend', 'src'))
+from drowsiness_detector import load_cascades
+from frame_stream import LatestFrameSlot
+from geometry import eye_aspect_ratio, mouth_aspect_ratio
+from model_cache import ModelCache
+
+# Heavy dependencies (torch, ultralytics, mediapipe, pygame, requests, PIL)
+# are imported inside the mode that uses them, so startup only pays for
+# what actually runs.
 
 # Load environment variables from .env file
 load_dotenv()
@@ -22,17 +36,85 @@ load_dotenv()
 DEFAULT_WEIGHTS = os.getenv('WEIGHTS', 'yolov5/runs/train/exp/weights/last.pt')
 DEFAULT_TEST_IMG_URL = os.getenv('TEST_IMG_URL', 'https://daily.jstor.org/wp-content/uploads/2017/12/traffic_jam_1050x700.jpg')
 DEFAULT_ALARM_PATH = os.getenv('ALARM_PATH', 'alarm.mp3')
+# Local YOLOv5 checkout used as the torch.hub source (no network access)
+DEFAULT_YOLOV5_DIR = os.getenv('YOLOV5_DIR', 'yolov5')
+# Optional pinned SHA-256 of the weights
+DEFAULT_WEIGHTS_SHA256 = os.getenv('WEIGHTS_SHA256')
+# Inference runtime: torch, or an exported CPU model (onnx, onnx-int8, opencv)
+DEFAULT_RUNTIME = os.getenv('RUNTIME', 'torch')
 # ────────────────────────────────────────────────────────────────
 
+# FaceMesh contour indices in the geometry kernel's point layouts: each eye as
+# 6 points (corners 0/3, vertical pairs (1, 5) and (2, 4)) and the inner lips
+# as 8 points (corners 0/4, vertical pairs (1, 7), (2, 6) and (3, 5))
+RIGHT_EYE_INDICES = (33, 160, 158, 133, 153, 144)
+LEFT_EYE_INDICES = (362, 385, 387, 263, 373, 380)
+MOUTH_INDICES = (78, 81, 13, 311, 308, 402, 14, 178)
+FEATURE_INDICES = RIGHT_EYE_INDICES + LEFT_EYE_INDICES + MOUTH_INDICES
+EYE_POINTS = len(RIGHT_EYE_INDICES) + len(LEFT_EYE_INDICES)
+# Fetches all feature landmarks of a face in one C-level call
+_gather_features = operator.itemgetter(*FEATURE_INDICES)
+
+def gather_feature_points(landmarks, width, height, out):
+    """Copy the eye and mouth contour points of one FaceMesh face into ``out`` as pixels.
+
+    Only the ``len(FEATURE_INDICES)`` needed points are read, instead of
+    converting all ~478 mesh landmarks.
+    """
+    out[:] = [(point.x, point.y) for point in _gather_features(landmarks)]
+    out *= (width, height)
+    return out
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+class StartupTimer:
+    """Records how long each import and load step of startup takes."""
+
+    def __init__(self, origin: float):
+        self.origin = origin
+        self.stages: List[Tuple[str, float]] = []
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append((name, time.perf_counter() - start))
+
+    def report(self) -> str:
+        lines = ['Startup time report:']
+        for name, seconds in self.stages:
+            lines.append(f"  {name:<28} {seconds * 1000:8.1f} ms")
+        lines.append(f"  {'total since module import':<28} {(time.perf_counter() - self.origin) * 1000:8.1f} ms")
+        return '\n'.join(lines)
+
+STARTUP = StartupTimer(_MODULE_START)
+STARTUP.stages.append(('import core modules', time.perf_counter() - _MODULE_START))
+
 class DrowsinessDetector:
-    def __init__(self, model_path='yolov5s.pt'):
-        logger.info(f"Loading model from {model_path}")
-        self.model = YOLO(model_path)
+    def __init__(self, model_path='yolov5s.pt', cache=None, weights_sha256=None):
+        # model_path=None runs the FaceMesh path only, without loading YOLO
+        self.model = None
+        if model_path is not None:
+            with STARTUP.stage('verify cached weights'):
+                model_path = (cache or ModelCache()).fetch(model_path, weights_sha256)
+            logger.info(f"Loading model from {model_path}")
+            with STARTUP.stage('import ultralytics'):
+                from ultralytics import YOLO
+            with STARTUP.stage('load YOLO model'):
+                self.model = YOLO(model_path)
+        with STARTUP.stage('import mediapipe'):
+            import mediapipe as mp
         self.mp_face_mesh = mp.solutions.face_mesh
+        # Haar cascades for get_face_landmarks, loaded once rather than per call
+        self.face_cascade, self.eye_cascade = load_cascades()
+        # Preallocated feature points: both eyes (2 x 6) then the mouth (8), as views
+        self.feature_points = np.empty((len(FEATURE_INDICES), 2), dtype=np.float64)
+        self.eye_points = self.feature_points[:EYE_POINTS].reshape(2, len(RIGHT_EYE_INDICES), 2)
+        self.mouth_points = self.feature_points[EYE_POINTS:]
         self.face_mesh = self.mp_face_mesh.FaceMesh(
             max_num_faces=1,
             refine_landmarks=True,
@@ -82,21 +164,16 @@ class DrowsinessDetector:
         
         logger.info("Model and face mesh loaded successfully")
 
-    def calculate_ear(self, landmarks):
+    def calculate_ear(self, eye_points):
         try:
-            # Calculate the eye aspect ratio (EAR)
-            # Vertical eye landmarks
-            v1 = np.linalg.norm(landmarks[1] - landmarks[5])
-            v2 = np.linalg.norm(landmarks[2] - landmarks[4])
-            # Horizontal eye landmarks
-            h = np.linalg.norm(landmarks[0] - landmarks[3])
-            # Calculate EAR
-            ear = (v1 + v2) / (2.0 * h)
+            # Eye aspect ratio (EAR) of each (..., 6, 2) eye with the shared kernel, averaged
+            ear_values = np.atleast_1d(eye_aspect_ratio(eye_points))
+            if np.all(np.isnan(ear_values)):
+                return None, None, self.blink_rate
+            ear = float(np.nanmean(ear_values))
             
-            # Add additional checks for eye closure
-            eye_height = np.mean([v1, v2])
-            eye_width = h
-            eye_ratio = eye_height / eye_width
+            # Mean eye height over eye width, which equals EAR for the 6-point layout
+            eye_ratio = ear
             
             # Calculate blink rate
             current_time = datetime.now()
@@ -114,13 +191,11 @@ class DrowsinessDetector:
             logger.error(f"Error calculating EAR: {str(e)}")
             return None, None, 0
 
-    def calculate_mar(self, landmarks):
+    def calculate_mar(self, mouth_points):
         try:
-            # Calculate mouth aspect ratio
-            mouth_width = np.linalg.norm(landmarks[0] - landmarks[6])
-            mouth_height = np.linalg.norm(landmarks[2] - landmarks[4])
-            mar = mouth_height / mouth_width
-            return mar
+            # Mouth aspect ratio of the 8-point inner lip contour
+            mar = float(mouth_aspect_ratio(mouth_points))
+            return None if np.isnan(mar) else mar
         except Exception as e:
             logger.error(f"Error calculating MAR: {str(e)}")
             return None
@@ -155,17 +230,18 @@ class DrowsinessDetector:
             face_mesh_results = self.face_mesh.process(frame_rgb)
             
             if face_mesh_results.multi_face_landmarks:
-                landmarks = np.array([[lm.x * frame.shape[1], lm.y * frame.shape[0]] 
-                                    for lm in face_mesh_results.multi_face_landmarks[0].landmark])
+                # Gather only the eye and mouth contours into the preallocated buffer
+                gather_feature_points(face_mesh_results.multi_face_landmarks[0].landmark,
+                                      frame.shape[1], frame.shape[0], self.feature_points)
                 
                 # Calculate metrics
-                ear, eye_ratio, blink_rate = self.calculate_ear(landmarks)
-                mar = self.calculate_mar(landmarks)
+                ear, eye_ratio, blink_rate = self.calculate_ear(self.eye_points)
+                mar = self.calculate_mar(self.mouth_points)
                 
                 if ear is not None and eye_ratio is not None:
-                    # Enhanced drowsiness detection using multiple metrics
+                    # Enhanced drowsiness detection using multiple metrics (eye_ratio
+                    # equals EAR, so closure is covered by the EAR check)
                     is_drowsy = (ear < self.ear_threshold or 
-                               eye_ratio > self.eye_ratio_threshold or 
                                (mar is not None and mar > self.mar_threshold))
                     
                     if is_drowsy:
@@ -193,8 +269,7 @@ class DrowsinessDetector:
             gray = cv2.cvtColor(face_roi, cv2.COLOR_BGR2GRAY)
             
             # Use a more sensitive face detector with adjusted parameters
-            face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-            faces = face_cascade.detectMultiScale(gray, 1.1, 3, minSize=(30, 30))
+            faces = self.face_cascade.detectMultiScale(gray, 1.1, 3, minSize=(30, 30))
             
             if len(faces) > 0:
                 x, y, w, h = faces[0]
@@ -202,8 +277,7 @@ class DrowsinessDetector:
                 eye_region = gray[max(0, y-10):min(gray.shape[0], y+h//2+10), max(0, x-10):min(gray.shape[1], x+w+10)]
                 
                 # Use a more sensitive eye detector with adjusted parameters
-                eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
-                eyes = eye_cascade.detectMultiScale(eye_region, 1.1, 3, minSize=(20, 20))
+                eyes = self.eye_cascade.detectMultiScale(eye_region, 1.1, 3, minSize=(20, 20))
                 
                 if len(eyes) >= 2:
                     # Calculate eye landmarks with more precision
@@ -224,19 +298,40 @@ class DrowsinessDetector:
             logger.error(f"Error in face landmark detection: {str(e)}")
             return None
 
-def load_model(weights_path):
+def load_model(weights_path, yolov5_dir=DEFAULT_YOLOV5_DIR, weights_sha256=None, cache=None,
+               runtime='torch', calibration_dir=None):
     """
-    Load the YOLOv5 model from the specified weights path.
+    Load the YOLOv5 model from the local model cache, without network access.
     
     Args:
-        weights_path (str): Path to the model weights.
+        weights_path (str): Path to the model weights (copied into the cache on first use).
+        yolov5_dir (str): Local YOLOv5 checkout used as the torch.hub source and exporter.
+        weights_sha256 (str): Optional pinned SHA-256 of the weights.
+        cache (ModelCache): Cache to load from (default: MODEL_CACHE_DIR).
+        runtime (str): 'torch', or an exported CPU runtime: 'onnx', 'onnx-int8' or 'opencv'.
+        calibration_dir (str): Frames used to calibrate the INT8 model (optional).
     
     Returns:
-        model: The loaded YOLOv5 model.
+        model: The loaded YOLOv5 model, or an equivalent ``ExportedModel``.
     """
-    logger.info(f'Loading model from {weights_path}...')
     try:
-        return torch.hub.load('ultralytics/yolov5', 'custom', path=weights_path, force_reload=True)
+        cache = cache or ModelCache()
+        with STARTUP.stage('verify cached weights'):
+            cached_path = cache.fetch(weights_path, weights_sha256)
+        if runtime != 'torch':
+            from exported_model import load_exported
+            with STARTUP.stage(f'load {runtime} model'):
+                return load_exported(cached_path, runtime, yolov5_dir, cache.root, calibration_dir)
+        if not os.path.isfile(os.path.join(yolov5_dir, 'hubconf.py')):
+            raise FileNotFoundError(f"No local YOLOv5 checkout at {yolov5_dir} "
+                                    f"(clone ultralytics/yolov5 there or set YOLOV5_DIR)")
+        logger.info(f'Loading model from {cached_path}...')
+        # Never let YOLOv5 pip-install missing requirements at load time
+        os.environ.setdefault('YOLOv5_AUTOINSTALL', 'False')
+        with STARTUP.stage('import torch'):
+            import torch
+        with STARTUP.stage('load YOLOv5 model'):
+            return torch.hub.load(yolov5_dir, 'custom', path=cached_path, source='local')
     except Exception as e:
         logger.error(f"Failed to load model: {e}")
         raise
@@ -250,6 +345,9 @@ def detect_image(model, url):
         url (str): URL of the image to test.
     """
     logger.info('Downloading test image…')
+    import requests
+    from io import BytesIO
+    from PIL import Image
     try:
         resp = requests.get(url)
         resp.raise_for_status()
@@ -266,15 +364,19 @@ def detect_image(model, url):
     except Exception as e:
         logger.error(f"Error during image detection: {e}")
 
-def real_time_detection(model, alarm_path):
+def real_time_detection(model, alarm_path, report_startup=False):
     """
     Perform real-time drowsiness detection using the webcam and play an alarm if drowsiness is detected.
     
     Args:
         model: The YOLOv5 model.
         alarm_path (str): Path to the alarm sound file.
+        report_startup (bool): Log the startup time report once the first frame can be read.
     """
     # init pygame mixer for alarm
+    os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+    with STARTUP.stage('import pygame'):
+        import pygame
     pygame.mixer.init()
     alarm_playing = False
 
@@ -283,6 +385,8 @@ def real_time_detection(model, alarm_path):
         logger.error('Cannot open webcam')
         raise RuntimeError('Cannot open webcam')
     logger.info('Starting webcam stream. Press Q to quit.')
+    if report_startup:
+        logger.info(STARTUP.report())
 
     try:
         while True:
@@ -293,7 +397,7 @@ def real_time_detection(model, alarm_path):
 
             results = model(frame)
             # get list of detected class names
-            labels = results.pandas().xyxy[0]['name'].tolist()
+            labels = detected_labels(results)
 
             # if drowsy detected → alarm
             if 'drowsy' in labels and not alarm_playing:
@@ -315,18 +419,480 @@ def real_time_detection(model, alarm_path):
         cap.release()
         cv2.destroyAllWindows()
 
+class PipelineStats:
+    """Per-stage frame rates and end-to-end latency for the pipelined mode."""
+
+    STAGES = ('capture', 'inference', 'output')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = dict.fromkeys(self.STAGES, 0)
+        self.latency_sum = 0.0
+        self.started = time.perf_counter()
+        self._window_start = self.started
+        self._window_counts = dict(self.counts)
+        self._window_latency = 0.0
+
+    def tick(self, stage: str, captured_at: Optional[float] = None):
+        with self._lock:
+            self.counts[stage] += 1
+            if captured_at is not None:
+                self.latency_sum += time.perf_counter() - captured_at
+
+    def report(self, dropped: int, since_start: bool = False) -> str:
+        """Rates since the last report (or since start), e.g. for periodic logging."""
+        now = time.perf_counter()
+        with self._lock:
+            counts, latency_sum = dict(self.counts), self.latency_sum
+            if since_start:
+                start, base, base_latency = self.started, dict.fromkeys(self.STAGES, 0), 0.0
+            else:
+                start, base, base_latency = self._window_start, self._window_counts, self._window_latency
+                self._window_start, self._window_counts, self._window_latency = now, counts, latency_sum
+        elapsed = max(now - start, 1e-9)
+        rates = {stage: (counts[stage] - base[stage]) / elapsed for stage in self.STAGES}
+        shown = counts['output'] - base['output']
+        latency_ms = (latency_sum - base_latency) / shown * 1000 if shown else 0.0
+        return (f"capture {rates['capture']:.1f} fps | inference {rates['inference']:.1f} fps | "
+                f"output {rates['output']:.1f} fps | end-to-end {rates['output']:.1f} fps, "
+                f"latency {latency_ms:.0f} ms | dropped {dropped} stale frames")
+
+def label_scores(results, index=0):
+    """Highest confidence per class name in one image of a YOLOv5 result.
+
+    Reads the raw ``(n, 6)`` prediction tensor (x1, y1, x2, y2, conf, cls)
+    instead of building a pandas DataFrame per frame.
+    """
+    scores = {}
+    for conf, cls in results.pred[index][:, 4:6].tolist():
+        name = results.names[int(cls)]
+        if conf > scores.get(name, 0.0):
+            scores[name] = conf
+    return scores
+
+def detected_labels(results):
+    """Class names in a YOLOv5 result, read from the raw predictions (no pandas DataFrame)."""
+    return set(label_scores(results))
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+def parse_source(spec: str) -> Union[int, str]:
+    """A camera index for numeric specs, otherwise a video path or frame directory."""
+    return int(spec) if spec.isdigit() else spec
+
+def iter_frames(source: Union[int, str], fps: float = 30.0) -> Iterator[Tuple[int, float, np.ndarray]]:
+    """
+    Yield ``(frame_index, timestamp, frame)`` from a camera index, video file or frame directory.
+    
+    Timestamps are wall-clock seconds for cameras, video time for files and
+    ``index / fps`` for directories of images (read in sorted name order).
+    """
+    if isinstance(source, str) and os.path.isdir(source):
+        paths = sorted(p for p in glob.glob(os.path.join(source, '*'))
+                       if p.lower().endswith(IMAGE_EXTENSIONS))
+        for index, path in enumerate(paths):
+            frame = cv2.imread(path)
+            if frame is None:
+                logger.warning(f"Skipping unreadable frame {path}")
+                continue
+            yield index, index / fps, frame
+        return
+
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise RuntimeError(f'Cannot open source {source}')
+    is_camera = isinstance(source, int)
+    video_fps = cap.get(cv2.CAP_PROP_FPS) or fps
+    index = 0
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield index, time.time() if is_camera else index / video_fps, frame
+            index += 1
+    finally:
+        cap.release()
+
+class StateTracker:
+    """Drowsy/alert state of one stream, switching after ``min_frames`` agreeing frames."""
+
+    def __init__(self, min_frames: int = 1):
+        self.min_frames = min_frames
+        self.drowsy = False
+        self._streak = 0
+
+    def update(self, drowsy: bool) -> bool:
+        """Feed one frame; True when the state just changed."""
+        if drowsy == self.drowsy:
+            self._streak = 0
+            return False
+        self._streak += 1
+        if self._streak < self.min_frames:
+            return False
+        self.drowsy = drowsy
+        self._streak = 0
+        return True
+
+def state_event(source, frame_index, timestamp, drowsy, scores):
+    """A JSON-serializable drowsy/alert transition event."""
+    return {
+        'event': 'drowsy' if drowsy else 'alert',
+        'source': str(source),
+        'frame': frame_index,
+        'timestamp': timestamp,
+        'confidence': round(scores.get('drowsy', 0.0), 4),
+        'labels': sorted(scores)
+    }
+
+def write_event(stream, event):
+    stream.write(json.dumps(event) + '\n')
+    stream.flush()
+
+def headless_detection(model, source, events=sys.stdout, min_frames=1, fps=30.0):
+    """
+    Run detection without a window and emit only drowsy/alert state transitions.
+    
+    Class ids come straight from the raw prediction tensors and nothing is
+    rendered. Each transition is written to ``events`` as one JSON line.
+    
+    Args:
+        model: The YOLOv5 model.
+        source: Camera index, video path or directory of frames.
+        events: Text stream for JSON-lines events.
+        min_frames (int): Consecutive agreeing frames required to switch state.
+        fps (float): Frame rate used to timestamp frame directories.
+    
+    Returns:
+        int: Number of frames processed.
+    """
+    state = StateTracker(min_frames)
+    processed = 0
+    for frame_index, timestamp, frame in iter_frames(source, fps):
+        scores = label_scores(model(frame))
+        processed += 1
+        if state.update('drowsy' in scores):
+            write_event(events, state_event(source, frame_index, timestamp, state.drowsy, scores))
+    logger.info(f"Processed {processed} frames from {source}")
+    return processed
+
+def _put_latest(q, item):
+    """Put into a bounded queue, discarding its oldest entry when full."""
+    while True:
+        try:
+            q.put_nowait(item)
+            return
+        except queue.Full:
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                pass
+
+def pipelined_detection(model, alarm_path, source=0, report_interval=5.0, report_startup=False):
+    """
+    Real-time detection with capture, inference and output running concurrently.
+    
+    A capture thread keeps only the newest camera frame, so inference never
+    works on a stale one; an inference thread runs the model and hands
+    results to the output stage (alarm, render, display) on the main thread
+    through a bounded queue that also keeps only the newest result. Per-stage
+    and end-to-end FPS plus capture-to-display latency are logged every
+    ``report_interval`` seconds and summarized on exit.
+    
+    Args:
+        model: The YOLOv5 model.
+        alarm_path (str): Path to the alarm sound file.
+        source: Camera index or video path for ``cv2.VideoCapture``.
+        report_interval (float): Seconds between FPS reports.
+        report_startup (bool): Log the startup time report once the camera is open.
+    """
+    os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+    with STARTUP.stage('import pygame'):
+        import pygame
+    pygame.mixer.init()
+    alarm_playing = False
+
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        logger.error('Cannot open webcam')
+        raise RuntimeError('Cannot open webcam')
+    logger.info('Starting pipelined webcam stream. Press Q to quit.')
+    if report_startup:
+        logger.info(STARTUP.report())
+
+    stats = PipelineStats()
+    frames = LatestFrameSlot()
+    outputs = queue.Queue(maxsize=2)
+    stop = threading.Event()
+
+    def capture():
+        try:
+            while not stop.is_set():
+                ret, frame = cap.read()
+                if not ret:
+                    logger.warning("Failed to grab frame")
+                    break
+                stats.tick('capture')
+                frames.put((time.perf_counter(), frame))
+        finally:
+            frames.close()
+
+    def inference():
+        try:
+            while not stop.is_set():
+                item = frames.take(timeout=0.5)
+                if item is None:
+                    if frames.closed:
+                        break
+                    continue
+                _, (captured_at, frame) = item
+                results = model(frame)
+                stats.tick('inference')
+                _put_latest(outputs, (captured_at, results, detected_labels(results)))
+        except Exception as e:
+            logger.error(f"Error in inference stage: {str(e)}")
+        finally:
+            _put_latest(outputs, None)
+
+    threads = [threading.Thread(target=capture, name='capture', daemon=True),
+               threading.Thread(target=inference, name='inference', daemon=True)]
+    for thread in threads:
+        thread.start()
+
+    next_report = time.perf_counter() + report_interval
+    try:
+        while True:
+            try:
+                item = outputs.get(timeout=0.5)
+            except queue.Empty:
+                item = ()
+            if item is None:
+                break
+            if item:
+                captured_at, results, labels = item
+                # if drowsy detected → alarm
+                if 'drowsy' in labels and not alarm_playing:
+                    logger.warning('⚠️  Drowsiness detected! Playing alarm.')
+                    pygame.mixer.music.load(alarm_path)
+                    pygame.mixer.music.play()
+                    alarm_playing = True
+                elif 'drowsy' not in labels and alarm_playing:
+                    pygame.mixer.music.stop()
+                    alarm_playing = False
+
+                # render and show
+                rendered = np.squeeze(results.render())
+                cv2.imshow('Drowsiness Detection', cv2.cvtColor(rendered, cv2.COLOR_RGB2BGR))
+                stats.tick('output', captured_at)
+
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+            if time.perf_counter() >= next_report:
+                logger.info(stats.report(frames.dropped))
+                next_report += report_interval
+    finally:
+        stop.set()
+        frames.close()
+        for thread in threads:
+            thread.join(timeout=2.0)
+        cap.release()
+        cv2.destroyAllWindows()
+        logger.info('Session: ' + stats.report(frames.dropped, since_start=True))
+
+class StreamState:
+    """Per-stream bookkeeping for multi-stream detection: latest frame, drowsy state and alarm channel."""
+
+    def __init__(self, source, min_frames=1):
+        self.source = source
+        self.slot = LatestFrameSlot()
+        # Recorded sources wait for their previous frame to be batched instead of dropping it
+        self.credit = None if isinstance(source, int) else threading.Semaphore(1)
+        self.state = StateTracker(min_frames)
+        self.channel = None
+        self.processed = 0
+        self.error: Optional[str] = None
+
+def multi_stream_detection(model, sources, alarm_path=None, events=sys.stdout, min_frames=1,
+                           fps=30.0, report_interval=5.0):
+    """
+    Detect on several cameras or videos with one batched model call per tick.
+    
+    Each camera gets a capture thread that keeps only its newest frame;
+    video files and frame directories are read losslessly, one frame per
+    tick. The inference loop gathers whichever streams have a new frame, runs them
+    through the model as one batch, then demultiplexes the predictions back
+    to each stream's drowsy/alert state. Transitions are written to
+    ``events`` as JSON lines tagged with the source, and each stream starts
+    and stops its own looping alarm channel.
+    
+    Args:
+        model: The YOLOv5 model.
+        sources (list): Camera indices, video paths or frame directories.
+        alarm_path (str): Alarm sound file, or None for no audio.
+        events: Text stream for JSON-lines events, or None.
+        min_frames (int): Consecutive agreeing frames required to switch state.
+        fps (float): Frame rate used to timestamp frame directories.
+        report_interval (float): Seconds between throughput reports.
+    
+    Returns:
+        list: Frames processed per source, in source order.
+    """
+    alarm = None
+    if alarm_path:
+        os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+        with STARTUP.stage('import pygame'):
+            import pygame
+        pygame.mixer.init()
+        pygame.mixer.set_num_channels(max(8, len(sources)))
+        alarm = pygame.mixer.Sound(alarm_path)
+
+    streams = [StreamState(source, min_frames) for source in sources]
+    ready = threading.Event()
+    stop = threading.Event()
+
+    def capture(stream):
+        try:
+            for frame_index, timestamp, frame in iter_frames(stream.source, fps):
+                if stream.credit is not None:
+                    while not stream.credit.acquire(timeout=0.5):
+                        if stop.is_set():
+                            return
+                if stop.is_set():
+                    break
+                stream.slot.put((frame_index, timestamp, frame))
+                ready.set()
+        except Exception as e:
+            stream.error = str(e)
+            logger.error(f"Capture stopped for {stream.source}: {str(e)}")
+        finally:
+            stream.slot.close()
+            ready.set()
+
+    threads = [threading.Thread(target=capture, args=(stream,), name=f'capture-{i}', daemon=True)
+               for i, stream in enumerate(streams)]
+    for thread in threads:
+        thread.start()
+    logger.info(f"Starting multi-stream detection on {len(streams)} sources")
+
+    batches = 0
+    started = window_start = time.perf_counter()
+    window_frames = 0
+    try:
+        while True:
+            ready.wait(timeout=0.5)
+            ready.clear()
+            batch = []
+            for stream in streams:
+                item = stream.slot.take(timeout=0)
+                if item is not None:
+                    batch.append((stream, item[1]))
+                    if stream.credit is not None:
+                        stream.credit.release()
+            if not batch:
+                if all(stream.slot.closed for stream in streams):
+                    break
+                continue
+
+            results = model([frame for _, (_, _, frame) in batch])
+            batches += 1
+            window_frames += len(batch)
+            for i, (stream, (frame_index, timestamp, _)) in enumerate(batch):
+                scores = label_scores(results, i)
+                stream.processed += 1
+                if not stream.state.update('drowsy' in scores):
+                    continue
+                if events is not None:
+                    write_event(events, state_event(stream.source, frame_index, timestamp,
+                                                    stream.state.drowsy, scores))
+                if alarm is None:
+                    continue
+                if stream.state.drowsy:
+                    logger.warning(f"⚠️  Drowsiness detected on {stream.source}! Playing alarm.")
+                    stream.channel = alarm.play(loops=-1)
+                elif stream.channel is not None:
+                    stream.channel.stop()
+                    stream.channel = None
+
+            now = time.perf_counter()
+            if now - window_start >= report_interval:
+                logger.info(f"{window_frames / (now - window_start):.1f} frames/s across "
+                            f"{len(streams)} streams | dropped " +
+                            ', '.join(f"{stream.source}: {stream.slot.dropped}" for stream in streams))
+                window_start, window_frames = now, 0
+    finally:
+        stop.set()
+        for stream in streams:
+            stream.slot.close()
+            if stream.channel is not None:
+                stream.channel.stop()
+        for thread in threads:
+            thread.join(timeout=2.0)
+
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    total = sum(stream.processed for stream in streams)
+    logger.info(f"Session: {total} frames in {batches} batches "
+                f"(mean batch {total / max(batches, 1):.1f}), {total / elapsed:.1f} frames/s")
+    return [stream.processed for stream in streams]
+
 def main():
     parser = argparse.ArgumentParser(description='Drowsiness Detection using YOLOv5')
     parser.add_argument('--weights', type=str, default=DEFAULT_WEIGHTS, help='Path to model weights')
-    parser.add_argument('--test-img', type=str, default=DEFAULT_TEST_IMG_URL, help='URL for test image')
+    parser.add_argument('--weights-sha256', type=str, default=DEFAULT_WEIGHTS_SHA256,
+                        help='Expected SHA-256 of the weights (default: checksum recorded when first cached)')
+    parser.add_argument('--yolov5-dir', type=str, default=DEFAULT_YOLOV5_DIR, help='Local YOLOv5 checkout')
+    parser.add_argument('--runtime', type=str, default=DEFAULT_RUNTIME,
+                        choices=['torch', 'onnx', 'onnx-int8', 'opencv'],
+                        help='Inference runtime; exported runtimes are built in the model cache on first use')
+    parser.add_argument('--calibration-dir', type=str, default=None,
+                        help='Frames to calibrate the onnx-int8 model on (default: dynamic quantization)')
+    parser.add_argument('--test-img', type=str, default=DEFAULT_TEST_IMG_URL,
+                        help='URL for test image (empty string to skip)')
     parser.add_argument('--alarm', type=str, default=DEFAULT_ALARM_PATH, help='Path to alarm sound file')
+    parser.add_argument('--pipelined', action='store_true',
+                        help='Run capture, inference and display concurrently, reporting per-stage FPS')
+    parser.add_argument('--headless', action='store_true',
+                        help='No display or alarm; emit drowsy/alert transitions as JSON lines')
+    parser.add_argument('--source', type=str, default='0',
+                        help='Camera index, video file or directory of frames')
+    parser.add_argument('--sources', type=str, nargs='+',
+                        help='Several cameras/videos/frame directories, detected with one batched model call per tick')
+    parser.add_argument('--events', type=str, default='-',
+                        help='Headless/multi-stream event output file (- for stdout)')
+    parser.add_argument('--min-frames', type=int, default=1,
+                        help='Consecutive frames required before a headless state change')
+    parser.add_argument('--fps', type=float, default=30.0,
+                        help='Frame rate used to timestamp frame directories')
+    parser.add_argument('--startup-report', action='store_true',
+                        help='Log per-stage import and load times, then exit')
     args = parser.parse_args()
 
-    model = load_model(args.weights)
+    model = load_model(args.weights, args.yolov5_dir, args.weights_sha256,
+                       runtime=args.runtime, calibration_dir=args.calibration_dir)
+    if args.startup_report:
+        print(STARTUP.report())
+        return
+    source = parse_source(args.source)
+    if args.sources or args.headless:
+        events = sys.stdout if args.events == '-' else open(args.events, 'a')
+        try:
+            if args.sources:
+                multi_stream_detection(model, [parse_source(spec) for spec in args.sources],
+                                       None if args.headless else args.alarm,
+                                       events, args.min_frames, args.fps)
+            else:
+                headless_detection(model, source, events, args.min_frames, args.fps)
+        finally:
+            if events is not sys.stdout:
+                events.close()
+        return
     # 1) Quick test on a static image:
-    detect_image(model, args.test_img)
+    if args.test_img:
+        detect_image(model, args.test_img)
     # 2) Then real-time webcam with alarm:
-    real_time_detection(model, args.alarm)
+    if args.pipelined:
+        pipelined_detection(model, args.alarm, source, report_startup=True)
+    else:
+        real_time_detection(model, args.alarm, report_startup=True)
 
 if __name__ == '__main__':
     main()
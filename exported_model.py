@@ -0,0 +1,288 @@
+import ast
+import glob
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from model_cache import sha256_file
+
+logger = logging.getLogger(__name__)
+
+RUNTIMES = ('torch', 'onnx', 'onnx-int8', 'opencv')
+DEFAULT_IMG_SIZE = 640
+PAD_VALUE = 114
+# Class offset applied to boxes so one NMS pass never suppresses across classes
+CLASS_OFFSET = 4096
+
+class ExportError(RuntimeError):
+    """Raised when weights cannot be exported or an exported model cannot be loaded."""
+
+def letterbox(image: np.ndarray, size: int) -> Tuple[np.ndarray, float, Tuple[float, float]]:
+    """Resize keeping aspect ratio and pad to ``size`` x ``size``; returns (image, ratio, (pad_x, pad_y))."""
+    h, w = image.shape[:2]
+    ratio = min(size / h, size / w)
+    nw, nh = int(round(w * ratio)), int(round(h * ratio))
+    pad_x, pad_y = (size - nw) / 2, (size - nh) / 2
+    if (nw, nh) != (w, h):
+        image = cv2.resize(image, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    top, left = int(round(pad_y - 0.1)), int(round(pad_x - 0.1))
+    image = cv2.copyMakeBorder(image, top, size - nh - top, left, size - nw - left,
+                               cv2.BORDER_CONSTANT, value=(PAD_VALUE,) * 3)
+    return image, ratio, (left, top)
+
+def preprocess(images: Sequence[np.ndarray], size: int) -> Tuple[np.ndarray, List[Tuple[float, Tuple[float, float]]]]:
+    """Letterboxed NCHW float32 batch in [0, 1] plus per-image (ratio, pad) to map boxes back.
+
+    Channels are passed through unchanged, matching what the torch model's
+    ``AutoShape`` wrapper does with NumPy input.
+    """
+    blob = np.empty((len(images), 3, size, size), dtype=np.float32)
+    meta = []
+    for i, image in enumerate(images):
+        boxed, ratio, pad = letterbox(image, size)
+        blob[i] = boxed.transpose(2, 0, 1)
+        meta.append((ratio, pad))
+    blob *= 1.0 / 255
+    return blob, meta
+
+def postprocess(prediction: np.ndarray,
+                meta: Sequence[Tuple[float, Tuple[float, float]]],
+                shapes: Sequence[Tuple[int, int]],
+                conf_thres: float = 0.25,
+                iou_thres: float = 0.45,
+                max_det: int = 1000) -> List[np.ndarray]:
+    """YOLOv5 raw output ``(n, anchors, 5 + classes)`` to per-image ``(k, 6)`` detections.
+
+    Rows are (x1, y1, x2, y2, conf, cls) in original image pixels, like
+    ``results.pred`` of the torch model.
+    """
+    out = []
+    for x, (ratio, (pad_x, pad_y)), (h, w) in zip(prediction, meta, shapes):
+        x = x[x[:, 4] > conf_thres]
+        scores = x[:, 5:] * x[:, 4:5]
+        cls = scores.argmax(1) if len(x) else np.zeros(0, dtype=np.int64)
+        conf = scores[np.arange(len(x)), cls]
+        keep = conf > conf_thres
+        x, cls, conf = x[keep], cls[keep], conf[keep]
+        if not len(x):
+            out.append(np.zeros((0, 6), dtype=np.float32))
+            continue
+        xywh = x[:, :4].copy()
+        xywh[:, :2] -= xywh[:, 2:] / 2
+        offset = xywh.copy()
+        offset[:, :2] += cls[:, None] * CLASS_OFFSET
+        idx = np.asarray(cv2.dnn.NMSBoxes(offset.tolist(), conf.tolist(), conf_thres, iou_thres),
+                         dtype=np.int64).reshape(-1)[:max_det]
+        boxes = np.concatenate([xywh[idx, :2], xywh[idx, :2] + xywh[idx, 2:]], axis=1)
+        boxes[:, [0, 2]] = ((boxes[:, [0, 2]] - pad_x) / ratio).clip(0, w)
+        boxes[:, [1, 3]] = ((boxes[:, [1, 3]] - pad_y) / ratio).clip(0, h)
+        out.append(np.concatenate([boxes, conf[idx, None], cls[idx, None]], axis=1).astype(np.float32))
+    return out
+
+class ExportedResults:
+    """The subset of YOLOv5 ``Detections`` the detector uses: ``pred``, ``names``, ``render()``, ``print()``."""
+
+    def __init__(self, ims: List[np.ndarray], pred: List[np.ndarray], names: Dict[int, str]):
+        self.ims = ims
+        self.pred = pred
+        self.names = names
+
+    def __len__(self):
+        return len(self.pred)
+
+    def render(self) -> List[np.ndarray]:
+        rendered = []
+        for im, det in zip(self.ims, self.pred):
+            im = im.copy()
+            for x1, y1, x2, y2, conf, cls in det.tolist():
+                label = f"{self.names[int(cls)]} {conf:.2f}"
+                cv2.rectangle(im, (int(x1), int(y1)), (int(x2), int(y2)), (255, 56, 56), 2)
+                cv2.putText(im, label, (int(x1), max(int(y1) - 4, 10)),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 56, 56), 1, cv2.LINE_AA)
+            rendered.append(im)
+        return rendered
+
+    def print(self):
+        for i, (im, det) in enumerate(zip(self.ims, self.pred)):
+            counts: Dict[str, int] = {}
+            for cls in det[:, 5].tolist():
+                counts[self.names[int(cls)]] = counts.get(self.names[int(cls)], 0) + 1
+            found = ', '.join(f"{n} {name}" for name, n in counts.items()) or '(no detections)'
+            print(f"image {i + 1}/{len(self.ims)}: {im.shape[0]}x{im.shape[1]} {found}")
+
+class ExportedModel:
+    """Callable stand-in for the torch hub model, backed by ONNX Runtime or OpenCV DNN.
+
+    Accepts one image (NumPy array or PIL image) or a list of them and
+    returns ``ExportedResults``. ``conf``, ``iou`` and ``max_det`` mirror the
+    torch model's ``AutoShape`` attributes.
+    """
+
+    def __init__(self, path: str, names: Dict[int, str], imgsz: int = DEFAULT_IMG_SIZE,
+                 backend: str = 'onnxruntime', threads: Optional[int] = None):
+        self.path = path
+        self.names = names
+        self.imgsz = imgsz
+        self.backend = backend
+        self.conf = 0.25
+        self.iou = 0.45
+        self.max_det = 1000
+        if backend == 'onnxruntime':
+            import onnxruntime as ort
+            options = ort.SessionOptions()
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            if threads:
+                options.intra_op_num_threads = threads
+            self._session = ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+            self._input_name = self._session.get_inputs()[0].name
+        elif backend == 'opencv':
+            self._net = cv2.dnn.readNetFromONNX(path)
+            self._net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+            self._net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        else:
+            raise ValueError(f"Unknown backend {backend}")
+
+    def forward(self, blob: np.ndarray) -> np.ndarray:
+        if self.backend == 'onnxruntime':
+            return self._session.run(None, {self._input_name: blob})[0]
+        self._net.setInput(blob)
+        return self._net.forward()
+
+    def __call__(self, imgs) -> ExportedResults:
+        ims = [np.asarray(im) for im in (imgs if isinstance(imgs, (list, tuple)) else [imgs])]
+        blob, meta = preprocess(ims, self.imgsz)
+        prediction = self.forward(blob)
+        pred = postprocess(prediction, meta, [im.shape[:2] for im in ims], self.conf, self.iou, self.max_det)
+        return ExportedResults(ims, pred, self.names)
+
+def _sidecar(path: str) -> str:
+    return os.path.splitext(path)[0] + '.json'
+
+def _read_sidecar(path: str) -> Optional[Dict]:
+    try:
+        with open(_sidecar(path)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+def _write_sidecar(path: str, info: Dict):
+    with open(_sidecar(path), 'w') as f:
+        json.dump(info, f, indent=2)
+
+def export_onnx(weights_path: str, yolov5_dir: str, output_path: str,
+                imgsz: int = DEFAULT_IMG_SIZE, weights_sha256: Optional[str] = None) -> Dict:
+    """Export weights to ONNX with the local YOLOv5 checkout's ``export.py``.
+
+    The graph takes a dynamic batch so multi-stream ticks run as one call.
+    Class names and the source checksum go to a JSON sidecar next to the
+    ONNX file, which is what keeps the OpenCV backend free of ``onnx``.
+    """
+    export_script = os.path.join(yolov5_dir, 'export.py')
+    if not os.path.isfile(export_script):
+        raise ExportError(f"No YOLOv5 export.py at {export_script} (clone ultralytics/yolov5 or set YOLOV5_DIR)")
+    exported = os.path.splitext(weights_path)[0] + '.onnx'
+    cmd = [sys.executable, export_script, '--weights', weights_path, '--include', 'onnx',
+           '--imgsz', str(imgsz), '--dynamic', '--device', 'cpu']
+    logger.info(f"Exporting {weights_path} to ONNX...")
+    env = dict(os.environ, YOLOv5_AUTOINSTALL='False')
+    proc = subprocess.run(cmd, capture_output=True, text=True, env=env)
+    if proc.returncode != 0 or not os.path.isfile(exported):
+        raise ExportError(f"ONNX export failed: {proc.stderr.strip()[-2000:]}")
+
+    import onnx
+    metadata = {p.key: p.value for p in onnx.load(exported).metadata_props}
+    if 'names' not in metadata:
+        raise ExportError(f"{exported} has no class names in its metadata")
+    names = {int(k): v for k, v in ast.literal_eval(metadata['names']).items()}
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    if os.path.abspath(exported) != os.path.abspath(output_path):
+        shutil.move(exported, output_path)
+    info = {
+        'names': names,
+        'imgsz': imgsz,
+        'weights_sha256': weights_sha256 or sha256_file(weights_path),
+        'int8': False
+    }
+    _write_sidecar(output_path, info)
+    logger.info(f"Exported {output_path}")
+    return info
+
+class CalibrationReader:
+    """ONNX Runtime calibration data reader over a directory of fixture frames."""
+
+    def __init__(self, directory: str, input_name: str, imgsz: int, limit: int = 100):
+        paths = sorted(glob.glob(os.path.join(directory, '*.jpg')) + glob.glob(os.path.join(directory, '*.png')))
+        if not paths:
+            raise ExportError(f"No .jpg/.png calibration frames in {directory}")
+        self._frames = (preprocess([frame], imgsz)[0]
+                        for frame in map(cv2.imread, paths[:limit]) if frame is not None)
+        self._input_name = input_name
+
+    def get_next(self) -> Optional[Dict[str, np.ndarray]]:
+        blob = next(self._frames, None)
+        return None if blob is None else {self._input_name: blob}
+
+def quantize_int8(onnx_path: str, output_path: str, calibration_dir: Optional[str] = None):
+    """INT8-quantize an exported model.
+
+    With ``calibration_dir`` activations are calibrated on those frames
+    (static QDQ quantization, usually the faster and more accurate choice);
+    without it only weights are quantized and activations are quantized
+    dynamically at run time.
+    """
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_dynamic, quantize_static
+    info = _read_sidecar(onnx_path)
+    logger.info(f"Quantizing {onnx_path} to INT8...")
+    if calibration_dir:
+        import onnxruntime as ort
+        input_name = ort.InferenceSession(onnx_path, providers=['CPUExecutionProvider']).get_inputs()[0].name
+        # Only convolutions: the detect head mixes pixel boxes and probabilities in one tensor,
+        # which a single INT8 range cannot hold, so its tail stays in float
+        quantize_static(onnx_path, output_path, CalibrationReader(calibration_dir, input_name, info['imgsz']),
+                        quant_format=QuantFormat.QDQ, per_channel=True, op_types_to_quantize=['Conv'],
+                        activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+    else:
+        quantize_dynamic(onnx_path, output_path, op_types_to_quantize=['Conv'], weight_type=QuantType.QUInt8)
+    _write_sidecar(output_path, dict(info, int8=True, calibration_dir=calibration_dir))
+
+def load_exported(weights_path: str,
+                  runtime: str,
+                  yolov5_dir: str,
+                  export_dir: str,
+                  calibration_dir: Optional[str] = None,
+                  threads: Optional[int] = None) -> ExportedModel:
+    """Load (exporting and quantizing first if needed) a CPU-optimized model for ``runtime``.
+
+    Exports live in ``export_dir`` and are rebuilt whenever the SHA-256 of
+    ``weights_path`` no longer matches the one they were exported from.
+    """
+    if runtime not in RUNTIMES or runtime == 'torch':
+        raise ValueError(f"Unknown exported runtime {runtime}")
+    stem = os.path.splitext(os.path.basename(weights_path))[0]
+    onnx_path = os.path.join(export_dir, stem + '.onnx')
+    weights_sha256 = sha256_file(weights_path)
+
+    info = _read_sidecar(onnx_path)
+    if info is None or info.get('weights_sha256') != weights_sha256 or not os.path.isfile(onnx_path):
+        info = export_onnx(weights_path, yolov5_dir, onnx_path, weights_sha256=weights_sha256)
+
+    path = onnx_path
+    if runtime == 'onnx-int8':
+        path = os.path.join(export_dir, stem + '.int8.onnx')
+        int8_info = _read_sidecar(path)
+        if (int8_info is None or int8_info.get('weights_sha256') != weights_sha256 or
+                int8_info.get('calibration_dir') != calibration_dir or not os.path.isfile(path)):
+            quantize_int8(onnx_path, path, calibration_dir)
+
+    names = {int(k): v for k, v in info['names'].items()}
+    backend = 'opencv' if runtime == 'opencv' else 'onnxruntime'
+    logger.info(f"Loading {path} with {backend}...")
+    return ExportedModel(path, names, info['imgsz'], backend, threads)
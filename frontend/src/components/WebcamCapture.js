@@ -14,6 +14,10 @@ import {
 import { FaCog, FaMoon, FaSun, FaChartLine, FaBell } from 'react-icons/fa';
 import SettingsPanel from './SettingsPanel';
 
+// Capture interval until the server recommends one (full rate)
+const DEFAULT_CAPTURE_INTERVAL_MS = 100;
+const MIN_CAPTURE_INTERVAL_MS = 50;
+
 ChartJS.register(
   CategoryScale,
   LinearScale,
@@ -64,6 +68,50 @@ const WebcamCapture = ({ onDrowsinessDetected, isDarkMode }) => {
   const alarmSound = useRef(new Audio('/alarm.mp3'));
   alarmSound.current.volume = settings.alarmVolume;
 
+  const socketRef = useRef(null);
+  const socketBusyRef = useRef(false);
+  const captureIntervalRef = useRef(DEFAULT_CAPTURE_INTERVAL_MS);
+
+  const handleDetectionResult = useCallback((data) => {
+    if (data.error) {
+      setDetectionQuality('poor');
+      return;
+    }
+
+    // Capture slower while alert and the server is busy, faster near drowsiness
+    if (data.recommended_interval_ms) {
+      captureIntervalRef.current = Math.max(MIN_CAPTURE_INTERVAL_MS, data.recommended_interval_ms);
+    }
+
+    setIsDrowsy(data.is_drowsy);
+    setStats(data.stats);
+    
+    if (data.is_drowsy) {
+      setDetectionCount(prev => prev + 1);
+      onDrowsinessDetected();
+    }
+    
+    if (data.ear_value) {
+      setEarHistory(prev => [...prev, data.ear_value].slice(-50));
+      setDetectionQuality('good');
+    } else {
+      setDetectionQuality('none');
+    }
+
+    // Update face box and eye markers if available
+    if (data.face_box) {
+      setFaceBox(data.face_box);
+    }
+    if (data.eye_markers) {
+      setEyeMarkers(data.eye_markers);
+    }
+
+    // Adopt the server's session ID (new session, or ours was evicted/reassigned)
+    if (data.session_id && data.session_id !== sessionId) {
+      setSessionId(data.session_id);
+    }
+  }, [onDrowsinessDetected, sessionId]);
+
   const captureFrame = useCallback(async () => {
     if (videoRef.current && canvasRef.current) {
       const video = videoRef.current;
@@ -75,51 +123,63 @@ const WebcamCapture = ({ onDrowsinessDetected, isDarkMode }) => {
       context.drawImage(video, 0, 0, canvas.width, canvas.height);
       
       try {
+        // Send the raw JPEG bytes; the backend decodes them straight to grayscale
+        const blob = await new Promise(resolve => canvas.toBlob(resolve, 'image/jpeg'));
+        const socket = socketRef.current;
+
+        // Prefer the streaming socket; skip this tick while a frame is in flight
+        if (socket && socket.readyState === WebSocket.OPEN) {
+          if (!socketBusyRef.current) {
+            socketBusyRef.current = true;
+            socket.send(blob);
+          }
+          return;
+        }
+
         const response = await fetch('http://localhost:5001/api/detect', {
           method: 'POST',
-          body: JSON.stringify({
-            image: canvas.toDataURL('image/jpeg')
-          }),
+          body: blob,
           headers: {
-            'Content-Type': 'application/json',
+            'Content-Type': 'image/jpeg',
             'X-Session-ID': sessionId
           }
         });
         
-        const data = await response.json();
-        setIsDrowsy(data.is_drowsy);
-        setStats(data.stats);
-        
-        if (data.is_drowsy) {
-          setDetectionCount(prev => prev + 1);
-          onDrowsinessDetected();
-        }
-        
-        if (data.ear_value) {
-          setEarHistory(prev => [...prev, data.ear_value].slice(-50));
-          setDetectionQuality('good');
-        } else {
-          setDetectionQuality('none');
-        }
-
-        // Update face box and eye markers if available
-        if (data.face_box) {
-          setFaceBox(data.face_box);
-        }
-        if (data.eye_markers) {
-          setEyeMarkers(data.eye_markers);
-        }
-
-        // Update session ID if new
-        if (data.session_id && !sessionId) {
-          setSessionId(data.session_id);
-        }
+        handleDetectionResult(await response.json());
       } catch (err) {
         console.error('Error detecting drowsiness:', err);
         setDetectionQuality('poor');
       }
     }
-  }, [onDrowsinessDetected, sessionId]);
+  }, [handleDetectionResult, sessionId]);
+
+  useEffect(() => {
+    if (isLoading || error) {
+      return undefined;
+    }
+
+    // Stream frames over one persistent socket; fall back to HTTP if it is unavailable
+    const query = sessionId ? `?session_id=${encodeURIComponent(sessionId)}` : '';
+    const socket = new WebSocket(`ws://localhost:5001/api/stream${query}`);
+    socket.onmessage = (event) => {
+      socketBusyRef.current = false;
+      handleDetectionResult(JSON.parse(event.data));
+    };
+    socket.onclose = () => {
+      socketBusyRef.current = false;
+      if (socketRef.current === socket) {
+        socketRef.current = null;
+      }
+    };
+    socketRef.current = socket;
+
+    return () => {
+      socketRef.current = null;
+      socket.close();
+    };
+    // Reconnect only when the session changes, not on every result handler update
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [isLoading, error, sessionId]);
 
   useEffect(() => {
     let stream = null;
@@ -151,11 +211,24 @@ const WebcamCapture = ({ onDrowsinessDetected, isDarkMode }) => {
   }, []);
 
   useEffect(() => {
-    let interval;
-    if (!isLoading && !error) {
-      interval = setInterval(captureFrame, 100);
+    if (isLoading || error) {
+      return undefined;
     }
-    return () => clearInterval(interval);
+
+    // Schedule each capture after the interval the server last recommended
+    let timer = null;
+    let cancelled = false;
+    const tick = async () => {
+      await captureFrame();
+      if (!cancelled) {
+        timer = setTimeout(tick, captureIntervalRef.current);
+      }
+    };
+    timer = setTimeout(tick, captureIntervalRef.current);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
   }, [isLoading, error, captureFrame]);
 
   useEffect(() => {
@@ -0,0 +1,109 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.getenv('MODEL_CACHE_DIR',
+                              os.path.join(os.path.expanduser('~'), '.cache', 'drowsiness-detection', 'models'))
+MANIFEST_NAME = 'manifest.json'
+
+class ModelCacheError(RuntimeError):
+    """Raised when weights are missing from the cache or fail their checksum."""
+
+def sha256_file(path: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ModelCache:
+    """Local, checksummed copy of model weights.
+
+    Weights are copied into the cache directory the first time they are seen
+    and recorded in ``manifest.json`` with their SHA-256. Every later load
+    verifies the cached file against that checksum (or a pinned one) and
+    never touches the network. A changed source file (new size or mtime) is
+    re-imported.
+    """
+
+    def __init__(self, root: str = DEFAULT_CACHE_DIR):
+        self.root = root
+        self._manifest_path = os.path.join(root, MANIFEST_NAME)
+
+    def _read_manifest(self) -> Dict[str, Dict]:
+        try:
+            with open(self._manifest_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            raise ModelCacheError(f"Corrupt model cache manifest {self._manifest_path}: {e}")
+
+    def _write_manifest(self, manifest: Dict[str, Dict]):
+        tmp = self._manifest_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, self._manifest_path)
+
+    def fetch(self, source: str, sha256: Optional[str] = None) -> str:
+        """Return the verified cached path for ``source`` weights, importing them if needed.
+
+        ``sha256`` pins the expected checksum; without it the checksum recorded
+        when the weights were first cached is used.
+        """
+        name = os.path.basename(source)
+        cached = os.path.join(self.root, name)
+        manifest = self._read_manifest()
+        entry = manifest.get(name)
+
+        source_stat = os.stat(source) if os.path.isfile(source) else None
+        stale = (entry is not None and source_stat is not None and
+                 (entry.get('source_size'), entry.get('source_mtime_ns')) !=
+                 (source_stat.st_size, source_stat.st_mtime_ns))
+
+        if entry is None or stale or not os.path.isfile(cached):
+            if source_stat is None:
+                raise ModelCacheError(f"Weights {source} are not in the model cache ({self.root}) "
+                                      f"and do not exist locally")
+            entry = self._import(source, cached, source_stat, sha256)
+            manifest[name] = entry
+            self._write_manifest(manifest)
+            logger.info(f"Cached weights {source} -> {cached}")
+            return cached
+
+        expected = sha256 or entry['sha256']
+        start = time.perf_counter()
+        actual = sha256_file(cached)
+        if actual != expected:
+            raise ModelCacheError(f"Checksum mismatch for cached {cached}: expected {expected}, got {actual}")
+        logger.debug(f"Verified {cached} in {(time.perf_counter() - start) * 1000:.0f} ms")
+        return cached
+
+    def _import(self, source: str, cached: str, source_stat: os.stat_result,
+                sha256: Optional[str]) -> Dict:
+        os.makedirs(self.root, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix='.part')
+        os.close(fd)
+        try:
+            shutil.copyfile(source, tmp)
+            actual = sha256_file(tmp)
+            if sha256 is not None and actual != sha256:
+                raise ModelCacheError(f"Checksum mismatch for {source}: expected {sha256}, got {actual}")
+            os.replace(tmp, cached)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        return {
+            'sha256': actual,
+            'source': os.path.abspath(source),
+            'source_size': source_stat.st_size,
+            'source_mtime_ns': source_stat.st_mtime_ns,
+            'cached_at': time.time()
+        }